@@ -0,0 +1,232 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import frbrizer
+from commons.json_writer import JsonBufferOut
+from commons.marcxml_reader import read_marc_from_xml_file
+
+from benchmarks.synthetic_corpus import generate_corpus
+
+
+# times every phase of frbrizer main loop on (synthetic) corpus and reports records/s and peak RSS as json
+# usage: python -m benchmarks.bench_frbrizer --corpus-dir ./benchmark_corpus --generate --bn-records 100000
+#        python -m benchmarks.bench_frbrizer --corpus-dir ./benchmark_corpus --output-file results.json
+# phases are delimited by calls of frbrizer functions - first loop is everything between indexing and the next phase
+PHASE_FUNCTIONS = {'get_indexes': 'indexing',
+                   'get_work_clusters': 'step_two',
+                   'merge_work_clusters': 'step_two',
+                   'convert_works': 'conversion',
+                   'get_mak_matches_for_configuration': 'manif_matching',
+                   'add_mak_items': 'manif_matching',
+                   'collect_mak_matches': 'manif_matching',
+                   'write_works_to_dump_files': 'dump'}
+
+PHASES = ['indexing', 'first_loop', 'step_two', 'conversion', 'manif_matching', 'dump']
+
+DUMP_FILES = ['item', 'materialization', 'expression', 'work', 'expression_data', 'work_data']
+
+
+def get_peak_rss_kb():
+    # ru_maxrss is in kilobytes on linux (and in bytes on macos)
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale)
+
+
+class PhaseTimer(object):
+    __slots__ = ['spans', 'peak_rss', 'depth', 'last_end']
+
+    # wraps phase functions of frbrizer module - only calls which aren't nested in other phase function are timed
+    # (e.g. mak items added while spilled works are written belong to dump phase)
+    def __init__(self):
+        self.spans = {}
+        self.peak_rss = {}
+        self.depth = 0
+        self.last_end = None
+
+    def start(self, phase, start_time):
+        if phase not in self.spans:
+            # everything between indexing and the first phase after it is the first loop
+            if self.last_end is not None and 'first_loop' not in self.spans and phase != 'indexing':
+                self.spans['first_loop'] = [self.last_end, start_time]
+                self.peak_rss['first_loop'] = get_peak_rss_kb()
+            self.spans[phase] = [start_time, start_time]
+
+    def end(self, phase, end_time):
+        self.spans[phase][1] = end_time
+        self.peak_rss[phase] = get_peak_rss_kb()
+        self.last_end = end_time
+
+    def wrap(self, function, phase):
+        def timed_function(*args, **kwargs):
+            self.depth += 1
+            if self.depth == 1:
+                self.start(phase, time.perf_counter())
+            try:
+                return function(*args, **kwargs)
+            finally:
+                if self.depth == 1:
+                    self.end(phase, time.perf_counter())
+                self.depth -= 1
+
+        return timed_function
+
+    @contextlib.contextmanager
+    def patch(self, module):
+        originals = {name: getattr(module, name) for name in PHASE_FUNCTIONS}
+        for name, phase in PHASE_FUNCTIONS.items():
+            setattr(module, name, self.wrap(originals[name], phase))
+        try:
+            yield self
+        finally:
+            for name, function in originals.items():
+                setattr(module, name, function)
+
+    def get_seconds(self, phase):
+        span = self.spans.get(phase)
+        return span[1] - span[0] if span else None
+
+
+def count_bn_records(bn_file):
+    # records are counted by lengths from leaders (the same way MARCReader frames them)
+    count = offset = 0
+    file_size = os.path.getsize(bn_file)
+
+    with open(bn_file, 'rb') as fp:
+        while offset < file_size:
+            fp.seek(offset)
+            try:
+                record_length = int(fp.read(5))
+            except ValueError:
+                break
+            if record_length <= 0:
+                break
+            offset += record_length
+            count += 1
+
+    return count
+
+
+def count_mak_records(mak_dir, limit_mak):
+    return sum(1 for filename in os.listdir(mak_dir)[:limit_mak]
+               for record in read_marc_from_xml_file(os.path.join(mak_dir, filename)) if record)
+
+
+def run_benchmark(paths, output_dir, workers=1, run_manif_matcher=True, frbr_step_two=True, limit_mak=None,
+                  spill_dir=None, mak_match_cache_size=50000):
+    buffer = JsonBufferOut(*[os.path.join(output_dir, f'{name}.json') for name in DUMP_FILES])
+
+    configuration = dict(paths, buffer=buffer, run_manif_matcher=run_manif_matcher, frbr_step_two=frbr_step_two,
+                         limit=sys.maxsize, limit_mak=limit_mak, first_loop_workers=workers, mak_workers=workers,
+                         mak_match_cache_size=mak_match_cache_size,
+                         bn_offset_index_file=None, index_cache_dir=None, checkpoint_dir=None, resume_from=None,
+                         bn_delta_file_in=None, spill_dir=spill_dir, metrics_file=None,
+                         profile_file=None, trace_memory=False)
+
+    phase_timer = PhaseTimer()
+    start_time = time.perf_counter()
+
+    with phase_timer.patch(frbrizer):
+        frbrizer.main_loop(configuration)
+
+    # everything written by dump phase is on disk only after buffer is closed
+    buffer.close()
+    end_time = time.perf_counter()
+    if 'dump' in phase_timer.spans:
+        phase_timer.end('dump', end_time)
+
+    bn_records = count_bn_records(paths['bn_file_in'])
+    mak_records = count_mak_records(paths['mak_files_in'], limit_mak) if run_manif_matcher else 0
+
+    phases = []
+    for phase in PHASES:
+        seconds = phase_timer.get_seconds(phase)
+        if seconds is None:
+            continue
+
+        # indexes are built from institutions, code values and descriptors - not from records
+        records = {'indexing': None, 'manif_matching': mak_records}.get(phase, bn_records)
+        peak_rss_kb, peak_rss_children_kb = phase_timer.peak_rss[phase]
+        phases.append({'phase': phase,
+                       'seconds': round(seconds, 6),
+                       'records': records,
+                       'records_per_sec': round(records / seconds, 2) if records and seconds > 0 else None,
+                       'peak_rss_kb': peak_rss_kb,
+                       'peak_rss_children_kb': peak_rss_children_kb})
+
+    peak_rss_kb, peak_rss_children_kb = get_peak_rss_kb()
+
+    return {'bn_records': bn_records,
+            'mak_records': mak_records,
+            'workers': workers,
+            'run_manif_matcher': run_manif_matcher,
+            'frbr_step_two': frbr_step_two,
+            'spill': spill_dir is not None,
+            'mak_match_cache_size': mak_match_cache_size,
+            'total_seconds': round(end_time - start_time, 6),
+            'records_per_sec': round(bn_records / (end_time - start_time), 2),
+            'peak_rss_kb': peak_rss_kb,
+            'peak_rss_children_kb': peak_rss_children_kb,
+            'phases': phases,
+            'python': platform.python_version(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def get_corpus_paths(corpus_dir):
+    return {'bn_file_in': os.path.join(corpus_dir, 'bn.mrc'),
+            'mak_files_in': os.path.join(corpus_dir, 'mak'),
+            'inst_file_in': os.path.join(corpus_dir, 'institutions.json'),
+            'code_val_file_in': os.path.join(corpus_dir, 'code_values.sql'),
+            'descr_files_in': os.path.join(corpus_dir, 'descriptors')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time phases of frbrizer main loop on synthetic corpus.')
+    parser.add_argument('--corpus-dir', default='./benchmark_corpus')
+    parser.add_argument('--generate', action='store_true', help='generate corpus into corpus dir first')
+    parser.add_argument('--bn-records', type=int, default=10000)
+    parser.add_argument('--mak-files', type=int, default=3)
+    parser.add_argument('--title-collision-rate', type=float, default=0.6)
+    parser.add_argument('--creator-collision-rate', type=float, default=0.8)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--limit-mak', type=int, default=None)
+    parser.add_argument('--no-manif-matcher', action='store_true')
+    parser.add_argument('--no-step-two', action='store_true')
+    parser.add_argument('--spill', action='store_true', help='spill converted works to disk')
+    parser.add_argument('--mak-match-cache-size', type=int, default=50000, help='0 disables cache of mak+ matches')
+    parser.add_argument('--output-file', default=None, help='json results (default: stdout)')
+    args = parser.parse_args()
+
+    if args.generate:
+        paths = generate_corpus(args.corpus_dir, args.bn_records, args.mak_files,
+                                title_collision_rate=args.title_collision_rate,
+                                creator_collision_rate=args.creator_collision_rate, seed=args.seed)
+    else:
+        paths = get_corpus_paths(args.corpus_dir)
+        if not os.path.isfile(paths['bn_file_in']):
+            raise SystemExit(f'No corpus found in {args.corpus_dir} (use --generate).')
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        results = run_benchmark(paths, output_dir, args.workers, not args.no_manif_matcher, not args.no_step_two,
+                                args.limit_mak, os.path.join(output_dir, 'spill') if args.spill else None,
+                                args.mak_match_cache_size)
+
+    results['corpus_dir'] = os.path.abspath(args.corpus_dir)
+
+    if args.output_file:
+        with open(args.output_file, 'w', encoding='utf-8') as fp:
+            json.dump(results, fp, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
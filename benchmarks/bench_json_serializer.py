@@ -0,0 +1,61 @@
+import argparse
+import json
+import os
+import timeit
+
+from commons.json_serializer import SERIALIZERS, dumps_stdlib, get_serializer
+
+
+# compares json serializers on payloads taken from es dump files written by frbrizer
+# usage: python -m benchmarks.bench_json_serializer --dump-dir ./output
+DUMP_FILES = ['work.json', 'materialization.json', 'expression.json', 'item.json']
+
+
+def load_payloads(dump_dir, limit):
+    payloads = {}
+
+    for dump_file in DUMP_FILES:
+        path_file = os.path.join(dump_dir, dump_file)
+        if not os.path.isfile(path_file):
+            continue
+
+        with open(path_file, 'r', encoding='utf-8') as fp:
+            payloads[dump_file] = [json.loads(line) for num, line in zip(range(limit), fp)]
+
+    return payloads
+
+
+def run_benchmark(payloads, repeat):
+    results = []
+
+    for dump_file, dump_payloads in payloads.items():
+        expected = [dumps_stdlib(payload) for payload in dump_payloads]
+
+        for name, serializer in SERIALIZERS.items():
+            identical = [serializer(payload) for payload in dump_payloads] == expected
+            best_time = min(timeit.repeat(lambda: [serializer(payload) for payload in dump_payloads],
+                                          number=1, repeat=repeat))
+            results.append((dump_file, name, len(dump_payloads), best_time, identical))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare JSON serializers on ES dump payloads.')
+    parser.add_argument('--dump-dir', default='./output')
+    parser.add_argument('--limit', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = load_payloads(args.dump_dir, args.limit)
+    if not payloads:
+        raise SystemExit(f'No ES dump files found in {args.dump_dir}.')
+
+    print(f'Default serializer: {get_serializer().__name__}')
+    for dump_file, name, count, best_time, identical in run_benchmark(payloads, args.repeat):
+        print(f'{dump_file:24} {name:8} {count:8} lines {best_time:8.4f} s '
+              f'{count / best_time:12.0f} lines/s  identical with stdlib: {identical}')
+
+
+if __name__ == '__main__':
+    main()
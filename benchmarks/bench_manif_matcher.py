@@ -0,0 +1,145 @@
+import argparse
+import random
+import timeit
+
+from manifestation_matcher.manif_match_data_index import BnManifMatchDataIndex
+from manifestation_matcher.manif_matcher import match_candidates
+from objects.helper_objects import ManifMatchData
+
+
+# compares previous scoring of mak+ candidates (ManifMatchData rebuilt and compared field by field for every candidate)
+# with scoring on integer columns of BnManifMatchDataIndex - results are checked to be the same first
+# (columnar scoring is still per candidate python loop - gain comes from integer comparisons, not vectorization)
+# usage: python -m benchmarks.bench_manif_matcher --records 100000 --candidates 50
+def previous_match_candidates(candidates, mak_manif_data, match_data_by_nlp_id, match_by_245):
+    matched_with_edition = set()
+    matched_without_edition = set()
+
+    for candidate in candidates:
+        bn_manif_data = match_data_by_nlp_id[candidate]
+
+        same_ldr_67_008 = bn_manif_data.ldr_67 == mak_manif_data.ldr_67 and \
+            bn_manif_data.val_008_0614 == mak_manif_data.val_008_0614
+        isbn_case_1 = (bn_manif_data.isbn_020_az and mak_manif_data.isbn_020_az and
+                       bn_manif_data.isbn_020_az != mak_manif_data.isbn_020_az and
+                       len(set(bn_manif_data.isbn_020_az) | set(mak_manif_data.isbn_020_az)) <=
+                       len(bn_manif_data.isbn_020_az) and
+                       len(set(bn_manif_data.isbn_020_az) | set(mak_manif_data.isbn_020_az)) <=
+                       len(mak_manif_data.isbn_020_az)) or \
+                      (not bn_manif_data.isbn_020_az or not mak_manif_data.isbn_020_az)
+        isbn_case_2 = bn_manif_data.isbn_020_az and mak_manif_data.isbn_020_az and \
+            bn_manif_data.isbn_020_az == mak_manif_data.isbn_020_az
+
+        last_5_char_245 = bn_manif_data.title_245[-5:] == mak_manif_data.title_245[-5:]
+        num_245 = bn_manif_data.numbers_from_title_245 == mak_manif_data.numbers_from_title_245
+        place_pub_260 = bn_manif_data.place_pub_260_a_first_word == mak_manif_data.place_pub_260_a_first_word
+        num_pages = bn_manif_data.num_of_pages_300_a in [mak_manif_data.num_of_pages_300_a,
+                                                         mak_manif_data.num_of_pages_300_a - 1,
+                                                         mak_manif_data.num_of_pages_300_a + 1]
+        b_form = mak_manif_data.b_format + 0.125 * mak_manif_data.b_format >= bn_manif_data.b_format >= \
+            mak_manif_data.b_format - 0.125 * mak_manif_data.b_format
+        edition = bn_manif_data.edition == mak_manif_data.edition
+
+        if match_by_245 and same_ldr_67_008:
+            if isbn_case_1:
+                if last_5_char_245 and num_245 and place_pub_260 and num_pages and b_form and edition:
+                    matched_with_edition.add(candidate)
+                if last_5_char_245 and num_245 and place_pub_260 and num_pages and b_form and not edition:
+                    matched_without_edition.add(candidate)
+            if isbn_case_2:
+                if (num_245 and place_pub_260 and num_pages and b_form and edition and not last_5_char_245) or \
+                   (last_5_char_245 and place_pub_260 and num_pages and b_form and edition and not num_245) or \
+                   (last_5_char_245 and num_245 and num_pages and b_form and edition and not place_pub_260) or \
+                   (num_245 and place_pub_260 and num_pages and b_form and edition and last_5_char_245):
+                    matched_with_edition.add(candidate)
+                if last_5_char_245 and place_pub_260 and num_pages and b_form and num_245 and not edition:
+                    matched_without_edition.add(candidate)
+
+        if not match_by_245:
+            if same_ldr_67_008 and isbn_case_1:
+                if place_pub_260 and num_pages and b_form and edition:
+                    matched_with_edition.add(candidate)
+                if place_pub_260 and num_pages and b_form and not edition:
+                    matched_without_edition.add(candidate)
+            if isbn_case_2:
+                if (place_pub_260 and num_pages and b_form and edition) or \
+                   (num_pages and b_form and edition and not place_pub_260):
+                    matched_with_edition.add(candidate)
+                if place_pub_260 and num_pages and b_form and not edition:
+                    matched_without_edition.add(candidate)
+
+    return matched_with_edition, matched_without_edition
+
+
+ISBNS = ['9788300000011', '8300000012', '9788324000013', '9788373000014']
+TITLES = ['Quo vadis : powieść z czasów Nerona /', 'Lalka /', 'Pan Tadeusz czyli Ostatni zajazd na Litwie /',
+          'Dzieła zebrane. T. 2 /', 'Opowiadania wybrane 1 /']
+PLACES = ['Warszawa', 'Kraków', 'Wrocław', 'Poznań']
+EDITIONS = [[], ['WYD 2'], ['WYD 3 POPR']]
+
+
+# values are drawn from small sets, so all the rules (isbn cases, editions...) are hit
+def generate_manif_match_data(rnd):
+    title_245 = rnd.choice(TITLES)
+
+    return ManifMatchData(ldr_67=rnd.choice(['am', 'aa']), val_008_0614=rnd.choice(['s2001    ', 's2005    ']),
+                          isbn_020_az=rnd.sample(ISBNS, rnd.randint(0, 2)), title_245=title_245,
+                          title_245_no_offset=title_245[:25], title_245_with_offset=title_245[:25], titles_490=[],
+                          numbers_from_title_245=''.join(char for char in title_245 if char.isdigit()),
+                          place_pub_260_a_first_word=rnd.choice(PLACES), num_of_pages_300_a=rnd.randint(300, 304),
+                          b_format=rnd.choice([18, 20, 21, 24]), edition=rnd.choice(EDITIONS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare previous and columnar scoring of MAK+ candidates.')
+    parser.add_argument('--records', type=int, default=20000, help='number of bn records in index')
+    parser.add_argument('--mak-records', type=int, default=2000)
+    parser.add_argument('--candidates', type=int, default=20, help='number of candidates of mak+ record')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+
+    match_data_by_nlp_id = {}
+    index_match_data = BnManifMatchDataIndex()
+    for num in range(args.records):
+        nlp_id = f'b{num:010d}'
+        match_data_by_nlp_id[nlp_id] = generate_manif_match_data(rnd)
+        index_match_data.add(nlp_id, match_data_by_nlp_id[nlp_id])
+
+    nlp_ids = list(match_data_by_nlp_id)
+    mak_records = [(generate_manif_match_data(rnd), rnd.sample(nlp_ids, args.candidates))
+                   for num in range(args.mak_records)]
+
+    matches = 0
+    for mak_manif_data, candidates in mak_records:
+        for match_by_245 in (True, False):
+            previous_result = previous_match_candidates(candidates, mak_manif_data, match_data_by_nlp_id, match_by_245)
+            result = match_candidates(candidates, mak_manif_data, index_match_data, match_by_245)
+            if previous_result != result:
+                raise SystemExit(f'Different results for {mak_manif_data}: {previous_result} != {result}')
+            matches += len(result[0]) + len(result[1])
+
+    print(f'{args.mak_records} mak+ records x {args.candidates} candidates, {matches} matches, results are the same')
+
+    # previous matcher rebuilt ManifMatchData for every candidate (get from index), so it's included in its timing
+    def run_previous():
+        for mak_manif_data, candidates in mak_records:
+            for match_by_245 in (True, False):
+                previous_match_candidates(candidates, mak_manif_data,
+                                          {candidate: index_match_data.get(candidate) for candidate in candidates},
+                                          match_by_245)
+
+    def run_columnar():
+        for mak_manif_data, candidates in mak_records:
+            for match_by_245 in (True, False):
+                match_candidates(candidates, mak_manif_data, index_match_data, match_by_245)
+
+    previous_time = min(timeit.repeat(run_previous, number=1, repeat=args.repeat))
+    columnar_time = min(timeit.repeat(run_columnar, number=1, repeat=args.repeat))
+    print(f'previous: {previous_time:.4f}s, columnar: {columnar_time:.4f}s, speedup: {previous_time / columnar_time:.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import random
+import timeit
+
+from commons.normalization import prepare_name_for_indexing, normalize_title
+
+from tests.unit.helpers import reference_prepare_name_for_indexing, reference_normalize_title
+
+
+# compares previous (char by char) normalization with compiled and cached one - previous implementations are
+# the reference ones from unit tests
+# speedup with cache depends on how often values repeat (--values / --distinct), so cache hit rate is reported too
+# usage: python -m benchmarks.bench_normalization
+WORDS = ['quo', 'vadis', 'powieść', 'z', 'czasów', 'Nerona', 'lalka', 'pan', 'Tadeusz', 'czyli', 'ostatni', 'zajazd',
+         'na', 'Litwie', 'opowiadania', 'wybrane', 'dzieła', 'zebrane', 'tom', 'cz.', 'wyd.', 'T.', '1', '2', '12']
+SURNAMES = ['Sienkiewicz', 'Prus', 'Mickiewicz', 'Orzeszkowa', 'Reymont', 'Żeromski', 'Konopnicka', 'Lem']
+FORENAMES = ['Henryk', 'Bolesław', 'Adam', 'Eliza', 'Władysław Stanisław', 'Stefan', 'Maria', 'Stanisław']
+
+
+def generate_title(rnd):
+    title = ' '.join(rnd.choice(WORDS) for num in range(rnd.randint(1, 6))).capitalize()
+    if rnd.random() < 0.4:
+        title += rnd.choice([' : ', ' = ', ' ; ', '. ']) + ' '.join(rnd.choice(WORDS) for num in range(rnd.randint(1, 5)))
+    return title + rnd.choice(['', ' /', ' :', '.', ' ;'])
+
+
+def generate_name(rnd):
+    name = f'{rnd.choice(SURNAMES)}, {rnd.choice(FORENAMES)}'
+    if rnd.random() < 0.7:
+        birth_year = rnd.randint(1750, 1950)
+        name += f' ({birth_year}-{birth_year + rnd.randint(20, 90)})'
+    return name + rnd.choice(['', '.', ','])
+
+
+# titles (245, 246, 240) and creators names as they come from records - most of them repeat across the file
+def generate_values(number_of_values, number_of_distinct_values, seed):
+    rnd = random.Random(seed)
+    distinct_values = [generate_title(rnd) if rnd.random() < 0.6 else generate_name(rnd)
+                       for value_num in range(number_of_distinct_values)]
+    return [rnd.choice(distinct_values) for num in range(number_of_values)]
+
+
+def time_function(function, values, repeat):
+    return min(timeit.repeat(lambda: [function(value) for value in values], number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare previous and current title/name normalization.')
+    parser.add_argument('--values', type=int, default=200000)
+    parser.add_argument('--distinct', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    values = generate_values(args.values, args.distinct, seed=0)
+
+    for name, previous_function, function in [('prepare_name_for_indexing', reference_prepare_name_for_indexing,
+                                                prepare_name_for_indexing),
+                                               ('normalize_title', reference_normalize_title, normalize_title)]:
+        assert [previous_function(value) for value in values] == [function(value) for value in values]
+
+        previous_time = time_function(previous_function, values, args.repeat)
+        uncached_time = time_function(function.__wrapped__, values, args.repeat)
+        function.cache_clear()
+        cached_time = min(time_function(function, values, 1) for num in range(args.repeat) if not function.cache_clear())
+        cache_info = function.cache_info()
+
+        print(f'{name:26} previous {previous_time:7.3f} s | compiled {uncached_time:7.3f} s '
+              f'({previous_time / uncached_time:5.1f}x) | compiled + cache {cached_time:7.3f} s '
+              f'({previous_time / cached_time:5.1f}x, hit rate {cache_info.hits / len(values):.0%})')
+
+
+if __name__ == '__main__':
+    main()
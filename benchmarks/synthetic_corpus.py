@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import random
+
+from pymarc import Record, Field
+from pymarc.marcxml import record_to_xml
+
+
+# generates synthetic input files for frbrizer - BN iso2709 file, MAK+ marcxml files, institutions, code values
+# and descriptors (all the creators, subjects... used in records are resolvable)
+# titles and creators are drawn from pools sized by collision rates - the higher the rate, the more records share
+# title (or creator) with other records, so there are more manifestations per work and bigger candidate sets
+# usage: python -m benchmarks.synthetic_corpus --out-dir ./benchmark_corpus --bn-records 100000
+SUBJECTS = [f'Temat {num}' for num in range(200)]
+PLACES = ['Polska', 'Kraków', 'Warszawa', 'Gdańsk', 'Wrocław']
+GENRES = ['Powieść', 'Opowiadania', 'Poezja', 'Dramat', 'Reportaż']
+FORMS = ['Książki', 'Audiobooki', 'E-booki']
+DOMAINS = ['Literatura']
+CULTURAL_GROUPS = ['Literatura polska']
+PUBLISHERS = ['Wydawnictwo X', 'Wydawnictwo Y', 'Państwowy Instytut Wydawniczy']
+PUB_PLACES = ['Warszawa :', 'Kraków :', 'Wrocław :', 'Poznań :']
+YEARS = [str(year) for year in range(1950, 2021)]
+LANGUAGES = [('polski', 'pol'), ('angielski', 'eng'), ('niemiecki', 'ger'), ('francuski', 'fre')]
+COUNTRIES = [('Polska', 'pl'), ('Wielka Brytania', 'xxk'), ('Niemcy', 'gw'), ('Francja', 'fr')]
+CONTRIBUTIONS = [('Tłumaczenie', 'Tł.'), ('Ilustracje', 'Il.'), ('Redakcja', 'Red.')]
+POPULAR_TITLES = ['Pan Tadeusz', 'Quo vadis', 'Dzieła wybrane', 'Lalka', 'Wiersze wybrane']
+NUMBER_OF_LIBRARIES = 20
+
+
+def get_pool_size(number_of_records, collision_rate):
+    # pool of distinct values - with collision rate 0 almost every record gets its own value
+    return max(1, round(number_of_records * (1 - collision_rate)))
+
+
+def generate_titles(number_of_titles):
+    return POPULAR_TITLES[:number_of_titles] + [f'Tytuł dzieła {num}'
+                                                for num in range(max(0, number_of_titles - len(POPULAR_TITLES)))]
+
+
+def generate_creators(number_of_creators):
+    return [f'Autor{num}, Jan ({1800 + num % 200}-{1860 + num % 200})' for num in range(number_of_creators)]
+
+
+def write_descriptors(path_file, creators):
+    descriptors = [('person', creators), ('subject', SUBJECTS), ('place', PLACES), ('genre', GENRES),
+                   ('form', FORMS), ('domain', DOMAINS), ('group', CULTURAL_GROUPS), ('corporate', PUBLISHERS)]
+    es_id = 1000
+
+    with open(path_file, 'w', encoding='utf-8') as fp:
+        for index, names in descriptors:
+            for name in names:
+                es_id += 1
+                fp.write(json.dumps({'_index': index, '_id': str(es_id), '_source': {'descr_name': name}},
+                                    ensure_ascii=False) + '\n')
+
+
+def write_code_values(path_file):
+    code_values = [('language', LANGUAGES), ('country', COUNTRIES), ('carrier_type', [('wolumin', 'nc')]),
+                   ('media_type', [('bez urządzenia', 'n')]), ('contribution', CONTRIBUTIONS)]
+
+    with open(path_file, 'w', encoding='utf-8') as fp:
+        for table, values in code_values:
+            for value, code in values:
+                fp.write(f"insert into {table} values ('{value}','{code}','A');\n")
+
+
+def write_institutions(path_file):
+    with open(path_file, 'w', encoding='utf-8') as fp:
+        for num in range(NUMBER_OF_LIBRARIES):
+            institution = {'_id': str(500 + num),
+                           '_source': {'code': str(num + 1), 'metadata_original': f'makplus-{num + 1}',
+                                       'name': f'Biblioteka {num + 1}', 'digital': False,
+                                       'localization': {'lon': 21.0, 'lat': 52.2}, 'province': 'mazowieckie',
+                                       'city': 'Warszawa'}}
+            fp.write(json.dumps(institution, ensure_ascii=False) + '\n')
+
+
+def generate_record(rnd, nlp_id, titles, creators, with_ava=False):
+    title = rnd.choice(titles)
+    year = rnd.choice(YEARS)
+    language = rnd.choice(['pol', 'pol', 'pol', 'eng', 'ger', 'fre'])
+
+    record = Record(force_utf8=True)
+    record.leader = '00000nam a2200000 i 4500' if rnd.random() > 0.05 else '00000ncm a2200000 i 4500'
+    record.add_field(Field('001', data=nlp_id))
+    record.add_field(Field('008', data=f'200101s{year}    pl            000 1 {language} c'))
+    record.add_field(Field('009', data=f'99{nlp_id[1:]}'))
+
+    if rnd.random() > 0.4:
+        record.add_field(Field('020', [' ', ' '], ['a', f'97883{rnd.randint(0, 99999999):08d}']))
+    record.add_field(Field('035', [' ', ' '], ['a', f'(OCoLC){nlp_id}']))
+    if language != 'pol':
+        record.add_field(Field('041', ['1', ' '], ['a', 'pol', 'h', language]))
+
+    if rnd.random() > 0.1:
+        record.add_field(Field('100', ['1', ' '], ['a', rnd.choice(creators)]))
+
+    # some titles start with article skipped in filing (2nd indicator)
+    if rnd.random() > 0.8:
+        record.add_field(Field('245', ['1', '2'], ['a', f'A {title} /', 'c', 'Jan X.']))
+    else:
+        record.add_field(Field('245', ['1', '0'], ['a', f'{title} /', 'c', 'Jan X.']))
+
+    if language != 'pol' or rnd.random() > 0.8:
+        record.add_field(Field('246', ['1', ' '], ['i', 'Tyt. oryg.:', 'a', f'{title} orig']))
+    if rnd.random() > 0.8:
+        record.add_field(Field('250', [' ', ' '], ['a', rnd.choice(['Wyd. 2.', 'Wyd. 3.', 'Wyd. 2 popr.'])]))
+
+    record.add_field(Field('260', [' ', ' '], ['a', rnd.choice(PUB_PLACES), 'b', f'{rnd.choice(PUBLISHERS)},',
+                                               'c', year]))
+    if rnd.random() > 0.05:
+        record.add_field(Field('300', [' ', ' '], ['a', f'{rnd.randint(40, 900)} s. ;',
+                                                   'c', f'{rnd.choice([19, 20, 21, 24, 30])} cm.']))
+    else:
+        record.add_field(Field('300', [' ', ' '], ['a', 'ca 200 s.']))
+
+    record.add_field(Field('380', [' ', ' '], ['a', rnd.choice(FORMS)]))
+    if rnd.random() > 0.5:
+        record.add_field(Field('386', [' ', ' '], ['a', rnd.choice(CULTURAL_GROUPS)]))
+    if rnd.random() > 0.7:
+        record.add_field(Field('490', ['0', ' '], ['a', f'Seria {rnd.randint(0, 50)}']))
+    record.add_field(Field('500', [' ', ' '], ['a', 'Uwaga.']))
+
+    for num in range(rnd.randint(0, 3)):
+        record.add_field(Field('650', [' ', '7'], ['a', rnd.choice(SUBJECTS)]))
+    if rnd.random() > 0.5:
+        record.add_field(Field('651', [' ', '7'], ['a', rnd.choice(PLACES)]))
+    record.add_field(Field('655', [' ', '7'], ['a', rnd.choice(GENRES)]))
+    record.add_field(Field('658', [' ', ' '], ['a', rnd.choice(DOMAINS)]))
+
+    if rnd.random() > 0.7:
+        record.add_field(Field('700', ['1', ' '], ['a', rnd.choice(creators), 'e', 'Tł.']))
+    if rnd.random() > 0.8:
+        record.add_field(Field('710', ['2', ' '], ['a', rnd.choice(PUBLISHERS), 'e', 'Wyd.']))
+
+    record.add_field(Field('852', [' ', ' '], ['c', f'II {nlp_id}', 'h', 'Sygn.', '8', f'22{nlp_id[1:]}']))
+    if rnd.random() > 0.95:
+        record.add_field(Field('856', ['4', '1'], ['u', 'https://polona.pl/item', 'z', 'Dostępne w Polonie']))
+
+    if with_ava:
+        add_ava_fields(rnd, record)
+
+    return record
+
+
+def add_ava_fields(rnd, record):
+    for num in range(rnd.randint(1, 4)):
+        record.add_field(Field('AVA', [' ', ' '], ['b', f'KAT{rnd.randint(1, NUMBER_OF_LIBRARIES)}',
+                                                   'f', str(rnd.randint(1, 3)), 'u', 'http://makplus.example/item']))
+
+
+def copy_record_for_mak(rnd, bn_record, nlp_id):
+    # MAK+ copy of BN record - the same description with its own control number and items
+    record = Record(force_utf8=True, leader=bn_record.leader)
+    record.add_field(Field('001', data=nlp_id))
+
+    for field in bn_record.get_fields():
+        if field.tag not in ('001', '852', '856'):
+            record.add_field(field)
+
+    add_ava_fields(rnd, record)
+
+    return record
+
+
+def generate_corpus(out_dir, bn_records=10000, mak_files=3, mak_records_per_file=None, title_collision_rate=0.6,
+                    creator_collision_rate=0.8, mak_match_rate=0.7, seed=0):
+    # returns configuration keys for input files of generated corpus
+    rnd = random.Random(seed)
+    mak_records_per_file = mak_records_per_file if mak_records_per_file is not None else bn_records // 4
+
+    titles = generate_titles(get_pool_size(bn_records, title_collision_rate))
+    creators = generate_creators(get_pool_size(bn_records, creator_collision_rate))
+
+    paths = {'bn_file_in': os.path.join(out_dir, 'bn.mrc'),
+             'mak_files_in': os.path.join(out_dir, 'mak'),
+             'inst_file_in': os.path.join(out_dir, 'institutions.json'),
+             'code_val_file_in': os.path.join(out_dir, 'code_values.sql'),
+             'descr_files_in': os.path.join(out_dir, 'descriptors')}
+
+    os.makedirs(paths['mak_files_in'], exist_ok=True)
+    os.makedirs(paths['descr_files_in'], exist_ok=True)
+
+    write_descriptors(os.path.join(paths['descr_files_in'], 'descriptors.jsonl'), creators)
+    write_code_values(paths['code_val_file_in'])
+    write_institutions(paths['inst_file_in'])
+
+    # only a sample of BN records is kept in memory - MAK+ copies are made of them
+    sampled_records = []
+    with open(paths['bn_file_in'], 'wb') as fp:
+        for num in range(bn_records):
+            record = generate_record(rnd, f'b{num:010d}', titles, creators)
+            fp.write(record.as_marc())
+
+            if len(sampled_records) < 10000:
+                sampled_records.append(record)
+            elif rnd.random() < 10000 / (num + 1):
+                sampled_records[rnd.randrange(10000)] = record
+
+    mak_num = 0
+    for file_num in range(mak_files):
+        with open(os.path.join(paths['mak_files_in'], f'mak_{file_num}.xml'), 'wb') as fp:
+            fp.write(b'<?xml version="1.0" encoding="UTF-8"?>'
+                     b'<collection xmlns="http://www.loc.gov/MARC21/slim">')
+
+            for num in range(mak_records_per_file):
+                mak_num += 1
+                if sampled_records and rnd.random() < mak_match_rate:
+                    record = copy_record_for_mak(rnd, rnd.choice(sampled_records), f'm{mak_num:010d}')
+                else:
+                    record = generate_record(rnd, f'm{mak_num:010d}', titles, creators, with_ava=True)
+                fp.write(record_to_xml(record, namespace=False))
+
+            fp.write(b'</collection>')
+
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic BN and MAK+ corpus for frbrizer benchmarks.')
+    parser.add_argument('--out-dir', default='./benchmark_corpus')
+    parser.add_argument('--bn-records', type=int, default=10000)
+    parser.add_argument('--mak-files', type=int, default=3)
+    parser.add_argument('--mak-records-per-file', type=int, default=None)
+    parser.add_argument('--title-collision-rate', type=float, default=0.6)
+    parser.add_argument('--creator-collision-rate', type=float, default=0.8)
+    parser.add_argument('--mak-match-rate', type=float, default=0.7)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.out_dir, args.bn_records, args.mak_files, args.mak_records_per_file,
+                            args.title_collision_rate, args.creator_collision_rate, args.mak_match_rate, args.seed)
+    print(json.dumps(paths, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+import logging
+import os
+import pickle
+
+from exceptions.exceptions import CheckpointNotAvailable
+
+from indexers.index_cache import get_sources_state, is_cache_valid
+
+# bump when format of checkpointed state changes
+CHECKPOINT_VERSION = 7
+
+# phases of FRBRization in order of running - state is checkpointed after every phase that was run
+FRBR_PHASES = ['first_loop', 'step_two', 'conversion', 'manif_matching', 'dump']
+
+# state updated with bn delta file is checkpointed separately
+DELTA_PHASE = 'delta'
+
+# keys of es docs written for every work (by full run and delta runs) - delta run deletes the ones it doesn't write
+# again, checkpointed after dump
+WRITTEN_DOCS_PHASE = 'written_docs'
+
+
+def get_checkpoint_file(checkpoint_dir, phase):
+    return os.path.join(checkpoint_dir, f'{phase}.checkpoint')
+
+
+def get_output_sizes(json_buffer_out):
+    # sizes of es dump files (in order of writers) after everything written so far is on disk
+    json_buffer_out.flush()
+    return [os.path.getsize(writer.file_out) for writer in json_buffer_out.get_writers()]
+
+
+def save_checkpoint(checkpoint_dir, phase, state, source_files, json_buffer_out):
+    # state is written after header with state of source files (offsets of bn records are only valid for the same
+    # file) and sizes of es dump files (written so far), to temporary file first - so broken checkpoint
+    # is never left behind
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    checkpoint_file = get_checkpoint_file(checkpoint_dir, phase)
+    checkpoint_file_tmp = f'{checkpoint_file}.tmp'
+
+    header = (CHECKPOINT_VERSION, phase, get_sources_state(source_files), get_output_sizes(json_buffer_out))
+
+    with open(checkpoint_file_tmp, 'wb') as fp:
+        pickle.dump(header, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(state, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.replace(checkpoint_file_tmp, checkpoint_file)
+    logging.info(f'Checkpointed state after {phase} phase.')
+
+
+def load_checkpoint(checkpoint_dir, phase, source_files):
+    # returns state checkpointed after given phase and sizes of es dump files at that moment
+    checkpoint_file = get_checkpoint_file(checkpoint_dir, phase)
+
+    try:
+        with open(checkpoint_file, 'rb') as fp:
+            version, checkpointed_phase, sources_state, output_sizes = pickle.load(fp)
+
+            if version != CHECKPOINT_VERSION or checkpointed_phase != phase \
+                    or not is_cache_valid(sources_state, source_files):
+                raise CheckpointNotAvailable
+
+            state = pickle.load(fp)
+    except (OSError, EOFError, ValueError, TypeError, AttributeError, ImportError, pickle.UnpicklingError) as error:
+        raise CheckpointNotAvailable from error
+
+    logging.info(f'Loaded state checkpointed after {phase} phase.')
+
+    return state, output_sizes
+
+
+def get_latest_checkpoint_phase(checkpoint_dir, phases):
+    # phase (of given ones) with the most recent checkpoint, None - there is no checkpoint of any of them
+    checkpoint_times = {}
+
+    for phase in phases:
+        checkpoint_file = get_checkpoint_file(checkpoint_dir, phase)
+        if os.path.exists(checkpoint_file):
+            checkpoint_times[phase] = os.path.getmtime(checkpoint_file)
+
+    return max(checkpoint_times, key=checkpoint_times.get) if checkpoint_times else None
+
+
+def restore_output_files(json_buffer_out, output_sizes):
+    # es dump files are cut to sizes they had at checkpoint - anything written afterwards by failed run is dropped
+    # (must be called before anything is written by resumed run)
+    files_out = [writer.file_out for writer in json_buffer_out.get_writers()]
+
+    for file_out, size in zip(files_out, output_sizes):
+        if os.path.getsize(file_out) < size:
+            raise CheckpointNotAvailable
+
+    for file_out, size in zip(files_out, output_sizes):
+        os.truncate(file_out, size)
+
+
+def get_phases_to_run(enabled_phases, resume_from=None):
+    # returns (phases to run, phase to load checkpoint of) - run resumed from given phase starts from state
+    # checkpointed after the last enabled phase before it (None - nothing to load, run starts from the beginning)
+    if resume_from is None:
+        return enabled_phases, None
+
+    if resume_from not in FRBR_PHASES:
+        raise ValueError(f'Unknown FRBRization phase: {resume_from}.')
+
+    resume_from_position = FRBR_PHASES.index(resume_from)
+    phases_to_skip = [phase for phase in enabled_phases if FRBR_PHASES.index(phase) < resume_from_position]
+    phases_to_run = [phase for phase in enabled_phases if FRBR_PHASES.index(phase) >= resume_from_position]
+
+    return phases_to_run, phases_to_skip[-1] if phases_to_skip else None
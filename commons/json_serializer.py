@@ -0,0 +1,78 @@
+import json
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# reference output for es dump lines - every default backend has to produce exactly the same string
+def dumps_stdlib(obj):
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def dumps_ujson(obj):
+    try:
+        json_line = ujson.dumps(obj, ensure_ascii=False, escape_forward_slashes=False, separators=(', ', ': '))
+    except (TypeError, ValueError, OverflowError):
+        # anything ujson can't handle goes through stdlib, so result (or raised error) stays the same
+        return dumps_stdlib(obj)
+
+    # ujson writes one-digit negative exponents of floats without leading zero (1e-5, stdlib: 1e-05) - lines which
+    # may contain such float (and, rarely, the ones with 'e-' only in strings) go through stdlib too
+    if 'e-' in json_line:
+        return dumps_stdlib(obj)
+
+    return json_line
+
+
+def dumps_orjson(obj):
+    # compact separators and no option to change them - output is valid, but not byte-identical with stdlib,
+    # so orjson is never picked by default
+    return orjson.dumps(obj).decode('utf-8')
+
+
+SERIALIZERS = {'stdlib': dumps_stdlib}
+
+if ujson is not None:
+    SERIALIZERS['ujson'] = dumps_ujson
+if orjson is not None:
+    SERIALIZERS['orjson'] = dumps_orjson
+
+DEFAULT_SERIALIZERS_ORDER = ['ujson', 'stdlib']
+
+PROBE = {'_id': 'ab12', 'title': 'Zażółć gęślą jaźń / "cytat" \\ a\tb\n\x00\x7f ', 'url': 'http://a.pl/b',
+         'count': 12, 'big': 2 ** 70, 'ratio': 0.1, 'small': 1e-05, 'exp': 1.5e+16, 'none': None, 'flag': False,
+         'list': [1, 'a', {}, []],
+         'nested': {'1': [{'b': 'ą'}]}}
+
+
+def is_identical_with_stdlib(serializer):
+    try:
+        return serializer(PROBE) == dumps_stdlib(PROBE)
+    except Exception:
+        return False
+
+
+def get_serializer(name=None):
+    # name=None - fastest available backend with output identical to stdlib (e.g. old ujson without separators
+    # argument fails the probe and is skipped)
+    if name is not None:
+        if name not in SERIALIZERS:
+            raise ValueError(f'JSON serializer {name} is not available (available: {", ".join(SERIALIZERS)}).')
+        return SERIALIZERS[name]
+
+    for serializer_name in DEFAULT_SERIALIZERS_ORDER:
+        serializer = SERIALIZERS.get(serializer_name)
+        if serializer is not None and is_identical_with_stdlib(serializer):
+            return serializer
+
+    return dumps_stdlib
+
+
+dumps = get_serializer()
@@ -1,31 +1,171 @@
-from objects.helper_objects import ObjCounter
+import json
+import os
+import queue
+import threading
+import time
+
+from commons.json_serializer import get_serializer
+from commons.metrics import metrics
+
+
+class JsonStreamWriter(object):
+    __slots__ = ['file_out', 'batch_size', 'batch', 'count', 'queue', 'error', 'dumps', 'fp', 'thread']
+
+    # writes json lines to one file in background thread - lines are sent in batches through bounded queue
+    # (producer blocks when writer can't keep up), serialized there and written through large file buffer;
+    # objects passed as dicts are serialized later, so they mustn't be changed after writing
+    def __init__(self, file_out, batch_size=1000, max_queued_batches=16, write_buffer_size=8 * 1024 * 1024,
+                 serializer=None):
+        self.file_out = file_out
+        self.batch_size = batch_size
+        self.batch = []
+        self.count = 0
+        self.queue = queue.Queue(maxsize=max_queued_batches)
+        self.error = None
+        self.dumps = get_serializer(serializer)
+
+        self.fp = open(file_out, 'a', encoding='utf-8', buffering=write_buffer_size)
+        self.thread = threading.Thread(target=self.run, name=f'JsonStreamWriter({file_out})', daemon=True)
+        self.thread.start()
+
+    def __repr__(self):
+        return f'JsonStreamWriter(file_out={self.file_out}, count={self.count})'
+
+    def run(self):
+        while True:
+            batch = self.queue.get()
+            dumps = self.dumps
+
+            try:
+                if batch is None:
+                    break
+                # after an error batches are only taken from the queue, so producer never gets blocked
+                if self.error is None:
+                    start_time = time.perf_counter()
+                    data = ''.join(f'{line if isinstance(line, str) else dumps(line)}\n' for line in batch)
+                    serialized_time = time.perf_counter()
+                    self.fp.write(data)
+
+                    # timed per batch, lines are counted as calls
+                    metrics.add_time('json_serialization', serialized_time - start_time, len(batch))
+                    metrics.add_time(f'write.{os.path.basename(self.file_out)}', time.perf_counter() - serialized_time,
+                                     len(batch))
+            # any error (e.g. RecursionError from serializer) is kept for producer - writer thread must go on
+            # taking batches, or producer would block on full queue forever
+            except Exception as error:
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def raise_error_if_any(self):
+        if self.error is not None:
+            raise self.error
+
+    # json_line is already serialized string or dict to serialize
+    def write(self, json_line):
+        self.batch.append(json_line)
+        self.count += 1
+
+        if len(self.batch) >= self.batch_size:
+            self.raise_error_if_any()
+            # time spent waiting for writer thread (queue is full)
+            with metrics.timer('json_writer_queue_wait'):
+                self.queue.put(self.batch)
+            self.batch = []
+
+    # waits until everything written so far is on disk
+    def flush(self):
+        if self.batch:
+            self.queue.put(self.batch)
+            self.batch = []
+
+        self.queue.join()
+        self.raise_error_if_any()
+        self.fp.flush()
+
+    def close(self):
+        if self.batch:
+            self.queue.put(self.batch)
+            self.batch = []
+
+        self.queue.put(None)
+        self.thread.join()
+        self.fp.close()
+        self.raise_error_if_any()
 
 
 class JsonBufferOut(object):
+    __slots__ = ['item_buffer', 'manif_buffer', 'expr_buffer', 'work_buffer', 'expr_data_buffer', 'work_data_buffer',
+                 'written_docs']
+
+    # six es dump streams - each one is written concurrently by its own writer thread
+    # while written docs are recorded (list, not None), keys of all written docs are appended to it
     def __init__(self, item_file_out, manif_file_out, expr_file_out,
-                 work_file_out, expr_data_file_out, work_data_file_out):
-        self.item_buffer = [item_file_out, ObjCounter(), []]
-        self.manif_buffer = [manif_file_out, ObjCounter(), []]
-        self.expr_buffer = [expr_file_out, ObjCounter(), []]
-        self.work_buffer = [work_file_out, ObjCounter(), []]
-        self.expr_data_buffer = [expr_data_file_out, ObjCounter(), []]
-        self.work_data_buffer = [work_data_file_out, ObjCounter(), []]
+                 work_file_out, expr_data_file_out, work_data_file_out, batch_size=1000, max_queued_batches=16,
+                 serializer=None):
+        self.item_buffer = JsonStreamWriter(item_file_out, batch_size, max_queued_batches,
+                                            serializer=serializer)
+        self.manif_buffer = JsonStreamWriter(manif_file_out, batch_size, max_queued_batches,
+                                             serializer=serializer)
+        self.expr_buffer = JsonStreamWriter(expr_file_out, batch_size, max_queued_batches,
+                                            serializer=serializer)
+        self.work_buffer = JsonStreamWriter(work_file_out, batch_size, max_queued_batches,
+                                            serializer=serializer)
+        self.expr_data_buffer = JsonStreamWriter(expr_data_file_out, batch_size, max_queued_batches,
+                                                 serializer=serializer)
+        self.work_data_buffer = JsonStreamWriter(work_data_file_out, batch_size, max_queued_batches,
+                                                 serializer=serializer)
+        self.written_docs = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_writers(self):
+        return [self.item_buffer, self.manif_buffer, self.expr_buffer, self.work_buffer, self.expr_data_buffer,
+                self.work_data_buffer]
+
+    def record_written_docs(self, written_docs):
+        # keys of docs written from now on are appended to given list (None - recording is stopped)
+        self.written_docs = written_docs
 
     def flush(self):
-        for b in self.__dict__.values():
-            with open(b[0], 'a', encoding='utf-8') as fp:
-                for line in b[2]:
-                    fp.write(f'{line}\n')
+        for writer in self.get_writers():
+            writer.flush()
+
+    def close(self):
+        # close all the writers, even if some of them failed - first error is raised afterwards
+        first_error = None
+
+        for writer in self.get_writers():
+            try:
+                writer.close()
+            except Exception as error:
+                first_error = first_error or error
+
+        if first_error:
+            raise first_error
+
+
+def get_doc_key(json_line):
+    # (index, type, id, routing) - everything needed to delete doc from es
+    return json_line.get('_index'), json_line.get('_type'), json_line['_id'], json_line.get('_routing')
 
 
 def write_to_json(json_line, json_buffer_out: JsonBufferOut, buffer):
-    buff = getattr(json_buffer_out, buffer)
+    getattr(json_buffer_out, buffer).write(json_line)
+
+    if json_buffer_out.written_docs is not None:
+        json_buffer_out.written_docs.append(get_doc_key(json_line))
 
-    buff[2].append(json_line)
-    buff[1].add(1)
 
-    if buff[1].count % 1000 == 0:
-        with open(buff[0], 'a', encoding='utf-8') as fp:
-            for line in buff[2]:
-                fp.write(f'{line}\n')
-        buff[2] = []
+def write_delete_actions(file_out, doc_keys):
+    # es bulk delete actions (one per line) for docs with given keys
+    with open(file_out, 'w', encoding='utf-8') as fp:
+        for index, doc_type, doc_id, routing in doc_keys:
+            action = {'_index': index, '_type': doc_type, '_id': doc_id}
+            if routing is not None:
+                action['_routing'] = routing
+            fp.write(json.dumps({'delete': action}, ensure_ascii=False) + '\n')
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+
+
+class LruCache(object):
+    __slots__ = ['maxsize', 'entries', 'hits', 'misses']
+
+    # bounded mapping - least recently used entry is evicted when there are more than maxsize entries
+    # (maxsize 0 - nothing is stored), hits and misses are counted by get
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return f'LruCache(maxsize={self.maxsize}, entries={len(self.entries)}, hits={self.hits}, misses={self.misses})'
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        try:
+            value = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
@@ -1,4 +1,6 @@
+from functools import lru_cache
 from pymarc import MARCReader
+import os
 import re
 
 
@@ -9,17 +11,156 @@ def read_marc_from_file(file):
             yield rcd
 
 
+def get_marc_file_chunks(file, chunk_size):
+    # cut iso2709 file into record-aligned byte ranges of given size (every one of them ends with the first record
+    # which reaches the size, so it's bigger by less than one record)
+    # record lengths are taken from leaders - exactly the way MARCReader frames records
+    file_size = os.path.getsize(file)
+    chunk_size = max(chunk_size, 1)
+
+    chunks = []
+    chunk_start = offset = 0
+
+    with open(file, 'rb') as fp:
+        while offset < file_size:
+            try:
+                record_length = int(fp.read(5))
+            except ValueError:
+                record_length = 0
+
+            # invalid record length - leave it for the reader of the last chunk
+            if record_length <= 0:
+                break
+
+            offset += record_length
+            fp.seek(offset)
+
+            if offset - chunk_start >= chunk_size:
+                chunks.append((chunk_start, min(offset, file_size)))
+                chunk_start = offset
+
+    if chunk_start < file_size:
+        chunks.append((chunk_start, file_size))
+
+    return chunks
+
+
+def read_marc_from_file_with_offsets(file, chunk_start=0, chunk_end=None):
+    # yields (offset of record in file, record) - reads whole file or only given chunk of it
+    with open(file, 'rb') as fp:
+        fp.seek(chunk_start)
+        rdr = MARCReader(fp, to_unicode=True, force_utf8=True, utf8_handling='ignore', permissive=True)
+        offset = chunk_start
+        for rcd in rdr:
+            yield offset, rcd
+            offset = fp.tell()
+            if chunk_end is not None and offset >= chunk_end:
+                break
+
+
+def read_raw_marc_from_file(fp, offset):
+    # raw iso2709 record starting at given offset of file opened in binary mode (length is taken from its leader)
+    fp.seek(offset)
+    record_length = int(fp.read(5))
+    fp.seek(offset)
+    return fp.read(record_length)
+
+
 def read_marc_from_binary(data_chunk):
     marc_rdr = MARCReader(data_chunk, to_unicode=True, force_utf8=True, utf8_handling='ignore', permissive=True)
     for rcd in marc_rdr:
         return rcd
 
 
+class MarcRecordView(object):
+    __slots__ = ['record', 'fields_by_tag', 'values_cache']
+
+    # read-only view of pymarc record - fields are grouped by tag once and extracted values are memoized,
+    # so repeated lookups (001, 008, 245...) don't scan all the fields again
+    # attributes not defined here (leader, as_marc, ...) are taken from the record itself
+    # record mustn't be changed while view is in use - create new view after changing it
+    def __init__(self, record):
+        self.record = record
+        self.fields_by_tag = {}
+        self.values_cache = {}
+
+        for field in record.fields:
+            self.fields_by_tag.setdefault(field.tag, []).append(field)
+
+    def __repr__(self):
+        return f'MarcRecordView(record={self.record!r})'
+
+    def __getattr__(self, name):
+        return getattr(self.record, name)
+
+    def __contains__(self, tag):
+        return tag in self.fields_by_tag
+
+    def __getitem__(self, tag):
+        fields = self.fields_by_tag.get(tag)
+        return fields[0] if fields else None
+
+    def __iter__(self):
+        return iter(self.record.fields)
+
+    def get_fields(self, *tags):
+        if not tags:
+            return self.record.fields
+        if len(tags) == 1:
+            return list(self.fields_by_tag.get(tags[0], []))
+        return [field for field in self.record.fields if field.tag in tags]
+
+    # same results as pymarc Field.value() and Field.get_subfields(), but reading flat subfields list directly
+    # instead of going through field iterator
+    @staticmethod
+    def get_field_value(raw_field):
+        subfields = getattr(raw_field, 'subfields', None)
+        if subfields is None or raw_field.is_control_field() or len(subfields) % 2:
+            return raw_field.value()
+        return ' '.join(value.strip() for value in subfields[1::2])
+
+    @staticmethod
+    def get_field_subfields(raw_field, codes):
+        subfields = getattr(raw_field, 'subfields', None)
+        if subfields is None or len(subfields) % 2:
+            return raw_field.get_subfields(*codes)
+        return [value for code, value in zip(subfields[0::2], subfields[1::2]) if code in codes]
+
+    # lists returned by both methods below are copies - callers can change them
+    def get_values(self, field):
+        key = (field, None)
+        values = self.values_cache.get(key)
+
+        if values is None:
+            values = self.values_cache[key] = tuple(self.get_field_value(raw_field)
+                                                    for raw_field in self.fields_by_tag.get(field, []))
+
+        return list(values)
+
+    def get_values_by_subfields(self, field, subfields):
+        codes = tuple(subfields)
+        key = (field, codes)
+        values = self.values_cache.get(key)
+
+        if values is None:
+            joined_subfields = (' '.join(self.get_field_subfields(raw_field, codes))
+                                for raw_field in self.fields_by_tag.get(field, []))
+            values = self.values_cache[key] = tuple(value for value in joined_subfields if value)
+
+        return list(values)
+
+
 def get_values_by_field(marc21_record, field):
+    if isinstance(marc21_record, MarcRecordView):
+        return marc21_record.get_values(field)
+
     return [v.value() for v in marc21_record.get_fields(field)]
 
 
 def get_values_by_field_and_subfield(marc21_record, field_and_subfields):
+    if isinstance(marc21_record, MarcRecordView):
+        return marc21_record.get_values_by_subfields(field_and_subfields[0], field_and_subfields[1])
+
     values_to_return = []
 
     field, subfields = field_and_subfields[0], field_and_subfields[1]
@@ -59,18 +200,18 @@ def truncate_title_from_246(value):
         return value
 
 
+NON_WORD_CHAR = re.compile(r'\W')
+LEADING_NON_WORD_CHARS = re.compile(r'^\W+')
+TRAILING_NON_WORD_CHARS = re.compile(r'\W+$')
+
+
+@lru_cache(maxsize=131072)
 def normalize_title_for_frbr_indexing(title: str):
-    match = re.finditer(r'\W', title)
-    for m_object in match:
-        title = title.replace(m_object.group(0), ' ')
+    title = NON_WORD_CHAR.sub(' ', title)
     title = title.replace('   ', ' ').replace('  ', ' ')
     title = title.upper()
-    match = re.search(r'^\W+', title)
-    if match:
-        title = title[match.span(0)[1]:]
-    match = re.search(r'\W+$', title)
-    if match:
-        title = title[:match.span(0)[0]]
+    title = LEADING_NON_WORD_CHARS.sub('', title, count=1)
+    title = TRAILING_NON_WORD_CHARS.sub('', title, count=1)
     return title
 
 
@@ -134,29 +275,18 @@ def create_jsonlines_like_dict(list_of_values, marc_object, marc_tag):
         return list_of_values
 
 
-def serialize_to_jsonl_descr(subfields_zero_list):
-    if subfields_zero_list:
-        list_to_return = []
-        for subfield_zero in subfields_zero_list:
-            d_id, d_type, d_value = subfield_zero.split('^^')
-            list_to_return.append({'id': int(d_id), 'type': d_type, 'value': d_value})
-        return list_to_return
+def serialize_to_jsonl_descr(resolved_descriptors):
+    if resolved_descriptors:
+        return [{'id': int(descr.es_id), 'type': descr.es_index, 'value': descr.name} for descr in resolved_descriptors]
     else:
-        return subfields_zero_list
+        return resolved_descriptors
 
 
-def serialize_to_jsonl_descr_creator(subfields_zero_list):
-    if subfields_zero_list:
-        list_to_return = []
-        dict_to_update = {'key': 'Autor', 'value': []}
-
-        for subfield_zero in subfields_zero_list:
-            d_id, d_type, d_value = subfield_zero.split('^^')
-            dict_to_update['value'].append({'id': int(d_id), 'type': d_type, 'value': d_value})
-        list_to_return.append(dict_to_update)
-        return list_to_return
+def serialize_to_jsonl_descr_creator(resolved_descriptors):
+    if resolved_descriptors:
+        return [{'key': 'Autor', 'value': serialize_to_jsonl_descr(resolved_descriptors)}]
     else:
-        return subfields_zero_list
+        return resolved_descriptors
 
 
 def select_number_of_creators(list_of_dicts_of_creators: list, cr_num_start=None, cr_num_end=None):
@@ -178,14 +308,8 @@ def select_number_of_creators(list_of_dicts_of_creators: list, cr_num_start=None
         return list_of_dicts_of_creators
 
 
-def serialize_to_list_of_values(subfields_zero_list):
-    if subfields_zero_list:
-        list_to_return = []
-
-        for subfield_zero in subfields_zero_list:
-            d_id, d_type, d_value = subfield_zero.split('^^')
-            list_to_return.append(d_value)
-
-        return list_to_return
+def serialize_to_list_of_values(resolved_descriptors):
+    if resolved_descriptors:
+        return [descr.name for descr in resolved_descriptors]
     else:
-        return subfields_zero_list
+        return resolved_descriptors
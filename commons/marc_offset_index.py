@@ -0,0 +1,102 @@
+import marshal
+import mmap
+import os
+
+from commons.marc_iso_commons import read_marc_from_binary
+
+
+class MarcOffsetIndex(object):
+    __slots__ = ['marc_file', 'offsets', 'records', 'fp', 'mm']
+
+    # index of records by nlp_id (001) over source iso2709 file - instead of holding records as bytes in memory,
+    # it holds only offsets of records in file, which is read through mmap (record length is taken from its leader)
+    # records added or replaced later (from bn delta files) are held as raw bytes - they take precedence over file
+    def __init__(self, marc_file, offsets=None, records=None):
+        self.marc_file = marc_file
+        self.offsets = offsets if offsets else {}
+        self.records = records if records else {}
+        self.fp = open(marc_file, 'rb')
+
+        # empty file can't be mapped (there are no records to read from it anyway)
+        try:
+            if os.fstat(self.fp.fileno()).st_size:
+                self.mm = mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.mm = None
+        except (OSError, ValueError):
+            self.fp.close()
+            raise
+
+    def __repr__(self):
+        return f'MarcOffsetIndex(marc_file={self.marc_file}, records={len(self)})'
+
+    def __contains__(self, nlp_id):
+        return nlp_id in self.records or nlp_id in self.offsets
+
+    def __len__(self):
+        return len(self.offsets.keys() | self.records.keys())
+
+    def add(self, nlp_id, offset):
+        self.offsets.setdefault(nlp_id, offset)
+
+    def replace(self, nlp_id, raw_record):
+        self.records[nlp_id] = bytes(raw_record)
+
+    def remove(self, nlp_id):
+        self.offsets.pop(nlp_id, None)
+        self.records.pop(nlp_id, None)
+
+    def get_offset_and_length(self, nlp_id):
+        offset = self.offsets.get(nlp_id)
+        if offset is not None:
+            return offset, int(self.mm[offset:offset + 5])
+
+    # zero-copy view of raw record
+    def get_view(self, nlp_id):
+        raw_record = self.records.get(nlp_id)
+        if raw_record is not None:
+            return memoryview(raw_record)
+
+        offset_and_length = self.get_offset_and_length(nlp_id)
+        if offset_and_length:
+            offset, length = offset_and_length
+            return memoryview(self.mm)[offset:offset + length]
+
+    def get_record(self, nlp_id):
+        view = self.get_view(nlp_id)
+        if view is not None:
+            return read_marc_from_binary(view.tobytes())
+
+    def save(self, index_file):
+        marc_file_stat = os.stat(self.marc_file)
+
+        with open(index_file, 'wb') as fp:
+            marshal.dump((os.path.abspath(self.marc_file), marc_file_stat.st_size, marc_file_stat.st_mtime_ns,
+                          self.offsets, self.records), fp)
+
+    # returns None if index file is stale (source file was changed after saving the index)
+    @classmethod
+    def load(cls, index_file):
+        with open(index_file, 'rb') as fp:
+            marc_file, marc_file_size, marc_file_mtime, offsets, records = marshal.load(fp)
+
+        if not os.path.exists(marc_file):
+            return None
+
+        marc_file_stat = os.stat(marc_file)
+        if marc_file_stat.st_size != marc_file_size or marc_file_stat.st_mtime_ns != marc_file_mtime:
+            return None
+
+        return cls(marc_file, offsets, records)
+
+    # pickled without open file and mmap - source file is opened again on unpickling
+    def __getstate__(self):
+        return self.marc_file, self.offsets, self.records
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def close(self):
+        if self.mm is not None:
+            self.mm.close()
+        self.fp.close()
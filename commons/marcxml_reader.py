@@ -1,17 +1,54 @@
-from pymarc import marcxml
+import xml.etree.ElementTree as ET
 
+from pymarc import Record, Field
 
-def print_rcd(r):
-    print(r)
 
+def get_local_name(tag):
+    return tag.rsplit('}', 1)[-1]
 
-def yield_record(r):
-    yield r
 
+def parse_record_element(record_element):
+    # same mapping as pymarc.marcxml.XmlHandler (non-strict - namespaces are ignored)
+    record = Record()
 
-def marcxml_reader():
-    marcxml.map_xml(yield_record, 'msib_rec_00001.xml')
+    for element in record_element:
+        element_name = get_local_name(element.tag)
+        text = element.text if element.text else ''
 
+        if element_name == 'leader':
+            record.leader = text
+        elif element_name == 'controlfield':
+            field = Field(element.get('tag'))
+            field.data = text
+            record.add_field(field)
+        elif element_name == 'datafield':
+            field = Field(element.get('tag'), [element.get('ind1', ' '), element.get('ind2', ' ')])
+            for subfield in element:
+                if get_local_name(subfield.tag) == 'subfield':
+                    field.subfields.append(subfield.get('code'))
+                    field.subfields.append(subfield.text if subfield.text else '')
+            record.add_field(field)
 
-for r in marcxml_reader():
-    print(r)
\ No newline at end of file
+    return record
+
+
+def read_marc_from_xml_file(file):
+    # streaming marcxml reader - yields records one at a time and drops already processed elements,
+    # so memory usage doesn't depend on file size
+    open_elements = []
+
+    for event, element in ET.iterparse(file, events=('start', 'end')):
+        if event == 'start':
+            open_elements.append(element)
+            continue
+
+        open_elements.pop()
+
+        if get_local_name(element.tag) == 'record':
+            record = parse_record_element(element)
+
+            if open_elements:
+                open_elements[-1].remove(element)
+            element.clear()
+
+            yield record
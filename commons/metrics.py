@@ -0,0 +1,207 @@
+import cProfile
+import json
+import logging
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+
+class Metrics(object):
+    __slots__ = ['enabled', 'counters', 'timers', 'running_timers', 'lock', 'profiler', 'trace_memory']
+
+    # counters and timers of frbrization run (phases, hot functions, rejected records...)
+    # - nothing is collected until metrics are enabled, disabled metrics cost one attribute check per call
+    # - timers: name -> [number of calls, total seconds]
+    # - counters and timers of worker processes are sent to parent as snapshots and merged there
+    # optionally whole run is profiled with cProfile and memory allocations are traced with tracemalloc
+    def __init__(self):
+        self.enabled = False
+        self.counters = {}
+        self.timers = {}
+        self.running_timers = {}
+        self.lock = threading.Lock()
+        self.profiler = None
+        self.trace_memory = False
+
+    def __repr__(self):
+        return f'Metrics(enabled={self.enabled}, counters={len(self.counters)}, timers={len(self.timers)})'
+
+    def enable(self, profile=False, trace_memory=False):
+        self.enabled = True
+
+        if profile and self.profiler is None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.trace_memory = True
+
+    def disable(self):
+        self.enabled = False
+
+        if self.profiler is not None:
+            self.profiler.disable()
+
+        if self.trace_memory:
+            tracemalloc.stop()
+            self.trace_memory = False
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.timers = {}
+            self.running_timers = {}
+
+    def count(self, name, number=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] = self.counters.get(name, 0) + number
+
+    def add_time(self, name, seconds, calls=1):
+        if self.enabled:
+            with self.lock:
+                timer = self.timers.get(name)
+                if timer is None:
+                    self.timers[name] = [calls, seconds]
+                else:
+                    timer[0] += calls
+                    timer[1] += seconds
+
+    @contextmanager
+    def timer(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    # for timing blocks which can't be easily wrapped in with statement (e.g. phases of main loop)
+    def start_timer(self, name):
+        if self.enabled:
+            self.running_timers[name] = time.perf_counter()
+
+    def stop_timer(self, name):
+        start_time = self.running_timers.pop(name, None)
+        if start_time is not None:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    def get_snapshot(self):
+        with self.lock:
+            return dict(self.counters), {name: tuple(timer) for name, timer in self.timers.items()}
+
+    def merge(self, snapshot):
+        counters, timers = snapshot
+
+        for name, number in counters.items():
+            self.count(name, number)
+        for name, (calls, seconds) in timers.items():
+            self.add_time(name, seconds, calls)
+
+    def get_report(self, top_allocations=20):
+        counters, timers = self.get_snapshot()
+
+        report = {'counters': dict(sorted(counters.items())),
+                  'timers': {name: {'calls': calls, 'seconds': round(seconds, 6)}
+                             for name, (calls, seconds) in sorted(timers.items())},
+                  'rejected_records': {name[len('rejected.'):]: number for name, number in sorted(counters.items())
+                                       if name.startswith('rejected.')},
+                  'peak_rss_bytes': get_peak_rss_bytes()}
+
+        if self.trace_memory:
+            current_size, peak_size = tracemalloc.get_traced_memory()
+            statistics = tracemalloc.take_snapshot().statistics('lineno')[:top_allocations]
+            report['traced_memory'] = {'current_bytes': current_size,
+                                       'peak_bytes': peak_size,
+                                       'top_allocations': [{'location': str(statistic.traceback),
+                                                            'size_bytes': statistic.size,
+                                                            'count': statistic.count}
+                                                           for statistic in statistics]}
+
+        return report
+
+    def write_report(self, report_file):
+        # prometheus textfile (for node exporter textfile collector) for .prom files, json otherwise
+        report = self.get_report()
+
+        with open(report_file, 'w', encoding='utf-8') as fp:
+            if report_file.endswith('.prom'):
+                fp.write(format_prometheus_report(report))
+            else:
+                json.dump(report, fp, ensure_ascii=False, indent=2)
+
+        logging.info(f'Metrics report written to {report_file}.')
+
+    def write_profile(self, profile_file):
+        if self.profiler is not None:
+            self.profiler.dump_stats(profile_file)
+            logging.info(f'Profile written to {profile_file} (read it with pstats or snakeviz).')
+
+
+def get_peak_rss_bytes():
+    # ru_maxrss is in kilobytes on linux (and in bytes on macos)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+def escape_label_value(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_prometheus_report(report, prefix='frbrizer'):
+    lines = [f'# HELP {prefix}_events_total Number of counted events of the last run.',
+             f'# TYPE {prefix}_events_total counter']
+    lines.extend(f'{prefix}_events_total{{name="{escape_label_value(name)}"}} {number}'
+                 for name, number in report['counters'].items())
+
+    lines.extend([f'# HELP {prefix}_timer_seconds_total Time spent in timed phases and functions of the last run.',
+                  f'# TYPE {prefix}_timer_seconds_total counter'])
+    lines.extend(f'{prefix}_timer_seconds_total{{name="{escape_label_value(name)}"}} {timer["seconds"]}'
+                 for name, timer in report['timers'].items())
+
+    lines.extend([f'# HELP {prefix}_timer_calls_total Number of calls of timed phases and functions of the last run.',
+                  f'# TYPE {prefix}_timer_calls_total counter'])
+    lines.extend(f'{prefix}_timer_calls_total{{name="{escape_label_value(name)}"}} {timer["calls"]}'
+                 for name, timer in report['timers'].items())
+
+    lines.extend([f'# HELP {prefix}_peak_rss_bytes Peak resident set size of the last run.',
+                  f'# TYPE {prefix}_peak_rss_bytes gauge',
+                  f'{prefix}_peak_rss_bytes {report["peak_rss_bytes"]}'])
+
+    if 'traced_memory' in report:
+        lines.extend([f'# HELP {prefix}_traced_memory_peak_bytes Peak size of memory blocks traced by tracemalloc.',
+                      f'# TYPE {prefix}_traced_memory_peak_bytes gauge',
+                      f'{prefix}_traced_memory_peak_bytes {report["traced_memory"]["peak_bytes"]}'])
+
+    return '\n'.join(lines) + '\n'
+
+
+# metrics of current process - module level, so hot functions don't need them passed around
+metrics = Metrics()
+
+
+def instrumented(name):
+    # decorator - calls of function are timed while metrics are enabled
+    def decorator(function):
+        @wraps(function)
+        def instrumented_function(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                metrics.add_time(name, time.perf_counter() - start_time)
+
+        return instrumented_function
+
+    return decorator
@@ -1,19 +1,45 @@
 import re
+from functools import lru_cache
+
+
+class NonAlnumToSpaceTable(dict):
+    # str.translate table: every char that isn't str.isalnum() becomes space, filled lazily for chars actually seen
+    def __missing__(self, code_point):
+        translated = code_point if chr(code_point).isalnum() else 32
+        self[code_point] = translated
+        return translated
+
+
+NON_ALNUM_TO_SPACE = NonAlnumToSpaceTable()
+SPACE_RUNS = re.compile(r' {2,}')
+TITLE_END_PUNCTUATION = '/:;,=.'
+ISBN_SEPARATORS = re.compile(r'[\s-]')
+ISBN = re.compile(r'97[89]\d{10}|\d{9}[\dX]')
 
 
 # 4. creators names normalization
+# same names and titles come back for every record (and again while matching works), so results are memoized
+@lru_cache(maxsize=131072)
 def prepare_name_for_indexing(descriptor_name: str) -> str:
     if descriptor_name:
         # 4.1 wszystko, co nie jest literą lub cyfrą zastępowane jest spacją
-        descriptor_name = ''.join(char.replace(char, ' ') if not char.isalnum() else char for char in descriptor_name)
+        descriptor_name = descriptor_name.translate(NON_ALNUM_TO_SPACE)
 
         # 4.2 wielokrotne białe znaki są redukowane do jednej spacji
-        match = re.finditer(r'\s{2,}', descriptor_name)
-        for m_object in match:
-            descriptor_name = descriptor_name.replace(m_object.group(0), ' ')
+        # runs of spaces are replaced one after another with str.replace (all occurrences at once), so a longer run
+        # coming after a shorter one can be left with more than one space (e.g. '  ' then '     ' gives '   ')
+        # - that happens only if run lengths ever grow, otherwise every run ends up as a single space
+        if '   ' in descriptor_name:
+            space_runs = SPACE_RUNS.findall(descriptor_name)
+            if any(len(run) < len(next_run) for run, next_run in zip(space_runs, space_runs[1:])):
+                for space_run in space_runs:
+                    descriptor_name = descriptor_name.replace(space_run, ' ')
+
+                # 4.3 białe znaki z początku i końca są usuwane, 4.4 wszystkie znaki podniesione do wielkich liter
+                return descriptor_name.strip().upper()
 
         # 4.3 białe znaki z początku i końca są usuwane
-        descriptor_name = descriptor_name.strip()
+        descriptor_name = ' '.join(descriptor_name.split())
 
         # 4.4 wszystkie znaki podniesione do wielkich liter
         descriptor_name = descriptor_name.upper()
@@ -22,14 +48,33 @@ def prepare_name_for_indexing(descriptor_name: str) -> str:
 
 
 # titles normalization
+@lru_cache(maxsize=131072)
 def normalize_title(title: str) -> str:
     if title:
         # 1 należy usunąć z początku i końca tytułu wszystkie białe znaki
         title = title.strip()
 
         # 2 należy usunąć z końca tytułu 0 lub więcej białych znaków i dowolny znak z listy [/:;,=.]
-        match = re.search(r'\s*[/:;,=.]$', title)
-        if match:
-            title = title[:match.span(0)[0]]
+        # (stripped title can only end with that char - whitespace before it goes with it)
+        if title and title[-1] in TITLE_END_PUNCTUATION:
+            title = title[:-1].rstrip()
 
         return title
+
+
+# isbns normalization (020 a/z) - isbn-10 and isbn-13 of the same book give the same value
+# values come with hyphens and qualifiers (e.g. '83-01-00000-1 (oprawa)'), values with no isbn are returned as they are
+@lru_cache(maxsize=131072)
+def normalize_isbn(isbn: str) -> str:
+    match = ISBN.search(ISBN_SEPARATORS.sub('', isbn.upper()))
+    if not match:
+        return isbn
+
+    isbn = match.group(0)
+    if len(isbn) == 13:
+        return isbn
+
+    # isbn-10 is turned into isbn-13: 978 prefix and check digit computed again (weights 1 and 3)
+    isbn = '978' + isbn[:9]
+    check_digit = -sum(int(digit) * (3 if position % 2 else 1) for position, digit in enumerate(isbn)) % 10
+    return isbn + str(check_digit)
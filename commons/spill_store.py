@@ -0,0 +1,68 @@
+import os
+import pickle
+
+
+class SpillStore(object):
+    __slots__ = ['spill_file', 'offsets', 'fp_out', 'fp_in']
+
+    # append-only store of pickled objects on disk, keyed by integer ids - only (offset, size) of every object
+    # is kept in memory, object is unpickled again every time it's read
+    # object put under existing key replaces the previous one (previous copy is left unused in file)
+    # store can be pickled (e.g. as part of checkpointed state) - spill file has to be kept with it
+    def __init__(self, spill_file):
+        self.spill_file = spill_file
+        self.offsets = {}
+        self.fp_out = None
+        self.fp_in = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(spill_file)), exist_ok=True)
+        open(spill_file, 'wb').close()
+
+    def __repr__(self):
+        return f'SpillStore(spill_file={self.spill_file}, objects={len(self.offsets)})'
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __contains__(self, key):
+        return key in self.offsets
+
+    def __iter__(self):
+        return iter(sorted(self.offsets))
+
+    def put(self, key, obj):
+        if self.fp_out is None:
+            self.fp_out = open(self.spill_file, 'ab')
+
+        data = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        self.offsets[key] = (self.fp_out.tell(), len(data))
+        self.fp_out.write(data)
+
+    def get(self, key, default=None):
+        position = self.offsets.get(key)
+        if position is None:
+            return default
+
+        if self.fp_out is not None:
+            self.fp_out.flush()
+        if self.fp_in is None:
+            self.fp_in = open(self.spill_file, 'rb')
+
+        offset, size = position
+        self.fp_in.seek(offset)
+        return pickle.loads(self.fp_in.read(size))
+
+    def close(self):
+        for fp in (self.fp_out, self.fp_in):
+            if fp is not None:
+                fp.close()
+        self.fp_out = self.fp_in = None
+
+    def __getstate__(self):
+        if self.fp_out is not None:
+            self.fp_out.flush()
+        return self.spill_file, self.offsets
+
+    def __setstate__(self, state):
+        self.spill_file, self.offsets = state
+        self.fp_out = self.fp_in = None
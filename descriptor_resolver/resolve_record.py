@@ -1,3 +1,4 @@
+from commons.metrics import instrumented
 from commons.normalization import prepare_name_for_indexing
 from exceptions.exceptions import DescriptorNotResolved
 
@@ -8,7 +9,12 @@ FIELDS_TO_CHECK = [('100', ['a', 'b', 'c', 'd']),
                    ('711', ['a', 'b', 'c', 'd', 'n', 'p'])]
 
 
+@instrumented('resolve_record')
 def resolve_record(marc_record, descr_index):
+    # returns descriptors resolved for creators fields: tag -> list of ResolvedDescriptor (in order of fields)
+    # record is rejected (DescriptorNotResolved is raised) if any of these fields can't be resolved
+    resolved_descriptors = {}
+
     for marc_field_and_subfields in FIELDS_TO_CHECK:
         fld, subflds = marc_field_and_subfields[0], marc_field_and_subfields[1]
 
@@ -23,17 +29,17 @@ def resolve_record(marc_record, descr_index):
                     raise DescriptorNotResolved
 
                 if term_to_search in descr_index:
-                    descr = descr_index.get(term_to_search)
-                    identifier = f'{descr[0]}^^{descr[1]}^^{descr[2]}'
-
-                    marc_record.remove_field(raw_fld)
-                    raw_fld.add_subfield('0', identifier)
-                    marc_record.add_ordered_field(raw_fld)
+                    resolved_descriptors.setdefault(fld, []).append(descr_index.get(term_to_search))
                 else:
                     #print(term_to_search)
                     raise DescriptorNotResolved
 
-    return marc_record
+    return resolved_descriptors
+
+
+def resolve_descriptor(value, descr_index):
+    # returns descriptor of (non-empty) field value or None, if there is no such descriptor in index
+    return descr_index.get(prepare_name_for_indexing(value))
 
 
 def resolve_field_value(field_value_list, descr_index):
@@ -41,12 +47,10 @@ def resolve_field_value(field_value_list, descr_index):
         list_to_return = []
         for val in field_value_list:
             if val:
-                term_to_search = prepare_name_for_indexing(val)
+                descriptor = resolve_descriptor(val, descr_index)
 
-                if term_to_search in descr_index:
-                    descr = descr_index.get(term_to_search)
-                    val_with_id = f'{descr[0]}^^{descr[1]}^^{descr[2]}'
-                    list_to_return.append(val_with_id)
+                if descriptor is not None:
+                    list_to_return.append(descriptor)
 
         return list_to_return
 
@@ -85,12 +89,6 @@ def resolve_code_and_serialize(code_list, code_type, code_val_index):
 
 def only_values(resolved_values_list):
     if resolved_values_list:
-        list_to_return = []
-
-        for res_val in resolved_values_list:
-            d_id, d_type, d_val = res_val.split('^^')
-            list_to_return.append(d_val)
-
-        return list_to_return
+        return [res_val.name for res_val in resolved_values_list]
     else:
         return resolved_values_list
@@ -19,4 +19,14 @@ class No008FieldFound(OmnisConverterException):
 
 class DescriptorNotResolved(OmnisConverterException):
     def __str__(self):
-        return 'Invalid record - descriptor not resolved.'
\ No newline at end of file
+        return 'Invalid record - descriptor not resolved.'
+
+
+class ManifMatchDataNotAvailable(OmnisConverterException):
+    def __str__(self):
+        return 'Invalid BN record - data for manifestation matching not available.'
+
+
+class CheckpointNotAvailable(OmnisConverterException):
+    def __str__(self):
+        return 'Cannot resume - no valid checkpoint of FRBRization state found.'
@@ -1,24 +1,41 @@
 import logging
 import sys
 import os
+from collections import deque
+from contextlib import closing
+from itertools import islice
+from multiprocessing import Pool
 
 from tqdm import tqdm
-from pymarc import parse_xml_to_array
 
-from exceptions.exceptions import DescriptorNotResolved
+from exceptions.exceptions import DescriptorNotResolved, ManifMatchDataNotAvailable, CheckpointNotAvailable
 
 from objects.work import Work
-from objects.item import MakItem
-
-from commons.marc_iso_commons import read_marc_from_file, get_values_by_field_and_subfield, get_values_by_field
-from commons.json_writer import JsonBufferOut
-from commons.debugger import FRBRDebugger
+from objects.helper_objects import ManifestationHandle
+
+from commons.marc_iso_commons import get_values_by_field_and_subfield, get_values_by_field
+from commons.marc_iso_commons import get_marc_file_chunks, read_marc_from_file_with_offsets, MarcRecordView
+from commons.marc_iso_commons import read_raw_marc_from_file
+from commons.marc_offset_index import MarcOffsetIndex
+from commons.marcxml_reader import read_marc_from_xml_file
+from commons.json_writer import JsonBufferOut, write_delete_actions
+from commons.checkpoint import FRBR_PHASES, DELTA_PHASE, WRITTEN_DOCS_PHASE, get_phases_to_run, save_checkpoint
+from commons.checkpoint import load_checkpoint, restore_output_files, get_latest_checkpoint_phase
+from commons.spill_store import SpillStore
+from commons.lru_cache import LruCache
+from commons.metrics import metrics
 
 from indexers.descriptors_indexer import index_descriptors
 from indexers.code_value_indexer import code_value_indexer
 from indexers.inst_indexer import create_lib_indexes
+from indexers.index_cache import get_index
+from indexers.descriptor_index import DescriptorIndex
+from indexers.work_match_index import WorkMatchIndex
+from indexers.work_clusters import get_work_clusters, merge_work_clusters
 
 from manifestation_matcher.manif_matcher import get_titles_for_manifestation_matching, match_manifestation
+from manifestation_matcher.manif_matcher import get_data_for_matching, get_match_data_fingerprint
+from manifestation_matcher.manif_match_data_index import BnManifMatchDataIndex
 
 from descriptor_resolver.resolve_record import resolve_record
 
@@ -84,175 +101,331 @@ def is_245_indicator_2_valid(pymarc_object):
     return True if pymarc_object.get_fields('245')[0].indicators[1] in [str(n) for n in list(range(0, 10))] else False
 
 
-def main_loop(configuration: dict):
-    indexed_works_by_uuid = {}
-    indexed_works_by_titles = {}
-    indexed_works_by_mat_nlp_id = {}
+# record has to pass all of them (in this order) to become work
+RECORD_FILTERS = [is_book_ebook_audiobook, is_single_work, has_items, is_245_indicator_2_valid]
 
-    indexed_manifestations_bn_by_nlp_id = {}
-    indexed_manifestations_bn_by_titles_245 = {}
-    indexed_manifestations_bn_by_titles_490 = {}
 
-    # prepare indexes
-    logging.info('Indexing institutions...')
-    indexed_libs_by_mak_id, indexed_libs_by_es_id = create_lib_indexes(configuration['inst_file_in'])
-    logging.info('DONE!')
+def get_rejection_reason(pymarc_object):
+    # name of the first filter record didn't pass - None, if it passed all of them
+    for record_filter in RECORD_FILTERS:
+        if not record_filter(pymarc_object):
+            return record_filter.__name__
 
-    logging.info('Indexing codes and values...')
-    indexed_code_values = code_value_indexer(configuration['code_val_file_in'])
-    logging.info('DONE!')
 
-    logging.info('Indexing descriptors...')
-    indexed_descriptors = index_descriptors(configuration['descr_files_in'])
-    logging.info('DONE!')
+def get_work_stubs(bn_records, descr_index):
+    # filter, resolve and create stub works with data needed for work matching
+    for offset, bib in bn_records:
+        bib = MarcRecordView(bib)
+        metrics.count('bn_records_read')
+
+        rejection_reason = get_rejection_reason(bib)
+        if rejection_reason:
+            metrics.count(f'rejected.{rejection_reason}')
+            continue
+
+        try:
+            resolved_descriptors = resolve_record(bib, descr_index)
+        except DescriptorNotResolved as error:
+            logging.debug(error)
+            metrics.count('rejected.descriptor_not_resolved')
+            continue
+
+        metrics.count('bn_records_accepted')
+
+        work = Work()
+        work.get_manifestation_bn_id(bib)
+        work.get_main_creator(bib, resolved_descriptors, descr_index)
+        work.get_other_creator(bib, descr_index)
+        work.get_titles(bib)
+
+        # get data for matching with mak+ once - there is no need to parse bn record again while matching
+        try:
+            manif_match_data = get_data_for_matching(bib)
+        except (IndexError, ValueError, TypeError):
+            manif_match_data = None
+
+        yield work, get_values_by_field(bib, '001')[0], offset, get_titles_for_manifestation_matching(bib), \
+            manif_match_data
+
+
+# data shared with first loop worker processes (set once per process by pool initializer)
+first_loop_worker_data = {}
+
+# bn file is processed by workers in record-aligned chunks of this size - stubs of every chunk are sent back
+# in one message, so memory used by them doesn't grow with size of the file
+BN_FILE_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def init_first_loop_worker(bn_file, descr_index_handle, metrics_enabled):
+    first_loop_worker_data['bn_file'] = bn_file
+    if metrics_enabled:
+        metrics.enable()
+    # descriptor index isn't copied to workers - they read it from shared memory block
+    first_loop_worker_data['descr_index'] = DescriptorIndex.attach(descr_index_handle)
+
+
+def process_bn_file_chunk(chunk):
+    # returns stubs and metrics collected while processing the chunk
+    metrics.reset()
+    bn_records = read_marc_from_file_with_offsets(first_loop_worker_data['bn_file'], chunk[0], chunk[1])
+
+    return [(work.as_stub(), nlp_id, offset, titles_for_manif_match, manif_match_data)
+            for work, nlp_id, offset, titles_for_manif_match, manif_match_data
+            in get_work_stubs(bn_records, first_loop_worker_data['descr_index'])], metrics.get_snapshot()
 
-    # start main loop - iterate through all bib records (only books) from BN
-    logging.info('Starting main loop...')
-    logging.info('FRBRrization step one in progress (first loop)...')
 
-    # used for limit and stats
-    counter = 0
+def get_work_stubs_in_parallel(bn_file, descr_index, workers, chunk_size=BN_FILE_CHUNK_SIZE):
+    # chunks are handed out in order, at most two per worker at a time - finished ones don't pile up in parent
+    # process if it's slower than workers; results are taken in order of chunks, so works are matched and indexed
+    # in the same order as in serial mode
+    chunks = iter(get_marc_file_chunks(bn_file, chunk_size))
 
-    for bib in tqdm(read_marc_from_file(configuration['bn_file_in'])):
-        if is_book_ebook_audiobook(bib) and is_single_work(bib) and has_items(bib) and is_245_indicator_2_valid(bib):
-            if counter > configuration['limit']:
-                break
+    descr_index_handle = descr_index.share()
 
+    try:
+        with Pool(processes=workers, initializer=init_first_loop_worker,
+                  initargs=(bn_file, descr_index_handle, metrics.enabled)) as pool:
+            pending_chunks = deque(pool.apply_async(process_bn_file_chunk, (chunk,))
+                                   for chunk in islice(chunks, workers * 2))
+
+            while pending_chunks:
+                chunk_results, chunk_metrics = pending_chunks.popleft().get()
+
+                next_chunk = next(chunks, None)
+                if next_chunk is not None:
+                    pending_chunks.append(pool.apply_async(process_bn_file_chunk, (next_chunk,)))
+
+                metrics.merge(chunk_metrics)
+                for stub, nlp_id, offset, titles_for_manif_match, manif_match_data in chunk_results:
+                    # work (and its uuid) is instantiated in parent process, which owns all the indexes
+                    yield Work.from_stub(stub), nlp_id, offset, titles_for_manif_match, manif_match_data
+    finally:
+        descr_index.unlink()
+
+
+def get_mak_matches(path_file, index_245, index_490, index_match_data, match_cache):
+    # iterate through records (pymarc Records objects) streamed from marcxml file
+    for r in read_marc_from_xml_file(path_file):
+        # check if it is not None - there are some problems with parsing
+        if r:
+            metrics.count('mak_records_read')
+            # try to match with BN manifestation - copies of the same record (from other libraries files)
+            # are matched only once, their matches are taken from cache (keyed by data for matching)
             try:
-                bib = resolve_record(bib, indexed_descriptors)
-            except DescriptorNotResolved as error:
-                logging.debug(error)
+                mak_manif_data = get_data_for_matching(MarcRecordView(r))
+                fingerprint = get_match_data_fingerprint(mak_manif_data)
+                match = match_cache.get(fingerprint)
+
+                if match is None:
+                    match = match_manifestation(mak_manif_data, index_245=index_245, index_490=index_490,
+                                                index_match_data=index_match_data)
+                    match_cache.put(fingerprint, match)
+            except (IndexError, ValueError, TypeError, ManifMatchDataNotAvailable) as error:
+                # print(error)
+                metrics.count(f'mak_match_errors.{type(error).__name__}')
                 continue
 
-            # create stub work and get from manifestation data needed for work matching
-            work = Work()
-            work.get_manifestation_bn_id(bib)
-            work.get_main_creator(bib, indexed_descriptors)
-            work.get_other_creator(bib, indexed_descriptors)
-            work.get_titles(bib)
+            if match:
+                metrics.count('mak_records_matched')
+                yield r.get_fields('AVA'), match
 
-            counter += 1
 
-            # try to match with existing work (and if there is a match: merge to one work and index by all titles)
-            # if there is no match, index new work by titles and by uuid
-            work.match_with_existing_work_and_index(indexed_works_by_uuid, indexed_works_by_titles)
+def log_match_cache_stats(hits, misses):
+    metrics.count('mak_match_cache_hits', hits)
+    metrics.count('mak_match_cache_misses', misses)
+    lookups = hits + misses
+    logging.info(f'MAK+ match cache: {hits} hits of {lookups} lookups ({hits / lookups if lookups else 0:.1%}).')
 
-            # index original bib record by bn_id - fast lookup for conversion and manifestation matching
-            indexed_manifestations_bn_by_nlp_id.setdefault(get_values_by_field(bib, '001')[0], bib.as_marc())
 
-            # index manifestation for matching with mak+ by 245 titles and 490 titles
-            titles_for_manif_match = get_titles_for_manifestation_matching(bib)
+def get_mak_matches_from_files(paths_files, index_245, index_490, index_match_data, match_cache_size):
+    # iterate through marcxml MAK+ files
+    match_cache = LruCache(match_cache_size)
 
-            for title in titles_for_manif_match.get('titles_245'):
-                indexed_manifestations_bn_by_titles_245.setdefault(title, set()).add(get_values_by_field(bib, '001')[0])
-            for title in titles_for_manif_match.get('titles_490'):
-                indexed_manifestations_bn_by_titles_490.setdefault(title, set()).add(get_values_by_field(bib, '001')[0])
+    for file_num, path_file in enumerate(paths_files, start=1):
+        logging.info(f'Parsing MAK+ file nr {file_num} - {os.path.basename(path_file)}...')
+        yield from get_mak_matches(path_file, index_245, index_490, index_match_data, match_cache)
+
+    log_match_cache_stats(match_cache.hits, match_cache.misses)
+
+
+# bn indexes shared with mak+ matcher worker processes (set once per process by pool initializer)
+mak_matcher_worker_data = {}
+
+
+def init_mak_matcher_worker(index_245, index_490, index_match_data, match_cache_size, metrics_enabled):
+    if metrics_enabled:
+        metrics.enable()
+    mak_matcher_worker_data['index_245'] = index_245
+    mak_matcher_worker_data['index_490'] = index_490
+    mak_matcher_worker_data['index_match_data'] = index_match_data
+    # every worker has its own cache, shared by all the files it matches
+    mak_matcher_worker_data['match_cache'] = LruCache(match_cache_size)
+
+
+def process_mak_file(path_file):
+    # returns matches, metrics collected while matching the file and (hits, misses) of match cache for the file
+    metrics.reset()
+    match_cache = mak_matcher_worker_data['match_cache']
+    hits, misses = match_cache.hits, match_cache.misses
+
+    file_matches = list(get_mak_matches(path_file, mak_matcher_worker_data['index_245'],
+                                        mak_matcher_worker_data['index_490'],
+                                        mak_matcher_worker_data['index_match_data'], match_cache))
 
+    return file_matches, metrics.get_snapshot(), (match_cache.hits - hits, match_cache.misses - misses)
+
+
+def get_mak_matches_in_parallel(paths_files, index_245, index_490, index_match_data, match_cache_size, workers):
+    # one file per task - workers get read-only bn indexes once (inherited through fork, not pickled per task)
+    # and send back only ava fields and matched nlp_ids; imap keeps order of files, so items are attached
+    # in the same order as in serial mode
+    # every worker has its own match cache - copies of the same record spread across files matched by different
+    # workers are matched once per worker, so the cache saves less than in serial mode
+    hits = misses = 0
+
+    with Pool(processes=workers, initializer=init_mak_matcher_worker,
+              initargs=(index_245, index_490, index_match_data, match_cache_size, metrics.enabled)) as pool:
+        for file_num, (file_matches, file_metrics, (file_hits, file_misses)) \
+                in enumerate(pool.imap(process_mak_file, paths_files), start=1):
+            metrics.merge(file_metrics)
+            hits += file_hits
+            misses += file_misses
+            logging.info(f'Matched MAK+ file nr {file_num} - {os.path.basename(paths_files[file_num - 1])}...')
+            yield from file_matches
+
+    log_match_cache_stats(hits, misses)
+
+
+def get_indexes(configuration):
+    # prepare indexes (loaded from index cache, if source files haven't changed since they were cached)
+    logging.info('Indexing institutions...')
+    indexed_libs_by_mak_id, indexed_libs_by_es_id = get_index(create_lib_indexes, configuration['inst_file_in'],
+                                                              configuration['index_cache_dir'], 'libraries')
     logging.info('DONE!')
 
-    if configuration['frbr_step_two']:
+    logging.info('Indexing codes and values...')
+    indexed_code_values = get_index(code_value_indexer, configuration['code_val_file_in'],
+                                    configuration['index_cache_dir'], 'code_values')
+    logging.info('DONE!')
 
-        logging.info('FRBRrization step two - trying to merge works using broader context (second loop)...')
+    logging.info('Indexing descriptors...')
+    indexed_descriptors = get_index(index_descriptors, configuration['descr_files_in'],
+                                    configuration['index_cache_dir'], 'descriptors')
+    logging.info('DONE!')
 
-        for work_uuid, indexed_work in tqdm(indexed_works_by_uuid.items()):
-            # check if work exists, it could've been set to None earlier in case of merging more than one work at a time
-            if indexed_work:
-                result = indexed_work.try_to_merge_possible_duplicates_using_broader_context(indexed_works_by_uuid,
-                                                                                             indexed_works_by_titles)
-                if result:
-                    indexed_works_by_uuid[work_uuid] = None
+    return indexed_libs_by_mak_id, indexed_libs_by_es_id, indexed_code_values, indexed_descriptors
 
-        logging.info('DONE!')
 
-    logging.info('Conversion in progress...')
+def record_written_docs(buffer, written_docs_by_work_id, work_id):
+    # keys of es docs written from now on are recorded by id of work (nothing is recorded without the dict)
+    if written_docs_by_work_id is not None:
+        buffer.record_written_docs(written_docs_by_work_id.setdefault(work_id, []))
 
-    for work_uuid, indexed_work in tqdm(indexed_works_by_uuid.items()):
+
+def convert_works(works, indexed_manifestations_bn_by_nlp_id, indexed_manifestations_by_mat_nlp_id, buffer, descr_index,
+                  code_val_index, spill_store=None, written_docs_by_work_id=None):
+    # works - (work id, work) pairs
+    # with spill store - expressions (with manifestations and items) of converted work are moved to it
+    for work_id, indexed_work in works:
         # do conversion, upsert expressions and instantiate manifestations and BN items
         if indexed_work:
-            print(indexed_work.titles245)
+            record_written_docs(buffer, written_docs_by_work_id, work_id)
+            logging.debug(indexed_work.titles245)
             indexed_work.convert_to_work(indexed_manifestations_bn_by_nlp_id,
-                                         configuration['buffer'],
-                                         indexed_descriptors,
-                                         indexed_code_values)
+                                         buffer,
+                                         descr_index,
+                                         code_val_index)
 
             logging.debug(f'\n{indexed_work.mock_es_id}')
 
-            for expression in indexed_work.expressions_dict.values():
+            for expression_key, expression in indexed_work.expressions_dict.items():
                 logging.debug(f'    {expression}')
 
-                for manifestation in expression.manifestations:
-                    # index works by manifestations nlp id for inserting MAK+ items
-                    indexed_works_by_mat_nlp_id.setdefault(manifestation.mat_nlp_id, indexed_work.uuid)
+                for position, manifestation in enumerate(expression.manifestations):
+                    # index manifestations by nlp id for inserting MAK+ items
+                    indexed_manifestations_by_mat_nlp_id.setdefault(
+                        manifestation.mat_nlp_id, ManifestationHandle(work_id, expression_key, position))
 
                     logging.debug(f'        {manifestation}')
                     for i in manifestation.bn_items:
                         logging.debug(f'            {i}')
 
-    logging.info('DONE!')
+            if spill_store is not None:
+                spill_store.put(work_id, indexed_work.expressions_dict)
+                indexed_work.expressions_dict = {}
 
-    if configuration['run_manif_matcher']:
+    buffer.record_written_docs(None)
 
-        logging.info('MAK+ manifestation matching in progress...')
-        list_of_files = os.listdir(configuration['mak_files_in'])
-
-        # iterate through marcxml MAK+ files
-        for file_num, filename in enumerate(list_of_files, start=1):
-            if file_num > configuration['limit_mak']:
-                break
-            else:
-                path_file = os.sep.join([configuration['mak_files_in'], filename])
-                logging.info(f'Parsing MAK+ file nr {file_num} - {filename}...')
-                parsed_xml = parse_xml_to_array(path_file)
-
-                # iterate through parsed records (pymarc Records objects)
-                for r in parsed_xml:
-                    # check if it is not None - there are some problems with parsing
-                    if r:
-                        # try to match with BN manifestation
-                        try:
-                            match = match_manifestation(r,
-                                                        index_245=indexed_manifestations_bn_by_titles_245,
-                                                        index_490=indexed_manifestations_bn_by_titles_490,
-                                                        index_id=indexed_manifestations_bn_by_nlp_id)
-                        except (IndexError, ValueError, TypeError) as error:
-                            # print(error)
-                            continue
-
-                        if match:
-                            list_ava = r.get_fields('AVA')
-
-                            w_uuid = indexed_works_by_mat_nlp_id.get(match)
-                            ref_to_work = indexed_works_by_uuid.get(w_uuid)
-
-                            # this is definitely not a best way to do it
-                            if ref_to_work:
-                                for e in ref_to_work.expressions_dict.values():
-                                    for m in e.manifestations:
-                                        if m.mat_nlp_id == match:
-                                            logging.debug('Adding mak_items...')
-                                            item_counter = 0
-                                            item_add_counter = 0
-                                            for num, ava in enumerate(list_ava, start=1):
-                                                try:
-                                                    it_to_add = MakItem(ava, indexed_libs_by_mak_id, ref_to_work,
-                                                                        e, m, buff, num)
-                                                    if it_to_add.item_local_bib_id not in m.mak_items:
-                                                        logging.debug(f'Added new mak_item - {num}')
-                                                        m.mak_items.setdefault(it_to_add.item_local_bib_id, it_to_add)
-                                                        item_counter += 1
-                                                    else:
-                                                        existing_it = m.mak_items.get(it_to_add.item_local_bib_id)
-                                                        existing_it.add(it_to_add)
-                                                        logging.debug(
-                                                            f'Increased item_count in existing mak_item - {num}.')
-                                                        item_add_counter += 1
-                                                except AttributeError as error:
-                                                    logging.debug(error)
-                                                    continue
-                                            logging.debug(
-                                                f'Added {item_counter} new mak_items, increased count {item_add_counter} times.')
-        logging.info('DONE!')
 
+def get_mak_matches_for_configuration(configuration, index_245, index_490, index_match_data):
+    list_of_files = os.listdir(configuration['mak_files_in'])[:configuration['limit_mak']]
+    paths_files = [os.sep.join([configuration['mak_files_in'], filename]) for filename in list_of_files]
+
+    if configuration['mak_workers'] > 1:
+        return get_mak_matches_in_parallel(paths_files, index_245, index_490, index_match_data,
+                                           configuration['mak_match_cache_size'], configuration['mak_workers'])
+    else:
+        return get_mak_matches_from_files(paths_files, index_245, index_490, index_match_data,
+                                          configuration['mak_match_cache_size'])
+
+
+def get_manifestation_by_handle(indexed_works, handle):
+    # returns (work, expression, manifestation) - None, if work of manifestation isn't in index any more
+    work = indexed_works.get(handle.work_id)
+    if work is None:
+        return None
+
+    expression = work.expressions_dict[handle.expression_key]
+    return work, expression, expression.manifestations[handle.manifestation_position]
+
+
+def add_mak_items(mak_matches, indexed_works, indexed_manifestations_by_mat_nlp_id, indexed_libs_by_mak_id, buffer):
+    for list_ava, match in mak_matches:
+        handle = indexed_manifestations_by_mat_nlp_id.get(match)
+        converted_manifestation = get_manifestation_by_handle(indexed_works, handle) if handle else None
+
+        if converted_manifestation:
+            work, expression, manifestation = converted_manifestation
+            logging.debug('Adding mak_items...')
+            item_counter, item_add_counter = manifestation.add_mak_items(list_ava, indexed_libs_by_mak_id, work,
+                                                                         expression, buffer)
+            logging.debug(f'Added {item_counter} new mak_items, increased count {item_add_counter} times.')
+
+
+def get_spill_store(configuration):
+    # spill store for converted works - None (everything is kept in memory) if there is no spill dir configured
+    if configuration['spill_dir']:
+        return SpillStore(os.path.join(configuration['spill_dir'], 'expressions.spill'))
+
+
+def collect_mak_matches(mak_matches, indexed_manifestations_by_mat_nlp_id, mak_matches_by_mat_nlp_id):
+    # matches are only collected (by nlp id of matched manifestation) while converted works are spilled -
+    # mak items are instantiated when works are read back from spill store
+    for list_ava, match in mak_matches:
+        if match in indexed_manifestations_by_mat_nlp_id:
+            mak_matches_by_mat_nlp_id.setdefault(match, []).append(list_ava)
+
+
+def read_spilled_works(works, spill_store, mak_matches_by_mat_nlp_id, indexed_works,
+                       indexed_manifestations_by_mat_nlp_id, indexed_libs_by_mak_id, buffer):
+    # yields (work id, work) with expressions read back from spill store and collected mak items added,
+    # expressions are released again when the next work is requested (so only one work is complete at a time)
+    for work_id, work in works:
+        work.expressions_dict = spill_store.get(work_id, {})
+
+        mat_nlp_ids = dict.fromkeys(m.mat_nlp_id for e in work.expressions_dict.values() for m in e.manifestations)
+        mak_matches = [(list_ava, mat_nlp_id) for mat_nlp_id in mat_nlp_ids
+                       if indexed_manifestations_by_mat_nlp_id[mat_nlp_id].work_id == work_id
+                       for list_ava in mak_matches_by_mat_nlp_id.pop(mat_nlp_id, [])]
+        add_mak_items(mak_matches, indexed_works, indexed_manifestations_by_mat_nlp_id, indexed_libs_by_mak_id,
+                      buffer)
+
+        yield work_id, work
+
+        work.expressions_dict = {}
+
+
+def write_works_to_dump_files(works, indexed_libs_by_es_id, buffer, written_docs_by_work_id=None):
     # loop for:
     # - adding mak items mock_es_ids
     # - serializing and writing mak items to json file
@@ -264,8 +437,9 @@ def main_loop(configuration: dict):
     # - getting mak item ids and count, manifestation ids and couun, expresions ids and count for work
     # - serializing and writing works to json file
 
-    for indexed_work in tqdm(indexed_works_by_uuid.values()):
+    for work_id, indexed_work in works:
         if indexed_work:
+            record_written_docs(buffer, written_docs_by_work_id, work_id)
             logging.debug(f'\n{indexed_work.mock_es_id}')
 
             for expression in indexed_work.expressions_dict.values():
@@ -275,11 +449,11 @@ def main_loop(configuration: dict):
 
                     for num, item in enumerate(manifestation.mak_items.values(), start=1):
                         item.mock_es_id = f'{str(num)}{str(manifestation.mock_es_id)}'
-                        item.write_to_dump_file(buff)
+                        item.write_to_dump_file(buffer)
 
                     manifestation.get_resolve_and_serialize_libraries(indexed_libs_by_es_id)
                     manifestation.get_mak_item_ids()
-                    manifestation.write_to_dump_file(buff)
+                    manifestation.write_to_dump_file(buffer)
                     logging.debug(f'        {manifestation}')
 
                     #for i in manif.bn_items:
@@ -288,19 +462,391 @@ def main_loop(configuration: dict):
                         #print(f'            MAK - {im}')
 
                 expression.get_item_ids_item_count_and_libraries()
-                expression.write_to_dump_file(buff)
+                expression.write_to_dump_file(buffer)
 
             indexed_work.get_expr_manif_item_ids_and_counts()
-            indexed_work.write_to_dump_file(buff)
+            indexed_work.write_to_dump_file(buffer)
+
+    buffer.record_written_docs(None)
+
+
+def get_enabled_phases(configuration):
+    return [phase for phase in FRBR_PHASES
+            if (phase != 'step_two' or configuration['frbr_step_two'])
+            and (phase != 'manif_matching' or configuration['run_manif_matcher'])]
+
+
+def checkpoint_frbr_state(configuration, phase, frbr_state):
+    if configuration['checkpoint_dir']:
+        save_checkpoint(configuration['checkpoint_dir'], phase, frbr_state, [configuration['bn_file_in']],
+                        configuration['buffer'])
+
+
+def start_metrics(configuration):
+    # metrics are collected only if there is a report (or profile) to write them to
+    if configuration['metrics_file'] or configuration['profile_file']:
+        metrics.reset()
+        metrics.enable(profile=bool(configuration['profile_file']), trace_memory=configuration['trace_memory'])
+
+
+def write_metrics(configuration):
+    if metrics.enabled:
+        if configuration['metrics_file']:
+            metrics.write_report(configuration['metrics_file'])
+        if configuration['profile_file']:
+            metrics.write_profile(configuration['profile_file'])
+        metrics.disable()
+
+
+def main_loop(configuration: dict):
+    start_metrics(configuration)
+
+    # run can be resumed from chosen phase - it starts from state checkpointed after the last phase before it
+    phases_to_run, checkpointed_phase = get_phases_to_run(get_enabled_phases(configuration),
+                                                          configuration['resume_from'])
 
-    logging.debug(indexed_works_by_uuid)
-    logging.debug(indexed_works_by_titles)
+    if checkpointed_phase:
+        frbr_state, output_sizes = load_checkpoint(configuration['checkpoint_dir'], checkpointed_phase,
+                                                   [configuration['bn_file_in']])
+        restore_output_files(configuration['buffer'], output_sizes)
+    else:
+        frbr_state = {'indexed_works': WorkMatchIndex(),
+                      'indexed_manifestations_by_mat_nlp_id': {},
+                      'indexed_manifestations_bn_by_nlp_id': MarcOffsetIndex(configuration['bn_file_in']),
+                      'indexed_manifestations_bn_by_titles_245': {},
+                      'indexed_manifestations_bn_by_titles_490': {},
+                      'indexed_manifestations_bn_match_data': BnManifMatchDataIndex(),
+                      'spilled_expressions': None,
+                      'mak_matches_by_mat_nlp_id': {},
+                      # needed only by delta runs, which need checkpoints anyway
+                      'written_docs_by_work_id': {} if configuration['checkpoint_dir'] else None}
+
+    # all the indexes are changed only in place, so frbr_state always holds their current state
+    indexed_works = frbr_state['indexed_works']
+    indexed_manifestations_by_mat_nlp_id = frbr_state['indexed_manifestations_by_mat_nlp_id']
+
+    indexed_manifestations_bn_by_nlp_id = frbr_state['indexed_manifestations_bn_by_nlp_id']
+    indexed_manifestations_bn_by_titles_245 = frbr_state['indexed_manifestations_bn_by_titles_245']
+    indexed_manifestations_bn_by_titles_490 = frbr_state['indexed_manifestations_bn_by_titles_490']
+    indexed_manifestations_bn_match_data = frbr_state['indexed_manifestations_bn_match_data']
+
+    metrics.start_timer('phase.indexing')
+    indexed_libs_by_mak_id, indexed_libs_by_es_id, indexed_code_values, indexed_descriptors = \
+        get_indexes(configuration)
+    metrics.stop_timer('phase.indexing')
+
+    if 'first_loop' in phases_to_run:
+        metrics.start_timer('phase.first_loop')
+        # start main loop - iterate through all bib records (only books) from BN
+        logging.info('Starting main loop...')
+        logging.info('FRBRrization step one in progress (first loop)...')
+
+        # used for limit and stats
+        counter = 0
+
+        if configuration['first_loop_workers'] > 1:
+            work_stubs = get_work_stubs_in_parallel(configuration['bn_file_in'], indexed_descriptors,
+                                                    configuration['first_loop_workers'])
+        else:
+            work_stubs = get_work_stubs(read_marc_from_file_with_offsets(configuration['bn_file_in']),
+                                        indexed_descriptors)
+
+        # generator is closed when the loop is left (limit) - parallel first loop stops its workers then
+        with closing(work_stubs):
+            for work, nlp_id, offset, titles_for_manif_match, manif_match_data in tqdm(work_stubs):
+                if counter > configuration['limit']:
+                    break
+
+                counter += 1
+
+                # try to match with existing work (and if there is a match: merge to one work and index by all titles)
+                # if there is no match, index new work by titles
+                work.match_with_existing_work_and_index(indexed_works)
+
+                # index offset of original bib record by bn_id - fast lookup for conversion and manifestation matching
+                indexed_manifestations_bn_by_nlp_id.add(nlp_id, offset)
+
+                # index manifestation for matching with mak+ by 245 titles and 490 titles
+                for title in titles_for_manif_match.get('titles_245'):
+                    indexed_manifestations_bn_by_titles_245.setdefault(title, set()).add(nlp_id)
+                for title in titles_for_manif_match.get('titles_490'):
+                    indexed_manifestations_bn_by_titles_490.setdefault(title, set()).add(nlp_id)
+
+                # index data for matching with mak+
+                indexed_manifestations_bn_match_data.add(nlp_id, manif_match_data)
+
+        if configuration['bn_offset_index_file']:
+            indexed_manifestations_bn_by_nlp_id.save(configuration['bn_offset_index_file'])
+
+        logging.info('DONE!')
+        metrics.stop_timer('phase.first_loop')
+        checkpoint_frbr_state(configuration, 'first_loop', frbr_state)
+
+    if 'step_two' in phases_to_run:
+        metrics.start_timer('phase.step_two')
+        logging.info('FRBRrization step two - trying to merge works using broader context (second loop)...')
+
+        # works are clustered first, then every cluster is merged into one work at once
+        work_clusters = get_work_clusters(indexed_works)
+        merged_works_count = merge_work_clusters(indexed_works, work_clusters)
+        logging.info(f'Merged {merged_works_count} works in {len(work_clusters)} clusters.')
+
+        logging.info('DONE!')
+        metrics.stop_timer('phase.step_two')
+        checkpoint_frbr_state(configuration, 'step_two', frbr_state)
+
+    if 'conversion' in phases_to_run:
+        metrics.start_timer('phase.conversion')
+        logging.info('Conversion in progress...')
+        frbr_state['spilled_expressions'] = get_spill_store(configuration)
+        convert_works(tqdm(indexed_works), indexed_manifestations_bn_by_nlp_id, indexed_manifestations_by_mat_nlp_id,
+                      configuration['buffer'], indexed_descriptors, indexed_code_values,
+                      frbr_state['spilled_expressions'], frbr_state['written_docs_by_work_id'])
+        logging.info('DONE!')
+        metrics.stop_timer('phase.conversion')
+        checkpoint_frbr_state(configuration, 'conversion', frbr_state)
+
+    # converted works are spilled (or were spilled by the run checkpointed after conversion)
+    spill_store = frbr_state['spilled_expressions']
+
+    if 'manif_matching' in phases_to_run:
+        metrics.start_timer('phase.manif_matching')
+        logging.info('MAK+ manifestation matching in progress...')
+        mak_matches = get_mak_matches_for_configuration(configuration,
+                                                        indexed_manifestations_bn_by_titles_245,
+                                                        indexed_manifestations_bn_by_titles_490,
+                                                        indexed_manifestations_bn_match_data)
+        if spill_store is not None:
+            collect_mak_matches(mak_matches, indexed_manifestations_by_mat_nlp_id,
+                                frbr_state['mak_matches_by_mat_nlp_id'])
+        else:
+            add_mak_items(mak_matches, indexed_works, indexed_manifestations_by_mat_nlp_id, indexed_libs_by_mak_id,
+                          configuration['buffer'])
+        logging.info('DONE!')
+        metrics.stop_timer('phase.manif_matching')
+        checkpoint_frbr_state(configuration, 'manif_matching', frbr_state)
+
+    metrics.start_timer('phase.dump')
+
+    if spill_store is not None:
+        works_to_write = read_spilled_works(indexed_works, spill_store, frbr_state['mak_matches_by_mat_nlp_id'],
+                                            indexed_works, indexed_manifestations_by_mat_nlp_id, indexed_libs_by_mak_id,
+                                            configuration['buffer'])
+    else:
+        works_to_write = indexed_works
+
+    write_works_to_dump_files(tqdm(works_to_write), indexed_libs_by_es_id, configuration['buffer'],
+                              frbr_state['written_docs_by_work_id'])
+
+    if spill_store is not None:
+        spill_store.close()
+
+    # dump phase ends when everything is written to disk
+    configuration['buffer'].flush()
+    checkpoint_frbr_state(configuration, WRITTEN_DOCS_PHASE, frbr_state['written_docs_by_work_id'])
+    metrics.stop_timer('phase.dump')
+
+    logging.debug(indexed_works)
     logging.debug(indexed_manifestations_bn_by_nlp_id)
     logging.debug(indexed_manifestations_bn_by_titles_245)
     logging.debug(indexed_manifestations_bn_by_titles_490)
 
-    #frbr_debugger = FRBRDebugger()
-    #frbr_debugger.log_indexed_works_by_uuid(indexed_works_by_uuid)
+    write_metrics(configuration)
+
+
+def get_works_by_bn_id(indexed_works):
+    return {bn_id: work_id for work_id, work in indexed_works for bn_id in work.manifestations_bn_ids}
+
+
+def remove_bn_record(nlp_id, frbr_state):
+    # record is removed from manifestation indexes - its titles for mak+ matching are taken from indexed version
+    indexed_manifestations_bn_by_nlp_id = frbr_state['indexed_manifestations_bn_by_nlp_id']
+    bib = indexed_manifestations_bn_by_nlp_id.get_record(nlp_id)
+
+    if bib:
+        titles_for_manif_match = get_titles_for_manifestation_matching(MarcRecordView(bib))
+
+        for titles_key, index_key in [('titles_245', 'indexed_manifestations_bn_by_titles_245'),
+                                      ('titles_490', 'indexed_manifestations_bn_by_titles_490')]:
+            title_index = frbr_state[index_key]
+            for title in titles_for_manif_match.get(titles_key):
+                nlp_ids = title_index.get(title)
+                if nlp_ids is not None:
+                    nlp_ids.discard(nlp_id)
+                    if not nlp_ids:
+                        del title_index[title]
+
+    frbr_state['indexed_manifestations_bn_match_data'].remove(nlp_id)
+    indexed_manifestations_bn_by_nlp_id.remove(nlp_id)
+
+
+def rebuild_work(work, indexed_manifestations_bn_by_nlp_id, descr_index):
+    # work is built again from its (remaining) records, the same way it's built in the first loop
+    # returns None if none of them is valid any more
+    bn_records = ((None, indexed_manifestations_bn_by_nlp_id.get_record(bn_id))
+                  for bn_id in sorted(work.manifestations_bn_ids))
+    rebuilt_work = None
+
+    for record_work, nlp_id, offset, titles_for_manif_match, manif_match_data \
+            in get_work_stubs(((offset, bib) for offset, bib in bn_records if bib), descr_index):
+        if rebuilt_work is None:
+            rebuilt_work = record_work
+            rebuilt_work.uuid = work.uuid
+        else:
+            record_work.merge_titles(rebuilt_work)
+            record_work.merge_manif_bn_ids(rebuilt_work)
+
+    return rebuilt_work
+
+
+def apply_bn_delta(bn_delta_file, frbr_state, descr_index):
+    # updates FRBRization state with new, changed and deleted (leader/05 = d) records from bn delta file
+    # returns (ids of affected works, ids of removed works)
+    indexed_works = frbr_state['indexed_works']
+    indexed_manifestations_bn_by_nlp_id = frbr_state['indexed_manifestations_bn_by_nlp_id']
+    indexed_manifestations_bn_match_data = frbr_state['indexed_manifestations_bn_match_data']
+
+    works_by_bn_id = get_works_by_bn_id(indexed_works)
+    changed_work_ids = set()
+    delta_records = []
+
+    # previous versions of changed and deleted records are removed from indexes and from their works
+    for offset, bib in read_marc_from_file_with_offsets(bn_delta_file):
+        if not bib:
+            continue
+
+        nlp_id = get_values_by_field(bib, '001')[0]
+
+        if nlp_id in indexed_manifestations_bn_by_nlp_id:
+            remove_bn_record(nlp_id, frbr_state)
+
+        work_id = works_by_bn_id.pop(nlp_id, None)
+        if work_id is not None:
+            indexed_works.get(work_id).manifestations_bn_ids.discard(nlp_id)
+            changed_work_ids.add(work_id)
+
+        if bib.leader[5] != 'd':
+            delta_records.append((offset, bib))
+
+    # works which lost records are rebuilt from remaining ones (removed if there are no valid records left)
+    removed_work_ids = set()
+
+    for work_id in sorted(changed_work_ids):
+        work = indexed_works.get(work_id)
+        rebuilt_work = rebuild_work(work, indexed_manifestations_bn_by_nlp_id, descr_index)
+
+        if rebuilt_work:
+            indexed_works.replace(work_id, rebuilt_work, rebuilt_work.get_title_keys_for_matching())
+        else:
+            indexed_works.remove_titles(work_id, work.get_title_keys_for_matching())
+            indexed_works.remove(work_id)
+            removed_work_ids.add(work_id)
+
+    affected_work_ids = changed_work_ids - removed_work_ids
+
+    # new and changed records are matched with works and indexed - the same way as in the first loop
+    # (raw records are kept in offset index, delta file isn't needed afterwards)
+    with open(bn_delta_file, 'rb') as fp:
+        for work, nlp_id, offset, titles_for_manif_match, manif_match_data in get_work_stubs(delta_records,
+                                                                                             descr_index):
+            affected_work_ids.add(work.match_with_existing_work_and_index(indexed_works))
+
+            indexed_manifestations_bn_by_nlp_id.replace(nlp_id, read_raw_marc_from_file(fp, offset))
+
+            for title in titles_for_manif_match.get('titles_245'):
+                frbr_state['indexed_manifestations_bn_by_titles_245'].setdefault(title, set()).add(nlp_id)
+            for title in titles_for_manif_match.get('titles_490'):
+                frbr_state['indexed_manifestations_bn_by_titles_490'].setdefault(title, set()).add(nlp_id)
+
+            indexed_manifestations_bn_match_data.add(nlp_id, manif_match_data)
+
+    return affected_work_ids, removed_work_ids
+
+
+def delta_loop(configuration: dict):
+    # incremental FRBRization of bn delta file - state checkpointed by full run (after step two or first loop)
+    # or by previous delta run is updated with records from delta file and checkpointed as delta state,
+    # only works affected by delta are converted and written to dump files - es docs written before for affected
+    # and removed works, which aren't written again, are written to es delete actions file
+    start_metrics(configuration)
+
+    state_phases = [get_phases_to_run(get_enabled_phases(configuration), 'conversion')[1], DELTA_PHASE]
+    state_phase = get_latest_checkpoint_phase(configuration['checkpoint_dir'], state_phases)
+
+    if state_phase is None:
+        raise CheckpointNotAvailable
+
+    frbr_state = load_checkpoint(configuration['checkpoint_dir'], state_phase, [configuration['bn_file_in']])[0]
+    written_docs_by_work_id = load_checkpoint(configuration['checkpoint_dir'], WRITTEN_DOCS_PHASE,
+                                              [configuration['bn_file_in']])[0]
+
+    indexed_works = frbr_state['indexed_works']
+    indexed_manifestations_bn_by_nlp_id = frbr_state['indexed_manifestations_bn_by_nlp_id']
+
+    metrics.start_timer('phase.indexing')
+    indexed_libs_by_mak_id, indexed_libs_by_es_id, indexed_code_values, indexed_descriptors = \
+        get_indexes(configuration)
+    metrics.stop_timer('phase.indexing')
+
+    metrics.start_timer('phase.delta')
+    logging.info('Applying BN delta...')
+    affected_work_ids, removed_work_ids = apply_bn_delta(configuration['bn_delta_file_in'], frbr_state,
+                                                         indexed_descriptors)
+    logging.info(f'Works affected: {len(affected_work_ids)}, works removed: {len(removed_work_ids)}.')
+
+    # state is checkpointed before conversion - works mustn't be converted in the state next delta starts from
+    save_checkpoint(configuration['checkpoint_dir'], DELTA_PHASE, frbr_state, [configuration['bn_file_in']],
+                    configuration['buffer'])
+    logging.info('DONE!')
+    metrics.stop_timer('phase.delta')
+
+    affected_works = [(work_id, indexed_works.get(work_id)) for work_id in sorted(affected_work_ids)]
+    indexed_manifestations_by_mat_nlp_id = {}
+
+    previously_written_docs = {doc_key for work_id in affected_work_ids | removed_work_ids
+                               for doc_key in written_docs_by_work_id.pop(work_id, [])}
+
+    metrics.start_timer('phase.conversion')
+    logging.info('Conversion of affected works in progress...')
+    convert_works(tqdm(affected_works), indexed_manifestations_bn_by_nlp_id, indexed_manifestations_by_mat_nlp_id,
+                  configuration['buffer'], indexed_descriptors, indexed_code_values,
+                  written_docs_by_work_id=written_docs_by_work_id)
+    logging.info('DONE!')
+    metrics.stop_timer('phase.conversion')
+
+    if configuration['run_manif_matcher']:
+        metrics.start_timer('phase.manif_matching')
+        # records are matched with all the manifestations (the same way as in full run), only matches
+        # with manifestations of affected works are kept - matching with affected ones only could choose one of them
+        # instead of equally good unaffected manifestation, which has the item already
+        logging.info('MAK+ manifestation matching of affected works in progress...')
+        affected_nlp_ids = set(indexed_manifestations_by_mat_nlp_id)
+        mak_matches = get_mak_matches_for_configuration(configuration,
+                                                        frbr_state['indexed_manifestations_bn_by_titles_245'],
+                                                        frbr_state['indexed_manifestations_bn_by_titles_490'],
+                                                        frbr_state['indexed_manifestations_bn_match_data'])
+        add_mak_items(((list_ava, match) for list_ava, match in mak_matches if match in affected_nlp_ids),
+                      indexed_works, indexed_manifestations_by_mat_nlp_id, indexed_libs_by_mak_id,
+                      configuration['buffer'])
+        logging.info('DONE!')
+        metrics.stop_timer('phase.manif_matching')
+
+    metrics.start_timer('phase.dump')
+    write_works_to_dump_files(tqdm(affected_works), indexed_libs_by_es_id, configuration['buffer'],
+                              written_docs_by_work_id)
+    configuration['buffer'].flush()
+
+    # docs of deleted records (and of removed works) are the ones which weren't written again
+    written_docs = {doc_key for work_id in affected_work_ids for doc_key in written_docs_by_work_id.get(work_id, [])}
+    deleted_docs = sorted(previously_written_docs - written_docs)
+    write_delete_actions(configuration['deleted_file_out'], deleted_docs)
+    logging.info(f'Docs to delete: {len(deleted_docs)}.')
+
+    save_checkpoint(configuration['checkpoint_dir'], WRITTEN_DOCS_PHASE, written_docs_by_work_id,
+                    [configuration['bn_file_in']], configuration['buffer'])
+    metrics.stop_timer('phase.dump')
+
+    write_metrics(configuration)
 
 
 if __name__ == '__main__':
@@ -320,7 +866,23 @@ if __name__ == '__main__':
                'run_manif_matcher': False,
                'frbr_step_two': True,
                'limit': 5000,
-               'limit_mak': 3}
-
-    main_loop(configs)
-    buff.flush()
+               'limit_mak': 3,
+               'first_loop_workers': 1,
+               'mak_workers': 1,
+               'mak_match_cache_size': 50000,
+               'bn_offset_index_file': './output/bn_offset_index.bin',
+               'index_cache_dir': './output/index_cache',
+               'checkpoint_dir': None,
+               'resume_from': None,
+               'bn_delta_file_in': None,
+               'deleted_file_out': './output/deleted.json',
+               'spill_dir': None,
+               'metrics_file': None,
+               'profile_file': None,
+               'trace_memory': False}
+
+    if configs['bn_delta_file_in']:
+        delta_loop(configs)
+    else:
+        main_loop(configs)
+    buff.close()
@@ -0,0 +1,193 @@
+from array import array
+from multiprocessing import shared_memory
+import zlib
+
+from objects.helper_objects import ResolvedDescriptor
+
+# es_id kept in es_ids array as -1 is stored as string in other_es_ids (not a canonical non-negative integer)
+NOT_INT_ES_ID = -1
+
+
+def get_key_hash(key):
+    # crc32 - unlike hash() it's the same in every process, so the table can be shared
+    return zlib.crc32(key)
+
+
+def is_int_es_id(es_id):
+    return isinstance(es_id, str) and es_id.isascii() and es_id.isdigit() and str(int(es_id)) == es_id
+
+
+class DescriptorIndex(object):
+    __slots__ = ['index_names', 'other_es_ids', 'table', 'key_offsets', 'name_offsets', 'es_ids', 'index_ids',
+                 'arena', 'shm']
+
+    # compact, read-only descriptor index: normalized name -> ResolvedDescriptor(es_id, es_index, name)
+    # - normalized names and names are utf-8 encoded into one arena (row: [normalized name][name]), with offsets
+    # - es_ids are integers, index names are interned (stored as small ids)
+    # - lookups go through open-addressing hash table of row numbers (+1, 0 marks empty slot)
+    # all the data are flat buffers, so the index can be put into shared memory and attached by worker processes
+    def __init__(self, index_names, other_es_ids, table, key_offsets, name_offsets, es_ids, index_ids, arena,
+                 shm=None):
+        self.index_names = index_names
+        self.other_es_ids = other_es_ids
+        self.table = table
+        self.key_offsets = key_offsets
+        self.name_offsets = name_offsets
+        self.es_ids = es_ids
+        self.index_ids = index_ids
+        self.arena = arena
+        self.shm = shm
+
+    def __repr__(self):
+        return f'DescriptorIndex(descriptors={len(self)})'
+
+    def __len__(self):
+        return len(self.es_ids)
+
+    def __contains__(self, indexing_name):
+        return self.find_row(indexing_name) >= 0
+
+    @classmethod
+    def from_descriptors(cls, descriptors):
+        # descriptors: iterable of (indexing_name, es_id, index, name) - first descriptor with given indexing_name wins
+        rows = {}
+        index_ids = {}
+        other_es_ids = {}
+
+        key_offsets = array('q', [0])
+        name_offsets = array('q')
+        es_ids = array('q')
+        index_ids_column = array('H')
+        arena = bytearray()
+
+        for indexing_name, es_id, index, name in descriptors:
+            if indexing_name in rows:
+                continue
+
+            row = len(es_ids)
+            rows[indexing_name] = row
+
+            arena += indexing_name.encode('utf-8', 'surrogatepass')
+            name_offsets.append(len(arena))
+            arena += name.encode('utf-8', 'surrogatepass')
+            key_offsets.append(len(arena))
+
+            if is_int_es_id(es_id):
+                es_ids.append(int(es_id))
+            else:
+                es_ids.append(NOT_INT_ES_ID)
+                other_es_ids[row] = es_id
+
+            index_ids_column.append(index_ids.setdefault(index, len(index_ids)))
+
+        table_size = 8
+        while table_size < 2 * len(es_ids):
+            table_size *= 2
+
+        table = array('q', bytes(8 * table_size))
+        mask = table_size - 1
+
+        for row in range(len(es_ids)):
+            slot = get_key_hash(arena[key_offsets[row]:name_offsets[row]]) & mask
+            while table[slot]:
+                slot = (slot + 1) & mask
+            table[slot] = row + 1
+
+        index_names = [index for index, index_id in sorted(index_ids.items(), key=lambda item: item[1])]
+
+        return cls(index_names, other_es_ids, table, key_offsets, name_offsets, es_ids, index_ids_column,
+                   bytes(arena))
+
+    def find_row(self, indexing_name):
+        if not isinstance(indexing_name, str):
+            return -1
+
+        key = indexing_name.encode('utf-8', 'surrogatepass')
+        table, key_offsets, name_offsets, arena = self.table, self.key_offsets, self.name_offsets, self.arena
+        mask = len(table) - 1
+        slot = get_key_hash(key) & mask
+
+        while True:
+            row = table[slot] - 1
+            if row < 0:
+                return -1
+            if arena[key_offsets[row]:name_offsets[row]] == key:
+                return row
+            slot = (slot + 1) & mask
+
+    def get_descriptor(self, row):
+        es_id = self.es_ids[row]
+        es_id = es_id if es_id != NOT_INT_ES_ID else self.other_es_ids[row]
+        name = str(self.arena[self.name_offsets[row]:self.key_offsets[row + 1]], 'utf-8', 'surrogatepass')
+
+        return ResolvedDescriptor(es_id, self.index_names[self.index_ids[row]], name)
+
+    # dict-like lookup, used by descriptor resolver
+    def get(self, indexing_name, default=None):
+        row = self.find_row(indexing_name)
+        return self.get_descriptor(row) if row >= 0 else default
+
+    def get_buffers(self):
+        return [('table', 'q', self.table), ('key_offsets', 'q', self.key_offsets),
+                ('name_offsets', 'q', self.name_offsets), ('es_ids', 'q', self.es_ids),
+                ('index_ids', 'H', self.index_ids), ('arena', 'B', self.arena)]
+
+    def share(self):
+        # copy index into new shared memory block and return small handle, which can be sent to other processes -
+        # they attach to the block with DescriptorIndex.attach(handle); owner has to call unlink() at the end
+        layout = []
+        size = 0
+
+        for buffer_name, buffer_format, buffer in self.get_buffers():
+            nbytes = memoryview(buffer).nbytes
+            layout.append((buffer_name, buffer_format, size, nbytes))
+            # 8-byte alignment for typed views
+            size += (nbytes + 7) // 8 * 8
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+
+        for (buffer_name, buffer_format, buffer), (name, fmt, start, nbytes) in zip(self.get_buffers(), layout):
+            self.shm.buf[start:start + nbytes] = memoryview(buffer).cast('B')
+
+        return self.shm.name, layout, self.index_names, self.other_es_ids
+
+    @classmethod
+    def attach(cls, handle):
+        shm_name, layout, index_names, other_es_ids = handle
+        shm = shared_memory.SharedMemory(name=shm_name)
+
+        buffers = {buffer_name: shm.buf[start:start + nbytes].cast(buffer_format)
+                   for buffer_name, buffer_format, start, nbytes in layout}
+
+        return cls(index_names, other_es_ids, shm=shm, **buffers)
+
+    def close(self):
+        # release views of shared memory block and detach from it
+        if self.shm is not None:
+            for buffer_name, buffer_format, buffer in self.get_buffers():
+                if isinstance(buffer, memoryview):
+                    buffer.release()
+            self.shm.close()
+
+    def unlink(self):
+        # called by owner (process which shared the index) - shared memory block is freed
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def __getstate__(self):
+        return (self.index_names, self.other_es_ids, bytes(memoryview(self.table).cast('B')),
+                bytes(memoryview(self.key_offsets).cast('B')), bytes(memoryview(self.name_offsets).cast('B')),
+                bytes(memoryview(self.es_ids).cast('B')), bytes(memoryview(self.index_ids).cast('B')),
+                bytes(self.arena))
+
+    def __setstate__(self, state):
+        self.index_names, self.other_es_ids = state[0], state[1]
+        self.table = array('q', state[2])
+        self.key_offsets = array('q', state[3])
+        self.name_offsets = array('q', state[4])
+        self.es_ids = array('q', state[5])
+        self.index_ids = array('H', state[6])
+        self.arena = state[7]
+        self.shm = None
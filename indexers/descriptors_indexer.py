@@ -4,11 +4,10 @@ import os
 from tqdm import tqdm
 
 from commons.normalization import prepare_name_for_indexing
+from indexers.descriptor_index import DescriptorIndex
 
 
-def index_descriptors(path_dir):
-    descriptors_dict = {}
-
+def read_descriptors(path_dir):
     for filename in os.listdir(path_dir):
         path_file = os.sep.join([path_dir, filename])
         with open(path_file, 'r', encoding='utf-8') as fp:
@@ -18,6 +17,8 @@ def index_descriptors(path_dir):
                 es_id = line_as_dict.get('_id')
                 name = line_as_dict.get('_source')['descr_name']
                 indexing_name = prepare_name_for_indexing(name)
-                descriptors_dict.setdefault(indexing_name, (es_id, index, name))
+                yield indexing_name, es_id, index, name
 
-    return descriptors_dict
+
+def index_descriptors(path_dir):
+    return DescriptorIndex.from_descriptors(read_descriptors(path_dir))
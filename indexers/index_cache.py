@@ -0,0 +1,99 @@
+import hashlib
+import logging
+import os
+import pickle
+
+# bump when format of any cached index changes
+INDEX_CACHE_VERSION = 2
+
+
+def get_source_files(source_path):
+    # directory is read in os.listdir order - the same one indexers use (first descriptor with given name wins)
+    if os.path.isdir(source_path):
+        return [os.path.abspath(os.sep.join([source_path, filename])) for filename in os.listdir(source_path)]
+    return [os.path.abspath(source_path)]
+
+
+def get_file_hash(path_file):
+    file_hash = hashlib.sha1()
+
+    with open(path_file, 'rb') as fp:
+        for data_chunk in iter(lambda: fp.read(1024 * 1024), b''):
+            file_hash.update(data_chunk)
+
+    return file_hash.hexdigest()
+
+
+def get_sources_state(source_files):
+    sources_state = []
+
+    for path_file in source_files:
+        file_stat = os.stat(path_file)
+        sources_state.append((path_file, file_stat.st_size, file_stat.st_mtime_ns, get_file_hash(path_file)))
+
+    return sources_state
+
+
+def is_cache_valid(cached_sources_state, source_files):
+    if [path_file for path_file, size, mtime, file_hash in cached_sources_state] != source_files:
+        return False
+
+    for path_file, size, mtime, file_hash in cached_sources_state:
+        file_stat = os.stat(path_file)
+
+        if file_stat.st_size != size:
+            return False
+        # file could only be touched or copied - content hash is checked only if mtime doesn't match
+        if file_stat.st_mtime_ns != mtime and get_file_hash(path_file) != file_hash:
+            return False
+
+    return True
+
+
+def load_index(cache_file, source_files):
+    # header (with sources state) is stored before the index, so stale cache is rejected without reading the index
+    try:
+        with open(cache_file, 'rb') as fp:
+            version, cached_sources_state = pickle.load(fp)
+
+            if version != INDEX_CACHE_VERSION or not is_cache_valid(cached_sources_state, source_files):
+                return None
+
+            return pickle.load(fp)
+    except (OSError, EOFError, ValueError, TypeError, AttributeError, ImportError, pickle.UnpicklingError):
+        return None
+
+
+def save_index(cache_file, sources_state, index):
+    # write to temporary file first, so broken cache is never left behind
+    cache_file_tmp = f'{cache_file}.tmp'
+
+    with open(cache_file_tmp, 'wb') as fp:
+        pickle.dump((INDEX_CACHE_VERSION, sources_state), fp, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(index, fp, protocol=pickle.HIGHEST_PROTOCOL)
+
+    os.replace(cache_file_tmp, cache_file)
+
+
+def get_index(create_index, source_path, cache_dir=None, cache_name=None):
+    # returns index created by create_index(source_path) - loaded from cache_dir if source files haven't changed
+    # since it was cached, built and cached otherwise (cache_dir=None - always built, nothing is cached)
+    if not cache_dir:
+        return create_index(source_path)
+
+    cache_file = os.path.join(cache_dir, f'{cache_name}.pickle')
+    source_files = get_source_files(source_path)
+
+    index = load_index(cache_file, source_files)
+    if index is not None:
+        logging.info(f'Loaded {cache_name} index from cache.')
+        return index
+
+    # state is taken before building index - if source changes meanwhile, cache will be invalidated on next run
+    sources_state = get_sources_state(source_files)
+    index = create_index(source_path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    save_index(cache_file, sources_state, index)
+
+    return index
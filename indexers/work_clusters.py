@@ -0,0 +1,66 @@
+from array import array
+
+
+class DisjointSet(object):
+    __slots__ = ['parents']
+
+    # union-find over integer ids 0..size-1 - root of every set is its lowest id
+    def __init__(self, size):
+        self.parents = array('q', range(size))
+
+    def find(self, item):
+        parents = self.parents
+
+        # path halving
+        while parents[item] != item:
+            parents[item] = parents[parents[item]]
+            item = parents[item]
+
+        return item
+
+    def union(self, item, other_item):
+        root, other_root = self.find(item), self.find(other_item)
+
+        if root < other_root:
+            self.parents[other_root] = root
+        elif other_root < root:
+            self.parents[root] = other_root
+
+
+def get_work_clusters(works_index):
+    # FRBRization step two - works are linked with their only possible duplicate found using broader context
+    # (all the titles and creators gathered in step one), linked works form clusters
+    # every link is found against the same state of index (nothing is merged yet), so clusters don't depend
+    # on order of works; returns lists of (sorted) ids of works - only clusters of more than one work
+    disjoint_set = DisjointSet(len(works_index))
+
+    for work_id, work in works_index:
+        duplicate_ids = work.get_possible_duplicates_using_broader_context(work_id, works_index)
+        if len(duplicate_ids) == 1:
+            disjoint_set.union(work_id, duplicate_ids[0])
+
+    clusters = {}
+    for work_id, work in works_index:
+        clusters.setdefault(disjoint_set.find(work_id), []).append(work_id)
+
+    return [cluster for cluster in clusters.values() if len(cluster) > 1]
+
+
+def merge_work_clusters(works_index, clusters):
+    # every cluster is merged once - into its first indexed work, which is indexed by titles of all merged works
+    # and merged works are removed from index; returns number of removed works
+    merged_works_count = 0
+
+    for cluster in clusters:
+        target_id = cluster[0]
+        target_work = works_index.get(target_id)
+
+        for work_id in cluster[1:]:
+            work = works_index.get(work_id)
+            work.merge_titles(target_work)
+            work.merge_manif_bn_ids(target_work)
+            works_index.add_titles(target_id, work.get_title_keys_for_matching())
+            works_index.remove(work_id)
+            merged_works_count += 1
+
+    return merged_works_count
@@ -0,0 +1,145 @@
+from array import array
+from bisect import bisect_left
+
+EMPTY_CREATORS = frozenset()
+
+
+class WorkMatchIndex(object):
+    __slots__ = ['works', 'ids_by_title', 'main_creators', 'other_creators', 'creator_ids', 'interned_creators']
+
+    # index of works for frbrization (matching incoming works with already indexed ones)
+    # - works get dense integer ids (position in works list, None - work merged into another one)
+    # - normalized titles are mapped to sorted arrays of work ids
+    # - creator sets are stored as interned frozensets of integer creator ids, so comparing creators of candidate
+    #   works doesn't touch Work objects at all (equal sets are the same object)
+    # creators of work are read from it only when it's added (or replaced by rebuilt work)
+    def __init__(self):
+        self.works = []
+        self.ids_by_title = {}
+        self.main_creators = []
+        self.other_creators = []
+        self.creator_ids = {}
+        self.interned_creators = {EMPTY_CREATORS: EMPTY_CREATORS}
+
+    def __repr__(self):
+        return f'WorkMatchIndex(works={len(self.works)}, titles={len(self.ids_by_title)})'
+
+    def __len__(self):
+        return len(self.works)
+
+    def __iter__(self):
+        # yields (work id, work) - works merged into other ones are skipped
+        return ((work_id, work) for work_id, work in enumerate(self.works) if work is not None)
+
+    def get(self, work_id, default=None):
+        if work_id is None or not 0 <= work_id < len(self.works):
+            return default
+        work = self.works[work_id]
+        return work if work is not None else default
+
+    def intern_creators(self, creators):
+        creator_ids = self.creator_ids
+        ids = frozenset(creator_ids.setdefault(creator, len(creator_ids)) for creator in creators)
+        return self.interned_creators.setdefault(ids, ids)
+
+    def find_matches(self, title_keys, main_creator, other_creator, exclude_id=None):
+        # returns sorted ids of works sharing any of title keys and matching by creators:
+        # - common main creator, or
+        # - the same (non-empty) set of other creators, or
+        # - no creators at all on both sides
+        ids_by_title = self.ids_by_title
+
+        candidate_ids = set()
+        for title_key in title_keys:
+            ids = ids_by_title.get(title_key)
+            if ids is not None:
+                candidate_ids.update(ids)
+
+        if not candidate_ids:
+            return []
+
+        candidate_ids.discard(exclude_id)
+
+        main_creator = self.intern_creators(main_creator)
+        other_creator = self.intern_creators(other_creator)
+        no_creators = not main_creator and not other_creator
+
+        works, main_creators, other_creators = self.works, self.main_creators, self.other_creators
+        matched_ids = []
+
+        for work_id in candidate_ids:
+            if works[work_id] is None:
+                continue
+
+            candidate_main_creator = main_creators[work_id]
+            candidate_other_creator = other_creators[work_id]
+
+            if candidate_main_creator:
+                if not candidate_main_creator.isdisjoint(main_creator):
+                    matched_ids.append(work_id)
+                    continue
+            elif not candidate_other_creator and no_creators:
+                matched_ids.append(work_id)
+                continue
+
+            if candidate_other_creator and candidate_other_creator is other_creator:
+                matched_ids.append(work_id)
+
+        matched_ids.sort()
+
+        return matched_ids
+
+    def add(self, work, title_keys):
+        work_id = len(self.works)
+
+        self.works.append(work)
+        self.main_creators.append(self.intern_creators(work.main_creator))
+        self.other_creators.append(self.intern_creators(work.other_creator))
+        self.add_titles(work_id, title_keys)
+
+        return work_id
+
+    def add_titles(self, work_id, title_keys):
+        ids_by_title = self.ids_by_title
+
+        for title_key in title_keys:
+            ids = ids_by_title.get(title_key)
+
+            if ids is None:
+                ids_by_title[title_key] = array('q', [work_id])
+            # new works get the highest ids - appended at the end
+            elif ids[-1] < work_id:
+                ids.append(work_id)
+            else:
+                position = bisect_left(ids, work_id)
+                if ids[position] != work_id:
+                    ids.insert(position, work_id)
+
+    def remove_titles(self, work_id, title_keys):
+        ids_by_title = self.ids_by_title
+
+        for title_key in title_keys:
+            ids = ids_by_title.get(title_key)
+
+            if ids is not None:
+                position = bisect_left(ids, work_id)
+                if position < len(ids) and ids[position] == work_id:
+                    if len(ids) == 1:
+                        del ids_by_title[title_key]
+                    else:
+                        del ids[position]
+
+    def replace(self, work_id, work, title_keys):
+        # work rebuilt from (part of) its records - it keeps its id, creators are read again
+        # titles it doesn't have any more are removed from index
+        previous_title_keys = self.works[work_id].get_title_keys_for_matching()
+
+        self.works[work_id] = work
+        self.main_creators[work_id] = self.intern_creators(work.main_creator)
+        self.other_creators[work_id] = self.intern_creators(work.other_creator)
+        self.remove_titles(work_id, previous_title_keys - title_keys)
+        self.add_titles(work_id, title_keys)
+
+    def remove(self, work_id):
+        # work merged into another one - it's still indexed by titles, but is never matched again
+        self.works[work_id] = None
@@ -0,0 +1,181 @@
+from array import array
+
+from commons.normalization import normalize_isbn
+from exceptions.exceptions import ManifMatchDataNotAvailable
+
+from objects.helper_objects import ManifMatchData
+
+# array('q') bounds - page numbers and formats above that are absurd anyway
+MAX_INT_VALUE = 2 ** 63 - 1
+
+# value id of empty values (no isbns, no edition)
+EMPTY_VALUE_ID = 0
+
+# value id of values which aren't in index (never equal to id of any stored value)
+MISSING_VALUE_ID = -1
+
+
+def remove_from_block(block_index, block_key, nlp_id):
+    nlp_ids = block_index[block_key]
+    nlp_ids.discard(nlp_id)
+    if not nlp_ids:
+        del block_index[block_key]
+
+
+class BnManifMatchDataIndex(object):
+    __slots__ = ['rows', 'value_ids', 'values', 'ldr_67_008', 'isbn_020_az', 'title_245_last_5',
+                 'numbers_from_title_245', 'place_pub_260_a_first_word', 'num_of_pages_300_a', 'b_format', 'edition',
+                 'without_match_data', 'by_isbn', 'by_publication']
+
+    # columnar store of data for matching of BN manifestations (only data used on BN side of matching is kept)
+    # it's computed once in the first loop, so there is no marc parsing in MAK+ matching loop
+    # - all the columns are integer arrays: values compared only for equality (ldr 6-7 with 008 06-14, last
+    #   5 chars of 245, isbns, edition...) are stored as ids of distinct values, pages and format as numbers
+    # - candidates are scored directly on columns (see manif_matcher.match_candidates)
+    # - records are also blocked by normalized isbns and by publication (ldr 6-7 with 008 06-14 and place),
+    #   every mak+ match shares one of those keys, so only title candidates in its blocks are scored
+    def __init__(self):
+        # nlp_id -> row number, -1 for records with no valid data for matching
+        self.rows = {}
+
+        # distinct values of all the columns (value -> id and id -> value), empty values have id 0
+        self.value_ids = {None: EMPTY_VALUE_ID}
+        self.values = [None]
+
+        self.ldr_67_008 = array('q')
+        self.isbn_020_az = array('q')
+        self.title_245_last_5 = array('q')
+        self.numbers_from_title_245 = array('q')
+        self.place_pub_260_a_first_word = array('q')
+        self.num_of_pages_300_a = array('q')
+        self.b_format = array('q')
+        self.edition = array('q')
+
+        # nlp_ids of records with no valid data for matching (not in any block)
+        self.without_match_data = set()
+
+        # normalized isbn -> nlp_ids, (ldr 6-7 with 008 06-14 id, place of publication id) -> nlp_ids
+        self.by_isbn = {}
+        self.by_publication = {}
+
+    def __repr__(self):
+        return f'BnManifMatchDataIndex(records={len(self.rows)}, values={len(self.values)})'
+
+    def __contains__(self, nlp_id):
+        return nlp_id in self.rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def add_value(self, value):
+        value_id = self.value_ids.get(value)
+
+        if value_id is None:
+            value_id = self.value_ids[value] = len(self.values)
+            self.values.append(value)
+
+        return value_id
+
+    def get_value_id(self, value):
+        return self.value_ids.get(value, MISSING_VALUE_ID)
+
+    # keys of values - lists are compared as tuples, empty lists (no isbns, no edition) are stored as empty value
+    @staticmethod
+    def get_ldr_67_008_key(manif_match_data):
+        return manif_match_data.ldr_67, manif_match_data.val_008_0614
+
+    @staticmethod
+    def get_list_key(values):
+        return tuple(values) if values else None
+
+    def get_block_keys(self, row):
+        isbns = self.values[self.isbn_020_az[row]] or ()
+        return ({normalize_isbn(isbn) for isbn in isbns},
+                (self.ldr_67_008[row], self.place_pub_260_a_first_word[row]))
+
+    def add(self, nlp_id, manif_match_data):
+        if nlp_id in self.rows:
+            return
+
+        if manif_match_data is None:
+            self.rows[nlp_id] = -1
+            self.without_match_data.add(nlp_id)
+            return
+
+        self.rows[nlp_id] = len(self.ldr_67_008)
+
+        self.ldr_67_008.append(self.add_value(self.get_ldr_67_008_key(manif_match_data)))
+        self.isbn_020_az.append(self.add_value(self.get_list_key(manif_match_data.isbn_020_az)))
+        self.title_245_last_5.append(self.add_value(manif_match_data.title_245[-5:]))
+        self.numbers_from_title_245.append(self.add_value(manif_match_data.numbers_from_title_245))
+        self.place_pub_260_a_first_word.append(self.add_value(manif_match_data.place_pub_260_a_first_word))
+        self.num_of_pages_300_a.append(min(manif_match_data.num_of_pages_300_a, MAX_INT_VALUE))
+        self.b_format.append(min(manif_match_data.b_format, MAX_INT_VALUE))
+        self.edition.append(self.add_value(self.get_list_key(manif_match_data.edition)))
+
+        isbn_keys, publication_key = self.get_block_keys(self.rows[nlp_id])
+        for isbn_key in isbn_keys:
+            self.by_isbn.setdefault(isbn_key, set()).add(nlp_id)
+        self.by_publication.setdefault(publication_key, set()).add(nlp_id)
+
+    # row of removed record isn't reused (columns are append-only) - it's only unreachable
+    def remove(self, nlp_id):
+        row = self.rows.pop(nlp_id, None)
+        if row is None:
+            return
+        if row == -1:
+            self.without_match_data.discard(nlp_id)
+            return
+
+        isbn_keys, publication_key = self.get_block_keys(row)
+        for isbn_key in isbn_keys:
+            remove_from_block(self.by_isbn, isbn_key, nlp_id)
+        remove_from_block(self.by_publication, publication_key, nlp_id)
+
+    def get_blocks(self, manif_match_data):
+        # blocks of bn records mak+ manifestation can be matched with - the same isbns (isbn case 2) or the same
+        # ldr/008 and place of publication (isbn case 1, in both cases required by all the rules)
+        isbn_keys = {normalize_isbn(isbn) for isbn in manif_match_data.isbn_020_az}
+        blocks = [self.by_isbn[isbn_key] for isbn_key in isbn_keys if isbn_key in self.by_isbn]
+
+        publication_key = (self.get_value_id(self.get_ldr_67_008_key(manif_match_data)),
+                           self.get_value_id(manif_match_data.place_pub_260_a_first_word))
+        if publication_key in self.by_publication:
+            blocks.append(self.by_publication[publication_key])
+
+        return blocks
+
+    def get_rows(self, nlp_ids):
+        # rows of candidates for scoring - candidate without valid data for matching fails matching of whole record
+        rows = []
+
+        for nlp_id in nlp_ids:
+            row = self.rows.get(nlp_id)
+            if row is None or row == -1:
+                raise ManifMatchDataNotAvailable
+            rows.append(row)
+
+        return rows
+
+    # returns ManifMatchData with data used for matching on BN side (titles for candidates lookup are not stored)
+    def get(self, nlp_id):
+        row = self.rows.get(nlp_id)
+
+        if row is None:
+            return None
+        if row == -1:
+            raise ManifMatchDataNotAvailable
+
+        values = self.values
+        ldr_67, val_008_0614 = values[self.ldr_67_008[row]]
+        isbn_020_az = values[self.isbn_020_az[row]]
+        edition = values[self.edition[row]]
+
+        return ManifMatchData(ldr_67=ldr_67, val_008_0614=val_008_0614,
+                              isbn_020_az=list(isbn_020_az) if isbn_020_az else [],
+                              title_245=values[self.title_245_last_5[row]], title_245_no_offset=None,
+                              title_245_with_offset=None, titles_490=None,
+                              numbers_from_title_245=values[self.numbers_from_title_245[row]],
+                              place_pub_260_a_first_word=values[self.place_pub_260_a_first_word[row]],
+                              num_of_pages_300_a=self.num_of_pages_300_a[row], b_format=self.b_format[row],
+                              edition=list(edition) if edition else [])
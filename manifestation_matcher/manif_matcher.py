@@ -1,11 +1,14 @@
 import re
 
-from commons.marc_iso_commons import get_values_by_field, get_values_by_field_and_subfield, read_marc_from_binary
+from commons.marc_iso_commons import get_values_by_field, get_values_by_field_and_subfield
 from commons.marc_iso_commons import normalize_edition_for_matching, postprocess
+from commons.metrics import instrumented
+from exceptions.exceptions import ManifMatchDataNotAvailable
 
 from objects.helper_objects import ManifMatchData
 
 
+@instrumented('get_data_for_matching')
 def get_data_for_matching(manifestation):
     ldr_67 = manifestation.leader[6:8]
     val_008_0614 = get_values_by_field(manifestation, '008')[0][6:15].replace('+', ' ')
@@ -47,9 +50,123 @@ def get_titles_for_manifestation_matching(pymarc_object):
     return {'titles_245': list(titles_to_index_245), 'titles_490': list(titles_to_index_490)}
 
 
-def match_manifestation(mak_manif, index_245=None, index_490=None, index_id=None):
-
-    mak_manif_data = get_data_for_matching(mak_manif)
+def get_isbn_cases(bn_isbn_020_az, mak_isbn_020_az):
+    # (case 1, case 2) of isbn rules: 1 - no isbns on one of sides or different lists of the same isbns,
+    # 2 - the same (non-empty) lists of isbns
+    bn_isbn_020_az = list(bn_isbn_020_az) if bn_isbn_020_az else []
+
+    if not bn_isbn_020_az or not mak_isbn_020_az:
+        return True, False
+    if bn_isbn_020_az == mak_isbn_020_az:
+        return False, True
+
+    isbns_count = len(set(bn_isbn_020_az) | set(mak_isbn_020_az))
+    return isbns_count <= len(bn_isbn_020_az) and isbns_count <= len(mak_isbn_020_az), False
+
+
+def match_candidates(candidates, mak_manif_data, index_match_data, match_by_245):
+    # scores all the candidates (in given order) directly on integer columns of bn match data index - values
+    # of mak+ manifestation are turned into ids once, so every rule is comparison of two integers
+    # scoring isn't vectorized: candidates are still scored one by one, and the cheapest rules that rule
+    # a candidate out go first (passes over whole candidate list rule by rule were slower in pure python)
+    # returns (matched with the same edition, matched with different edition) - sets of candidates nlp ids
+    # rules for candidates found by 245 titles (match_by_245) compare also titles, rules for candidates found
+    # by 490 don't (and the same isbns are enough there even with different ldr/008)
+    rows = index_match_data.get_rows(candidates)
+
+    ldr_67_008_column = index_match_data.ldr_67_008
+    isbn_column = index_match_data.isbn_020_az
+    title_245_last_5_column = index_match_data.title_245_last_5
+    numbers_from_title_245_column = index_match_data.numbers_from_title_245
+    place_pub_260_column = index_match_data.place_pub_260_a_first_word
+    num_of_pages_column = index_match_data.num_of_pages_300_a
+    b_format_column = index_match_data.b_format
+    edition_column = index_match_data.edition
+
+    get_value_id = index_match_data.get_value_id
+    mak_ldr_67_008 = get_value_id(index_match_data.get_ldr_67_008_key(mak_manif_data))
+    mak_title_245_last_5 = get_value_id(mak_manif_data.title_245[-5:])
+    mak_numbers_from_title_245 = get_value_id(mak_manif_data.numbers_from_title_245)
+    mak_place_pub_260 = get_value_id(mak_manif_data.place_pub_260_a_first_word)
+    mak_edition = get_value_id(index_match_data.get_list_key(mak_manif_data.edition))
+    mak_num_of_pages = mak_manif_data.num_of_pages_300_a
+    mak_b_format_max = mak_manif_data.b_format + 0.125 * mak_manif_data.b_format
+    mak_b_format_min = mak_manif_data.b_format - 0.125 * mak_manif_data.b_format
+
+    # isbn rules depend only on isbns of candidate - computed once for every distinct list of isbns
+    isbn_cases = {}
+
+    matched_with_edition = set()
+    matched_without_edition = set()
+
+    for candidate, row in zip(candidates, rows):
+        isbn_id = isbn_column[row]
+        isbn_case = isbn_cases.get(isbn_id)
+        if isbn_case is None:
+            isbn_case = isbn_cases[isbn_id] = get_isbn_cases(index_match_data.values[isbn_id],
+                                                             mak_manif_data.isbn_020_az)
+        isbn_case_1, isbn_case_2 = isbn_case
+
+        # isbn case 1 requires the same ldr/008 on both paths, case 2 only on 245 path
+        same_ldr_67_008 = ldr_67_008_column[row] == mak_ldr_67_008
+        if not (isbn_case_1 and same_ldr_67_008 or isbn_case_2 and (same_ldr_67_008 or not match_by_245)):
+            continue
+
+        # every rule requires number of pages (+/- 1) and format (+/- 12.5%)
+        if not (-1 <= num_of_pages_column[row] - mak_num_of_pages <= 1
+                and mak_b_format_max >= b_format_column[row] >= mak_b_format_min):
+            continue
+
+        edition = edition_column[row] == mak_edition
+        place_pub_260 = place_pub_260_column[row] == mak_place_pub_260
+
+        if match_by_245:
+            last_5_char_245 = title_245_last_5_column[row] == mak_title_245_last_5
+            num_245 = numbers_from_title_245_column[row] == mak_numbers_from_title_245
+            all_match = last_5_char_245 and num_245 and place_pub_260
+
+            # isbn case 2 - two of last 5 chars of 245, numbers from 245 and place of publication are enough
+            if edition and (all_match or isbn_case_2 and last_5_char_245 + num_245 + place_pub_260 == 2):
+                matched_with_edition.add(candidate)
+            elif all_match and not edition:
+                matched_without_edition.add(candidate)
+        else:
+            # isbn case 2 - place of publication doesn't have to match
+            if edition and (place_pub_260 or isbn_case_2):
+                matched_with_edition.add(candidate)
+            elif place_pub_260 and not edition:
+                matched_without_edition.add(candidate)
+
+    return matched_with_edition, matched_without_edition
+
+
+def get_blocked_candidates(title_candidates, blocks, index_match_data):
+    # title candidates which are in any of blocks - intersection iterates over smaller of two sets, so the most
+    # selective of title and block keys goes first (popular titles aren't iterated for books with isbns)
+    # candidate without valid data for matching fails matching of whole record, even if it isn't in any block
+    if not title_candidates.isdisjoint(index_match_data.without_match_data):
+        raise ManifMatchDataNotAvailable
+
+    blocked_candidates = set()
+
+    for block in blocks:
+        blocked_candidates.update(title_candidates & block)
+
+    return blocked_candidates
+
+
+def get_match_data_fingerprint(manif_match_data):
+    # hashable content of ManifMatchData (lists as tuples) - copies of the same mak+ record have the same fingerprint
+    # and, as all the fields are used for matching, the same match
+    return tuple(tuple(value) if isinstance(value, list) else value for value in manif_match_data)
+
+
+@instrumented('match_manifestation')
+def match_manifestation(mak_manif_data, index_245=None, index_490=None, index_match_data=None):
+    # mak_manif_data - ManifMatchData of mak+ manifestation (see get_data_for_matching)
+    # every match has the same isbns or the same ldr/008 and place of publication - only title candidates
+    # in those blocks are scored
+    blocks = index_match_data.get_blocks(mak_manif_data)
 
     candidates_245 = set()
 
@@ -57,72 +174,21 @@ def match_manifestation(mak_manif, index_245=None, index_490=None, index_id=None
     cand_2_245 = index_245.get(mak_manif_data.title_245_with_offset)
 
     if cand_1_245:
-        candidates_245.update(cand_1_245)
+        candidates_245.update(get_blocked_candidates(cand_1_245, blocks, index_match_data))
     if cand_2_245:
-        candidates_245.update(cand_2_245)
+        candidates_245.update(get_blocked_candidates(cand_2_245, blocks, index_match_data))
 
     match = False
 
-    matched_from_245_with_edition = set()
-    matched_from_245_without_edition = set()
-
-    for candidate in list(candidates_245):
-        bn_manif_data = get_data_for_matching(read_marc_from_binary(index_id.get(candidate)))
-
-        if bn_manif_data.ldr_67 == mak_manif_data.ldr_67 and bn_manif_data.val_008_0614 == mak_manif_data.val_008_0614:
-            if (bn_manif_data.isbn_020_az and mak_manif_data.isbn_020_az and \
-               bn_manif_data.isbn_020_az != mak_manif_data.isbn_020_az and \
-               len(set(bn_manif_data.isbn_020_az) | set(mak_manif_data.isbn_020_az)) <= \
-               len(bn_manif_data.isbn_020_az) and \
-               len(set(bn_manif_data.isbn_020_az) | set(mak_manif_data.isbn_020_az)) <= \
-               len(mak_manif_data.isbn_020_az)) or (not bn_manif_data.isbn_020_az or not \
-               mak_manif_data.isbn_020_az):
-                #print('ISBN case 1')
-                last_5_char_245 = bn_manif_data.title_245[-5:] == mak_manif_data.title_245[-5:]
-                num_245 = bn_manif_data.numbers_from_title_245 == mak_manif_data.numbers_from_title_245
-                place_pub_260 = bn_manif_data.place_pub_260_a_first_word == mak_manif_data.place_pub_260_a_first_word
-                num_pages = bn_manif_data.num_of_pages_300_a in [mak_manif_data.num_of_pages_300_a,
-                                                                 mak_manif_data.num_of_pages_300_a - 1,
-                                                                 mak_manif_data.num_of_pages_300_a + 1]
-                b_form = mak_manif_data.b_format + 0.125 * mak_manif_data.b_format >= bn_manif_data.b_format >= \
-                         mak_manif_data.b_format - 0.125 * mak_manif_data.b_format
-                edition = bn_manif_data.edition == mak_manif_data.edition
-
-                if last_5_char_245 and num_245 and place_pub_260 and num_pages and b_form and edition:
-                    matched_from_245_with_edition.add(candidate)
-                    #print('There is a match - no editions or editions are the same.')
-                if last_5_char_245 and num_245 and place_pub_260 and num_pages and b_form and not edition:
-                    matched_from_245_without_edition.add(candidate)
-                    #print('There is a match, but editions are different.')
-
-            if bn_manif_data.isbn_020_az and mak_manif_data.isbn_020_az and \
-               bn_manif_data.isbn_020_az == mak_manif_data.isbn_020_az:
-                #print('ISBN case 2')
-                last_5_char_245 = bn_manif_data.title_245[-5:] == mak_manif_data.title_245[-5:]
-                num_245 = bn_manif_data.numbers_from_title_245 == mak_manif_data.numbers_from_title_245
-                place_pub_260 = bn_manif_data.place_pub_260_a_first_word == mak_manif_data.place_pub_260_a_first_word
-                num_pages = bn_manif_data.num_of_pages_300_a in [mak_manif_data.num_of_pages_300_a,
-                                                                 mak_manif_data.num_of_pages_300_a - 1,
-                                                                 mak_manif_data.num_of_pages_300_a + 1]
-                b_form = mak_manif_data.b_format + 0.125 * mak_manif_data.b_format >= bn_manif_data.b_format >= \
-                         mak_manif_data.b_format - 0.125 * mak_manif_data.b_format
-                edition = bn_manif_data.edition == mak_manif_data.edition
-
-                if (num_245 and place_pub_260 and num_pages and b_form and edition and not last_5_char_245) or \
-                   (last_5_char_245 and place_pub_260 and num_pages and b_form and edition and not num_245) or \
-                   (last_5_char_245 and num_245 and num_pages and b_form and edition and not place_pub_260) or \
-                   (num_245 and place_pub_260 and num_pages and b_form and edition and last_5_char_245):
-                    matched_from_245_with_edition.add(candidate)
-                    #print('There is a match - no editions or editions are the same.')
-
-                if last_5_char_245 and place_pub_260 and num_pages and b_form and num_245 and not edition:
-                    matched_from_245_without_edition.add(candidate)
-                    #print('There is a match, but editions are different.')
+    matched_from_245_with_edition, matched_from_245_without_edition = \
+        match_candidates(list(candidates_245), mak_manif_data, index_match_data, match_by_245=True)
 
+    # of equally good matches the one with the lowest nlp id is taken (not the first one of set - order of set
+    # differs between processes, so full and delta runs could choose differently)
     if matched_from_245_with_edition:
-        return list(matched_from_245_with_edition)[0]
+        return min(matched_from_245_with_edition)
     if matched_from_245_without_edition:
-        return list(matched_from_245_without_edition)[0]
+        return min(matched_from_245_without_edition)
 
     candidates_490 = set()
 
@@ -130,63 +196,16 @@ def match_manifestation(mak_manif, index_245=None, index_490=None, index_id=None
     cand_2_490 = index_490.get(mak_manif_data.title_245_with_offset)
 
     if cand_1_490:
-        candidates_490.update(cand_1_245)
+        candidates_490.update(get_blocked_candidates(cand_1_490, blocks, index_match_data))
     if cand_2_490:
-        candidates_490.update(cand_2_245)
-
-    matched_from_490_with_edition = set()
-    matched_from_490_without_edition = set()
-
-    for candidate in list(candidates_490):
-        bn_manif_data = get_data_for_matching(read_marc_from_binary(index_id.get(candidate)))
-
-        if bn_manif_data.ldr_67 == mak_manif_data.ldr_67 and bn_manif_data.val_008_0614 == mak_manif_data.val_008_0614:
-            if (bn_manif_data.isbn_020_az and mak_manif_data.isbn_020_az and
-               bn_manif_data.isbn_020_az != mak_manif_data.isbn_020_az and
-               len(set(bn_manif_data.isbn_020_az) | set(mak_manif_data.isbn_020_az)) <=
-               len(bn_manif_data.isbn_020_az) and
-               len(set(bn_manif_data.isbn_020_az) | set(mak_manif_data.isbn_020_az)) <=
-               len(mak_manif_data.isbn_020_az)) or (not bn_manif_data.isbn_020_az or not mak_manif_data.isbn_020_az):
-
-                #print('ISBN case 1')
-                place_pub_260 = bn_manif_data.place_pub_260_a_first_word == mak_manif_data.place_pub_260_a_first_word
-                num_pages = bn_manif_data.num_of_pages_300_a in [mak_manif_data.num_of_pages_300_a,
-                                                                     mak_manif_data.num_of_pages_300_a - 1,
-                                                                     mak_manif_data.num_of_pages_300_a + 1]
-                b_form = mak_manif_data.b_format + 0.125 * mak_manif_data.b_format >= bn_manif_data.b_format >= \
-                             mak_manif_data.b_format - 0.125 * mak_manif_data.b_format
-                edition = bn_manif_data.edition == mak_manif_data.edition
-
-                if place_pub_260 and num_pages and b_form and edition:
-                    matched_from_490_with_edition.add(candidate)
-                    #print('There is a match - no editions or editions are the same.')
-                if place_pub_260 and num_pages and b_form and not edition:
-                    matched_from_490_without_edition.add(candidate)
-                    #print('There is a match, but editions are different.')
-
-        if bn_manif_data.isbn_020_az and mak_manif_data.isbn_020_az and \
-                bn_manif_data.isbn_020_az == mak_manif_data.isbn_020_az:
-            #print('ISBN case 2')
-            place_pub_260 = bn_manif_data.place_pub_260_a_first_word == mak_manif_data.place_pub_260_a_first_word
-            num_pages = bn_manif_data.num_of_pages_300_a in [mak_manif_data.num_of_pages_300_a,
-                                                             mak_manif_data.num_of_pages_300_a - 1,
-                                                             mak_manif_data.num_of_pages_300_a + 1]
-            b_form = mak_manif_data.b_format + 0.125 * mak_manif_data.b_format >= bn_manif_data.b_format >= \
-                     mak_manif_data.b_format - 0.125 * mak_manif_data.b_format
-            edition = bn_manif_data.edition == mak_manif_data.edition
-
-            if (place_pub_260 and num_pages and b_form and edition) or \
-               (num_pages and b_form and edition and not place_pub_260):
-                matched_from_490_with_edition.add(candidate)
-                #print('There is a match - no editions or editions are the same.')
-
-            if place_pub_260 and num_pages and b_form and not edition:
-                matched_from_490_without_edition.add(candidate)
-                #print('There is a match, but editions are different.')
+        candidates_490.update(get_blocked_candidates(cand_2_490, blocks, index_match_data))
+
+    matched_from_490_with_edition, matched_from_490_without_edition = \
+        match_candidates(list(candidates_490), mak_manif_data, index_match_data, match_by_245=False)
 
     if matched_from_490_with_edition:
-        return list(matched_from_490_with_edition)[0]
+        return min(matched_from_490_with_edition)
     if matched_from_490_without_edition:
-        return list(matched_from_490_without_edition)[0]
+        return min(matched_from_490_without_edition)
 
     return match
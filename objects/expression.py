@@ -1,8 +1,8 @@
-import json
 from uuid import uuid4
 
 from commons.marc_iso_commons import get_values_by_field_and_subfield, get_values_by_field, postprocess
 from commons.marc_iso_commons import serialize_to_jsonl_descr, truncate_title_proper
+from commons.json_serializer import dumps
 from commons.json_writer import write_to_json
 
 from descriptor_resolver.resolve_record import resolve_code_and_serialize, resolve_field_value
@@ -89,12 +89,12 @@ class Expression(object):
                 else 0
 
     def write_to_dump_file(self, buffer):
-        write_to_json(self.serialize_expression_for_expr_es_dump(), buffer, 'expr_buffer')
+        write_to_json(self.prepare_expression_for_expr_es_dump(), buffer, 'expr_buffer')
 
-        for jsonl in self.serialize_expression_for_expr_work_es_dump():
-            write_to_json(jsonl, buffer, 'expr_data_buffer')
+        for dict_expression_data in self.prepare_expression_for_expr_work_es_dump():
+            write_to_json(dict_expression_data, buffer, 'expr_data_buffer')
 
-    def serialize_expression_for_expr_es_dump(self):
+    def prepare_expression_for_expr_es_dump(self):
         dict_expression = {"_index": "expression", "_type": "expression", "_id": str(self.mock_es_id),
                            "_score": 1, "_source": {
                                'expr_content_type': self.expr_content_type,
@@ -112,11 +112,12 @@ class Expression(object):
                                'suggest': self.suggest,
                                'work_ids': self.work_ids}}
 
-        json_expr = json.dumps(dict_expression, ensure_ascii=False)
+        return dict_expression
 
-        return json_expr
+    def serialize_expression_for_expr_es_dump(self):
+        return dumps(self.prepare_expression_for_expr_es_dump())
 
-    def serialize_expression_for_expr_work_es_dump(self):
+    def prepare_expression_for_expr_work_es_dump(self):
         dict_expr_data_list = []
 
         for num, manif in enumerate(self.manifestations, start=1):
@@ -142,7 +143,10 @@ class Expression(object):
                                         'phrase_suggest': self.phrase_suggest,
                                         'suggest': self.suggest}}
 
-            json_expr_data = json.dumps(dict_expression_data, ensure_ascii=False)
-            dict_expr_data_list.append(json_expr_data)
+            dict_expr_data_list.append(dict_expression_data)
 
         return dict_expr_data_list
+
+    def serialize_expression_for_expr_work_es_dump(self):
+        return [dumps(dict_expression_data)
+                for dict_expression_data in self.prepare_expression_for_expr_work_es_dump()]
@@ -1,17 +1,32 @@
 from collections import namedtuple
 
 
-class ObjCounter(object):
-    __slots__ = 'count'
-
-    def __init__(self):
-        self.count = 0
+class FrequencyTable(dict):
+    __slots__ = ()
 
+    # value -> number of occurrences (plain ints, no counter object per value), order of adding is kept
     def __repr__(self):
-        return f'ObjCounter(title_count={self.count}'
+        return f'FrequencyTable({dict.__repr__(self)})'
+
+    def add(self, value, number_to_add=1):
+        self[value] = self.get(value, 0) + number_to_add
+
+    def merge(self, other_table):
+        for value, number in other_table.items():
+            self[value] = self.get(value, 0) + number
+
+    # the first (in order of adding) of the least frequent values - the same value as the first one sorted by frequency
+    def get_least_frequent(self):
+        return min(self, key=self.__getitem__)
+
+
+# descriptor resolved with descriptor index (es_id is int, unless it isn't canonical integer in descriptors dump)
+ResolvedDescriptor = namedtuple('ResolvedDescriptor', ['es_id', 'es_index', 'name'])
+
 
-    def add(self, number_to_add):
-        self.count += number_to_add
+# position of converted manifestation - work id (in work match index), key of expression in work's expressions_dict
+# and position of manifestation in list of expression's manifestations
+ManifestationHandle = namedtuple('ManifestationHandle', ['work_id', 'expression_key', 'manifestation_position'])
 
 
 ManifMatchData = namedtuple('ManifMatchData', ['ldr_67', 'val_008_0614', 'isbn_020_az', 'title_245',
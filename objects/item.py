@@ -1,10 +1,10 @@
 from uuid import uuid4
-import json
 import re
 
 from commons.marc_iso_commons import to_single_value, get_values_by_field_and_subfield, get_values_by_field
 from commons.marc_iso_commons import postprocess
 
+from commons.json_serializer import dumps
 from commons.json_writer import write_to_json
 
 import config.mock_es_id_prefixes as esid
@@ -46,7 +46,7 @@ class BnItem(object):
     def __repr__(self):
         return f'BnItem(id={self.mock_es_id}, item_count={self.item_count}, item_url={self.item_url}'
 
-    def serialize_to_es_dump(self):
+    def prepare_for_es_dump(self):
         dict_item = {"_index": "item", "_type": "item", "_id": str(self.mock_es_id),
                      "_score": 1, "_source":
                          {"expression_ids": self.expression_ids,
@@ -68,12 +68,13 @@ class BnItem(object):
                           "phrase_suggest": self.phrase_suggest,
                           "suggest": self.suggest,
                           "work_ids": self.work_ids}}
-        json_item = json.dumps(dict_item, ensure_ascii=False)
+        return dict_item
 
-        return json_item
+    def serialize_to_es_dump(self):
+        return dumps(self.prepare_for_es_dump())
 
     def write_to_dump_file(self, buffer):
-        write_to_json(self.serialize_to_es_dump(), buffer, 'item_buffer')
+        write_to_json(self.prepare_for_es_dump(), buffer, 'item_buffer')
 
 
 class PolonaItem(object):
@@ -105,7 +106,7 @@ class PolonaItem(object):
     def __repr__(self):
         return f'PolonaItem(id={self.mock_es_id}, item_count={self.item_count}, item_url={self.item_url}'
 
-    def serialize_to_es_dump(self):
+    def prepare_for_es_dump(self):
         dict_item = {"_index": "item", "_type": "item", "_id": str(self.mock_es_id),
                      "_score": 1, "_source":
                          {"expression_ids": self.expression_ids,
@@ -122,12 +123,13 @@ class PolonaItem(object):
                           "phrase_suggest": self.phrase_suggest,
                           "suggest": self.suggest,
                           "work_ids": self.work_ids}}
-        json_item = json.dumps(dict_item, ensure_ascii=False)
+        return dict_item
 
-        return json_item
+    def serialize_to_es_dump(self):
+        return dumps(self.prepare_for_es_dump())
 
     def write_to_dump_file(self, buffer):
-        write_to_json(self.serialize_to_es_dump(), buffer, 'item_buffer')
+        write_to_json(self.prepare_for_es_dump(), buffer, 'item_buffer')
 
 
 class MakItem(object):
@@ -170,7 +172,7 @@ class MakItem(object):
     def add(self, mak_item):
         self.item_count += mak_item.item_count
 
-    def serialize_to_es_dump(self):
+    def prepare_for_es_dump(self):
         dict_item = {"_index": "item", "_type": "item", "_id": str(self.mock_es_id),
                      "_score": 1, "_source":
                          {"expression_ids": self.expression_ids,
@@ -192,9 +194,10 @@ class MakItem(object):
                           "phrase_suggest": self.phrase_suggest,
                           "suggest": self.suggest,
                           "work_ids": self.work_ids}}
-        json_item = json.dumps(dict_item, ensure_ascii=False)
+        return dict_item
 
-        return json_item
+    def serialize_to_es_dump(self):
+        return dumps(self.prepare_for_es_dump())
 
     def write_to_dump_file(self, buffer):
-        write_to_json(self.serialize_to_es_dump(), buffer, 'item_buffer')
+        write_to_json(self.prepare_for_es_dump(), buffer, 'item_buffer')
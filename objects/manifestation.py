@@ -1,15 +1,16 @@
 from uuid import uuid4
-import json
+import logging
 
 from commons.marc_iso_commons import to_single_value, get_values_by_field_and_subfield, get_values_by_field
 from commons.marc_iso_commons import postprocess, truncate_title_proper, normalize_publisher
 from commons.marc_iso_commons import serialize_to_jsonl_descr
 
+from commons.json_serializer import dumps
 from commons.json_writer import write_to_json
 
 from descriptor_resolver.resolve_record import resolve_field_value, resolve_code_and_serialize, only_values
 
-from objects.item import BnItem, PolonaItem
+from objects.item import BnItem, PolonaItem, MakItem
 
 import config.mock_es_id_prefixes as esid
 
@@ -255,19 +256,44 @@ class Manifestation(object):
             self.stat_digital_library_count = 1
             self.stat_digital = True
             self.stat_public_domain = True
-            print('Instantiated polona item!')
+            logging.debug('Instantiated polona item!')
             return i
 
+    def add_mak_items(self, ava_fields, library_index, work, expression, buffer):
+        # AVA fields of matched MAK+ record - every library gets one item (counts of its items are summed up)
+        # returns (number of new items, number of items with increased count)
+        item_counter = 0
+        item_add_counter = 0
+
+        for num, ava in enumerate(ava_fields, start=1):
+            try:
+                it_to_add = MakItem(ava, library_index, work, expression, self, buffer, num)
+            except AttributeError as error:
+                logging.debug(error)
+                continue
+
+            existing_it = self.mak_items.get(it_to_add.item_local_bib_id)
+            if existing_it is None:
+                logging.debug(f'Added new mak_item - {num}')
+                self.mak_items[it_to_add.item_local_bib_id] = it_to_add
+                item_counter += 1
+            else:
+                existing_it.add(it_to_add)
+                logging.debug(f'Increased item_count in existing mak_item - {num}.')
+                item_add_counter += 1
+
+        return item_counter, item_add_counter
+
     def get_mak_item_ids(self):
         for item in self.mak_items.values():
             self.item_ids.append(int(item.mock_es_id))
             self.stat_item_count += item.item_count
 
     def write_to_dump_file(self, buffer):
-        write_to_json(self.serialize_manifestation_for_es_dump(), buffer, 'manif_buffer')
-        write_to_json(self.serialize_manifestation_popularity_object_for_es_work_dump(), buffer, 'manif_buffer')
+        write_to_json(self.prepare_manifestation_for_es_dump(), buffer, 'manif_buffer')
+        write_to_json(self.prepare_manifestation_popularity_object_for_es_work_dump(), buffer, 'manif_buffer')
 
-    def serialize_manifestation_popularity_object_for_es_work_dump(self):
+    def prepare_manifestation_popularity_object_for_es_work_dump(self):
         dict_manifestation = {"_index": "materialization", "_type": "materialization", "_id": f'p{str(self.mock_es_id)}',
                      "_score": 1, "_routing": str(self.mock_es_id), "_source": {
                          "modificationTime": self.modificationTime,
@@ -275,11 +301,12 @@ class Manifestation(object):
                          "popularity-join": {"parent": str(self.mock_es_id), "name": "popularity"}
                      }}
 
-        json_manifestation = json.dumps(dict_manifestation, ensure_ascii=False)
+        return dict_manifestation
 
-        return json_manifestation
+    def serialize_manifestation_popularity_object_for_es_work_dump(self):
+        return dumps(self.prepare_manifestation_popularity_object_for_es_work_dump())
 
-    def serialize_manifestation_for_es_dump(self):
+    def prepare_manifestation_for_es_dump(self):
         dict_manifestation = {"_index": "materialization", "_type": "materialization", "_id": self.mock_es_id,
                               "_score": 1, "_source": {
                 'eForm': self.eForm,
@@ -326,6 +353,7 @@ class Manifestation(object):
                 'work_ids': self.work_ids
             }}
 
-        json_manifestation = json.dumps(dict_manifestation, ensure_ascii=False)
+        return dict_manifestation
 
-        return json_manifestation
+    def serialize_manifestation_for_es_dump(self):
+        return dumps(self.prepare_manifestation_for_es_dump())
@@ -1,24 +1,37 @@
 from uuid import uuid4
-import json
 
 from commons.marc_iso_commons import get_values_by_field_and_subfield, get_values_by_field, postprocess
-from commons.marc_iso_commons import read_marc_from_binary, is_dbn, serialize_to_list_of_values
+from commons.marc_iso_commons import is_dbn, serialize_to_list_of_values
 from commons.marc_iso_commons import serialize_to_jsonl_descr, serialize_to_jsonl_descr_creator, normalize_publisher
-from commons.marc_iso_commons import select_number_of_creators
+from commons.marc_iso_commons import select_number_of_creators, MarcRecordView
+from commons.json_serializer import dumps
 from commons.json_writer import write_to_json
+from commons.metrics import instrumented
 from commons.validators import is_number_of_1xx_fields_valid
 from commons.normalization import prepare_name_for_indexing, normalize_title
 
 from exceptions.exceptions import TooMany1xxFields, No245FieldFoundOrTooMany245Fields, No008FieldFound
 
-from descriptor_resolver.resolve_record import resolve_field_value, only_values
+from descriptor_resolver.resolve_record import resolve_descriptor, resolve_field_value, only_values
 from descriptor_resolver.resolve_record import resolve_code, resolve_code_and_serialize
 
 from objects.expression import Expression
-from objects.helper_objects import ObjCounter
+from objects.helper_objects import FrequencyTable
 
 import config.mock_es_id_prefixes as esid
 
+# descriptor fields of work facets - (tag, subfields, work attribute), in order of resolving
+# subject and genre fields (6XX) are taken only from records catalogued with DBN
+DBN_DESCRIPTOR_FIELDS = (('600', ('a', 'b', 'c', 'd'), 'work_subject_person'),
+                         ('610', ('a', 'b', 'c', 'd', 'n', 'p'), 'work_subject_corporate_body'),
+                         ('611', ('a', 'b', 'c', 'd', 'n', 'p'), 'work_subject_event'),
+                         ('650', ('a', 'b', 'c', 'd'), 'work_subject'),
+                         ('651', ('a', 'b', 'c', 'd'), 'work_subject_place'),
+                         ('655', ('a', 'b', 'c', 'd'), 'work_genre'))
+DESCRIPTOR_FIELDS = (('658', ('a',), 'work_subject_domain'),
+                     ('380', ('a',), 'work_form'),
+                     ('386', ('a',), 'work_cultural_group'))
+
 
 class Work(object):
     __slots__ = ['uuid', 'mock_es_id', 'main_creator', 'other_creator', 'main_creator_real',
@@ -54,16 +67,17 @@ class Work(object):
         self.main_creator_real = set()
 
         self.titles240 = set()
+        # frequency tables of titles - 245 and 246 (original title) by language
         self.titles245 = {}
         self.titles245p = set()
         self.titles246_title_orig = {}
-        self.titles246_title_other = {}
+        self.titles246_title_other = FrequencyTable()
 
         # helper dict of creators for control of nonfiling characters
         self.title_with_nonf_chars = {}
 
         self.language_codes = set()
-        self.language_of_orig_codes = {}
+        self.language_of_orig_codes = FrequencyTable()
         self.language_orig = ''
         self.language_orig_obj = None
 
@@ -167,17 +181,35 @@ class Work(object):
     def __repr__(self):
         return f'Work(id={self.uuid}, title_pref={self.work_title_pref}, children={self.expressions_dict.values()}'
 
+    # compact representation of data gathered in the first loop - used for passing work stubs between processes
+    def as_stub(self):
+        return (self.manifestations_bn_ids, self.main_creator, self.other_creator, self.main_creator_real,
+                self.titles240, self.titles245, self.titles246_title_orig, self.titles246_title_other,
+                self.title_with_nonf_chars)
+
+    @classmethod
+    def from_stub(cls, stub):
+        work = cls()
+
+        (work.manifestations_bn_ids, work.main_creator, work.other_creator, work.main_creator_real,
+         work.titles240, work.titles245, work.titles246_title_orig, work.titles246_title_other,
+         work.title_with_nonf_chars) = stub
+
+        return work
+
     def get_manifestation_bn_id(self, bib_object):
         self.manifestations_bn_ids.add(get_values_by_field(bib_object, '001')[0])
 
+    # id is taken from the lowest bn id, so it doesn't depend on order of set (which differs between processes)
     def create_mock_es_data_index_id(self):
-        self.mock_es_id = str(esid.WORK_PREFIX + str(list(self.manifestations_bn_ids)[0][1:]))
+        self.mock_es_id = str(esid.WORK_PREFIX + str(min(self.manifestations_bn_ids)[1:]))
 
     # 3.1.1
-    def get_main_creator(self, bib_object, descr_index):
-        list_val_100abcd = get_values_by_field_and_subfield(bib_object, ('100', ['0']))
-        list_val_110abcdn = get_values_by_field_and_subfield(bib_object, ('110', ['0']))
-        list_val_111abcdn = get_values_by_field_and_subfield(bib_object, ('111', ['0']))
+    def get_main_creator(self, bib_object, resolved_descriptors, descr_index):
+        # 1XX descriptors are already resolved (by resolve_record)
+        list_val_100abcd = resolved_descriptors.get('100', [])
+        list_val_110abcdn = resolved_descriptors.get('110', [])
+        list_val_111abcdn = resolved_descriptors.get('111', [])
 
         # validate number of 1XX fields in record and raise exception if not
         is_number_of_1xx_fields_valid(list_val_100abcd, list_val_110abcdn, list_val_111abcdn)
@@ -336,26 +368,20 @@ class Work(object):
             to_add = list_val_245a[0]
 
             try:
-                self.titles245.setdefault(lang_008,
-                                          {}).setdefault(to_add[int(title_245_raw_ind[1]):],
-                                                         ObjCounter()).add(1)
+                self.titles245.setdefault(lang_008, FrequencyTable()).add(to_add[int(title_245_raw_ind[1]):])
 
                 self.title_with_nonf_chars.setdefault(to_add[int(title_245_raw_ind[1]):],
                                                       set()).add(to_add)
             except ValueError as err:
                 #print(err)
-                self.titles245.setdefault(lang_008,
-                                          {}).setdefault(to_add,
-                                                         ObjCounter()).add(1)
+                self.titles245.setdefault(lang_008, FrequencyTable()).add(to_add)
 
                 self.title_with_nonf_chars.setdefault(to_add,
                                                       set()).add(to_add)
         if list_val_245p:
             to_add = list_val_245p[0]
 
-            self.titles245.setdefault(lang_008,
-                                      {}).setdefault(to_add,
-                                                     ObjCounter()).add(1)
+            self.titles245.setdefault(lang_008, FrequencyTable()).add(to_add)
 
             self.title_with_nonf_chars.setdefault(to_add,
                                                   set()).add(to_add)
@@ -364,16 +390,14 @@ class Work(object):
             to_add = list_val_245ab[0]
 
             try:
-                self.titles245.setdefault(lang_008, {}).setdefault(to_add[int(title_245_raw_ind[1]):],
-                                                                   ObjCounter()).add(1)
+                self.titles245.setdefault(lang_008, FrequencyTable()).add(to_add[int(title_245_raw_ind[1]):])
 
                 self.title_with_nonf_chars.setdefault(to_add[int(title_245_raw_ind[1]):],
                                                       set()).add(to_add)
 
             except ValueError as err:
                 #print(err)
-                self.titles245.setdefault(lang_008, {}).setdefault(to_add,
-                                                                   ObjCounter()).add(1)
+                self.titles245.setdefault(lang_008, FrequencyTable()).add(to_add)
 
                 self.title_with_nonf_chars.setdefault(to_add,
                                                       set()).add(to_add)
@@ -398,12 +422,11 @@ class Work(object):
         lang_041_h = get_values_by_field_and_subfield(bib_object, ('041', ['h']))
 
         if len(lang_041_h) == 1 and len(list_val_246_title_orig) == 1:
-            self.titles246_title_orig.setdefault(lang_041_h[0], {}).setdefault(list_val_246_title_orig[0],
-                                                                               ObjCounter()).add(1)
+            self.titles246_title_orig.setdefault(lang_041_h[0], FrequencyTable()).add(list_val_246_title_orig[0])
 
         list_val_246_other = postprocess(normalize_title, list_val_246_other)
         for val in list_val_246_other:
-            self.titles246_title_other.setdefault(val, ObjCounter()).add(1)
+            self.titles246_title_other.add(val)
 
         # get title from 240 field
         title_240_raw_list = bib_object.get_fields('240')
@@ -424,19 +447,13 @@ class Work(object):
 
     def merge_titles(self, matched_work):
 
-        for title_lang, title_dict in self.titles245.items():
-            for title, title_count in title_dict.items():
-                matched_work.titles245.setdefault(title_lang, {}).setdefault(title,
-                                                                             ObjCounter()).add(title_count.count)
+        for title_lang, title_table in self.titles245.items():
+            matched_work.titles245.setdefault(title_lang, FrequencyTable()).merge(title_table)
 
-        for title_lang, title_dict in self.titles246_title_orig.items():
-            for title, title_count in title_dict.items():
-                matched_work.titles246_title_orig.setdefault(title_lang,
-                                                             {}).setdefault(title,
-                                                                            ObjCounter()).add(title_count.count)
+        for title_lang, title_table in self.titles246_title_orig.items():
+            matched_work.titles246_title_orig.setdefault(title_lang, FrequencyTable()).merge(title_table)
 
-        for title, title_count in self.titles246_title_other.items():
-            matched_work.titles246_title_other.setdefault(title, ObjCounter()).add(title_count.count)
+        matched_work.titles246_title_other.merge(self.titles246_title_other)
 
         matched_work.titles240.update(self.titles240)
 
@@ -461,26 +478,21 @@ class Work(object):
     def calculate_title_pref(self):
         polish_titles = self.titles245.get('pol')
         if polish_titles:
-            polish_titles_sorted_by_frequency = sorted(polish_titles.items(), key=lambda x: x[1].count)
-            self.work_title_pref = list(self.title_with_nonf_chars.get(polish_titles_sorted_by_frequency[0][0]))[0]
+            self.work_title_pref = list(self.title_with_nonf_chars.get(polish_titles.get_least_frequent()))[0]
         else:
             self.work_title_pref = self.work_title_of_orig_pref
 
     def calculate_title_of_orig_pref(self):
         orig_titles = self.titles246_title_orig
         if orig_titles:
-            orig_titles_flattened = []
-            for title_dict in orig_titles.values():
-                for title, count in title_dict.items():
-                    orig_titles_flattened.append((title, count))
-            orig_titles_sorted_by_frequency = sorted(orig_titles_flattened, key=lambda x: x[1].count)
-            self.work_title_of_orig_pref = orig_titles_sorted_by_frequency[0][0]
+            # the first of the least frequent titles of all the languages
+            self.work_title_of_orig_pref = min(((title, count) for title_table in orig_titles.values()
+                                                for title, count in title_table.items()), key=lambda x: x[1])[0]
         else:
             orig_titles_from_245 = self.titles245.get(self.language_orig)
             if orig_titles_from_245:
-                orig_titles_from_245_sorted_by_frequency = sorted(orig_titles_from_245.items(),
-                                                                  key=lambda x: x[1].count)
-                self.work_title_of_orig_pref = list(self.title_with_nonf_chars.get(orig_titles_from_245_sorted_by_frequency[0][0]))[0]
+                self.work_title_of_orig_pref = list(self.title_with_nonf_chars.get(
+                    orig_titles_from_245.get_least_frequent()))[0]
             else:
                 for title_dict in self.titles245.values():
                     for title in title_dict.keys():
@@ -492,9 +504,9 @@ class Work(object):
         lang_041_h = get_values_by_field_and_subfield(bib_object, ('041', ['h']))
 
         if lang_008 and not lang_041_h:
-            self.language_of_orig_codes.setdefault(lang_008, ObjCounter()).add(1)
+            self.language_of_orig_codes.add(lang_008)
         if len(lang_041_h) == 1:
-            self.language_of_orig_codes.setdefault(lang_041_h[0], ObjCounter()).add(1)
+            self.language_of_orig_codes.add(lang_041_h[0])
 
     def get_languages(self, bib_object):
         lang_008 = get_values_by_field(bib_object, '008')[0][35:38]
@@ -504,300 +516,48 @@ class Work(object):
         self.language_codes.update(lang_041_h)
 
     def calculate_lang_orig(self):
-        try:
-            self.language_orig = sorted(self.language_of_orig_codes.items(), key=lambda x: x[1].count)[0][0]
-        except IndexError:
+        if self.language_of_orig_codes:
+            self.language_orig = self.language_of_orig_codes.get_least_frequent()
+        else:
             self.language_orig = 'und'
 
     def merge_manif_bn_ids(self, matched_work):
         matched_work.manifestations_bn_ids.update(self.manifestations_bn_ids)
 
-    def match_with_existing_work_and_index(self, works_by_uuid, works_by_titles):
-        candidate_works_by_245_title = {}
-        candidate_works_by_246_title_orig = {}
-        candidate_works_by_246_title_other = {}
-        candidate_works_by_240_title = {}
+    def get_title_keys_for_matching(self):
+        title_keys = set()
 
         for title_dict in self.titles245.values():
-            for title in title_dict.keys():
-                # no such title - append empty list
-                normalized_title = prepare_name_for_indexing(normalize_title(title))
-                if normalized_title not in works_by_titles:
-                    candidate_works_by_245_title.setdefault(title, [])
-                # title found - append candidate uuids
-                else:
-                    candidate_works_by_245_title.setdefault(title, []).extend(works_by_titles.get(normalized_title))
-
+            title_keys.update(title_dict.keys())
         for title_dict in self.titles246_title_orig.values():
-            for title in title_dict.keys():
-                # no such title - append empty list
-                normalized_title = prepare_name_for_indexing(normalize_title(title))
-                if normalized_title not in works_by_titles:
-                    candidate_works_by_246_title_orig.setdefault(title, [])
-                # title found - append candidate uuids
-                else:
-                    candidate_works_by_246_title_orig.setdefault(title, []).extend(works_by_titles.get(normalized_title))
+            title_keys.update(title_dict.keys())
+        title_keys.update(self.titles246_title_other.keys())
+        title_keys.update(self.titles240)
 
-        for title in self.titles246_title_other.keys():
-            # no such title - append empty list
-            normalized_title = prepare_name_for_indexing(normalize_title(title))
-            if normalized_title not in works_by_titles:
-                candidate_works_by_246_title_other.setdefault(title, [])
-            # title found - append candidate uuids
-            else:
-                candidate_works_by_246_title_other.setdefault(title, []).extend(works_by_titles.get(normalized_title))
-
-        for title in list(self.titles240):
-            # no such title - append empty list
-            normalized_title = prepare_name_for_indexing(normalize_title(title))
-            if normalized_title not in works_by_titles:
-                candidate_works_by_240_title.setdefault(title, [])
-            # title found - append candidate uuids
-            else:
-                candidate_works_by_240_title.setdefault(title, []).extend(works_by_titles.get(normalized_title))
-
-        matched_uuids = set()
-
-        if candidate_works_by_245_title:
-            for title, uuids_list in candidate_works_by_245_title.items():
-                for uuid in uuids_list:
-                    candidate_work = works_by_uuid.get(uuid)
-                    if candidate_work.main_creator:
-                        if candidate_work.main_creator & self.main_creator:
-                            matched_uuids.add(uuid)
-                    if candidate_work.other_creator:
-                        if candidate_work.other_creator == self.other_creator:
-                            matched_uuids.add(uuid)
-                    if not candidate_work.main_creator and not candidate_work.other_creator \
-                            and not self.main_creator and not self.other_creator:
-                        matched_uuids.add(uuid)
-
-        if candidate_works_by_246_title_orig:
-            for title, uuids_list in candidate_works_by_246_title_orig.items():
-                for uuid in uuids_list:
-                    candidate_work = works_by_uuid.get(uuid)
-                    if candidate_work.main_creator:
-                        if candidate_work.main_creator & self.main_creator:
-                            matched_uuids.add(uuid)
-                    if candidate_work.other_creator:
-                        if candidate_work.other_creator == self.other_creator:
-                            matched_uuids.add(uuid)
-                    if not candidate_work.main_creator and not candidate_work.other_creator \
-                            and not self.main_creator and not self.other_creator:
-                        matched_uuids.add(uuid)
-
-        if candidate_works_by_240_title:
-            for title, uuids_list in candidate_works_by_240_title.items():
-                for uuid in uuids_list:
-                    candidate_work = works_by_uuid.get(uuid)
-                    if candidate_work.main_creator:
-                        if candidate_work.main_creator & self.main_creator:
-                            matched_uuids.add(uuid)
-                    if candidate_work.other_creator:
-                        if candidate_work.other_creator == self.other_creator:
-                            matched_uuids.add(uuid)
-                    if not candidate_work.main_creator and not candidate_work.other_creator \
-                            and not self.main_creator and not self.other_creator:
-                        matched_uuids.add(uuid)
-
-        if candidate_works_by_246_title_other:
-            for title, uuids_list in candidate_works_by_246_title_other.items():
-                for uuid in uuids_list:
-                    candidate_work = works_by_uuid.get(uuid)
-                    if candidate_work.main_creator:
-                        if candidate_work.main_creator & self.main_creator:
-                            matched_uuids.add(uuid)
-                    if candidate_work.other_creator:
-                        if candidate_work.other_creator == self.other_creator:
-                            matched_uuids.add(uuid)
-                    if not candidate_work.main_creator and not candidate_work.other_creator \
-                            and not self.main_creator and not self.other_creator:
-                        matched_uuids.add(uuid)
-
-        matched_uuids = list(matched_uuids)
-
-        # no candidates found - new work to add
-        if len(matched_uuids) == 0:
-            # index new work by titles and by uuid
-            for title_dict in self.titles245.values():
-                for title in title_dict.keys():
-                    works_by_titles.setdefault(prepare_name_for_indexing(normalize_title(title)), set()).add(self.uuid)
-            for title_dict in self.titles246_title_orig.values():
-                for title in title_dict.keys():
-                    works_by_titles.setdefault(prepare_name_for_indexing(normalize_title(title)), set()).add(self.uuid)
-            for title in self.titles240:
-                works_by_titles.setdefault(prepare_name_for_indexing(normalize_title(title)), set()).add(self.uuid)
-            for title in self.titles246_title_other.keys():
-                works_by_titles.setdefault(prepare_name_for_indexing(normalize_title(title)), set()).add(self.uuid)
-
-            works_by_uuid.setdefault(self.uuid, self)
-            #print('Added new work.')
-
-        # one candidate found - merge with existing work and index by all titles
-        if len(matched_uuids) == 1:
-            matched_work = works_by_uuid.get(matched_uuids[0])
-            self.merge_titles(matched_work)
-            self.merge_manif_bn_ids(matched_work)
-            self.index_matched_work_by_titles(matched_work, works_by_titles)
-            #print('One candidate found - merged works.')
-
-        # more than one candidate found
-        if len(matched_uuids) > 1:
-            matched_work = works_by_uuid.get(matched_uuids[0])
-            self.merge_titles(matched_work)
-            self.merge_manif_bn_ids(matched_work)
-            self.index_matched_work_by_titles(matched_work, works_by_titles)
-            #print(f'{len(matched_uuids)} candidates found, merged with first one.')
-
-    def try_to_merge_possible_duplicates_using_broader_context(self, works_by_uuid, works_by_titles):
-        candidate_works_by_245_title = {}
-        candidate_works_by_246_title_orig = {}
-        candidate_works_by_246_title_other = {}
-        candidate_works_by_240_title = {}
+        return {prepare_name_for_indexing(normalize_title(title)) for title in title_keys}
 
-        for title_dict in self.titles245.values():
-            for title in title_dict.keys():
-                # no such title - append empty list
-                normalized_title = prepare_name_for_indexing(normalize_title(title))
-                if normalized_title not in works_by_titles:
-                    candidate_works_by_245_title.setdefault(title, [])
-                # title found - append candidate uuids
-                else:
-                    candidate_works_by_245_title.setdefault(title, []).extend(works_by_titles.get(normalized_title))
+    @instrumented('match_with_existing_work_and_index')
+    def match_with_existing_work_and_index(self, works_index):
+        # returns id of work this one ended up in (new or matched one)
+        title_keys = self.get_title_keys_for_matching()
+        matched_ids = works_index.find_matches(title_keys, self.main_creator, self.other_creator)
 
-        for title_dict in self.titles246_title_orig.values():
-            for title in title_dict.keys():
-                normalized_title = prepare_name_for_indexing(normalize_title(title))
-                # no such title - append empty list
-                if normalized_title not in works_by_titles:
-                    candidate_works_by_246_title_orig.setdefault(title, [])
-                # title found - append candidate uuids
-                else:
-                    candidate_works_by_246_title_orig.setdefault(title, []).extend(works_by_titles.get(normalized_title))
+        # no candidates found - index new work by titles
+        if not matched_ids:
+            return works_index.add(self, title_keys)
 
-        for title in self.titles246_title_other.keys():
-            # no such title - append empty list
-            normalized_title = prepare_name_for_indexing(normalize_title(title))
-            if normalized_title not in works_by_titles:
-                candidate_works_by_246_title_other.setdefault(title, [])
-            # title found - append candidate uuids
-            else:
-                candidate_works_by_246_title_other.setdefault(title, []).extend(works_by_titles.get(normalized_title))
-
-        for title in list(self.titles240):
-            # no such title - append empty list
-            normalized_title = prepare_name_for_indexing(normalize_title(title))
-            if normalized_title not in works_by_titles:
-                candidate_works_by_240_title.setdefault(title, [])
-            # title found - append candidate uuids
-            else:
-                candidate_works_by_240_title.setdefault(title, []).extend(works_by_titles.get(normalized_title))
-
-        matched_uuids = set()
-
-        if candidate_works_by_245_title:
-            for title, uuids_list in candidate_works_by_245_title.items():
-                for uuid in uuids_list:
-                    if uuid != self.uuid:
-                        candidate_work = works_by_uuid.get(uuid)
-                        if candidate_work:
-                            if candidate_work.main_creator:
-                                if candidate_work.main_creator & self.main_creator:
-                                    matched_uuids.add(uuid)
-                            if candidate_work.other_creator:
-                                if candidate_work.other_creator == self.other_creator:
-                                    matched_uuids.add(uuid)
-                            if not candidate_work.main_creator and not candidate_work.other_creator \
-                                    and not self.main_creator and not self.other_creator:
-                                matched_uuids.add(uuid)
-
-        if candidate_works_by_246_title_orig:
-            for title, uuids_list in candidate_works_by_246_title_orig.items():
-                for uuid in uuids_list:
-                    if uuid != self.uuid:
-                        candidate_work = works_by_uuid.get(uuid)
-                        if candidate_work:
-                            if candidate_work.main_creator:
-                                if candidate_work.main_creator & self.main_creator:
-                                    matched_uuids.add(uuid)
-                            if candidate_work.other_creator:
-                                if candidate_work.other_creator == self.other_creator:
-                                    matched_uuids.add(uuid)
-                            if not candidate_work.main_creator and not candidate_work.other_creator \
-                                    and not self.main_creator and not self.other_creator:
-                                matched_uuids.add(uuid)
-
-        if candidate_works_by_240_title:
-            for title, uuids_list in candidate_works_by_240_title.items():
-                for uuid in uuids_list:
-                    if uuid != self.uuid:
-                        candidate_work = works_by_uuid.get(uuid)
-                        if candidate_work:
-                            if candidate_work.main_creator:
-                                if candidate_work.main_creator & self.main_creator:
-                                    matched_uuids.add(uuid)
-                            if candidate_work.other_creator:
-                                if candidate_work.other_creator == self.other_creator:
-                                    matched_uuids.add(uuid)
-                            if not candidate_work.main_creator and not candidate_work.other_creator \
-                                    and not self.main_creator and not self.other_creator:
-                                matched_uuids.add(uuid)
-
-        if candidate_works_by_246_title_other:
-            for title, uuids_list in candidate_works_by_246_title_other.items():
-                for uuid in uuids_list:
-                    if uuid != self.uuid:
-                        candidate_work = works_by_uuid.get(uuid)
-                        if candidate_work:
-                            if candidate_work.main_creator:
-                                if candidate_work.main_creator & self.main_creator:
-                                    matched_uuids.add(uuid)
-                            if candidate_work.other_creator:
-                                if candidate_work.other_creator == self.other_creator:
-                                    matched_uuids.add(uuid)
-                            if not candidate_work.main_creator and not candidate_work.other_creator \
-                                    and not self.main_creator and not self.other_creator:
-                                matched_uuids.add(uuid)
-
-        matched_uuids = list(matched_uuids)
-
-        # one candidate found - merge with existing work and delete duplicate (only in indexed works by uuid)
-        if len(matched_uuids) == 1 and matched_uuids[0] != self.uuid:
-            matched_work = works_by_uuid.get(matched_uuids[0])
-            if matched_work:
-                #print(
-                    #f'{self.titles245} | {self.titles246_title_orig} | {self.titles246_title_other} | {self.titles240}')
-                #print(f'{self.main_creator} | {self.other_creator}')
-                #print(
-                    #f'{matched_work.titles245} | {matched_work.titles246_title_orig} | {matched_work.titles246_title_other} | {matched_work.titles240}')
-                #print(f'{matched_work.main_creator} | {matched_work.other_creator}')
-                self.merge_titles(matched_work)
-                self.merge_manif_bn_ids(matched_work)
-                #print('Merged works using broader context!')
-
-                return True
-
-        # more than one candidate found
-        if len(matched_uuids) > 1:
-            #print(f'{len(matched_uuids)} candidates found using broader context.')
-
-            return False
-
-        # no candidates found - there is no duplicate
-        return False
+        # one or more candidates found - merge with existing work (first indexed one) and index it by all titles
+        matched_work = works_index.get(matched_ids[0])
+        self.merge_titles(matched_work)
+        self.merge_manif_bn_ids(matched_work)
+        works_index.add_titles(matched_ids[0], title_keys)
 
-    @staticmethod
-    def index_matched_work_by_titles(matched_work, works_by_titles):
-        for title_dict in matched_work.titles245.values():
-            for title in title_dict.keys():
-                works_by_titles.setdefault(prepare_name_for_indexing(normalize_title(title)), set()).add(matched_work.uuid)
-        for title_dict in matched_work.titles246_title_orig.values():
-            for title in title_dict.keys():
-                works_by_titles.setdefault(prepare_name_for_indexing(normalize_title(title)), set()).add(matched_work.uuid)
-        for title in matched_work.titles240:
-            works_by_titles.setdefault(prepare_name_for_indexing(normalize_title(title)), set()).add(matched_work.uuid)
-        for title in matched_work.titles246_title_other.keys():
-            works_by_titles.setdefault(prepare_name_for_indexing(normalize_title(title)), set()).add(matched_work.uuid)
+        return matched_ids[0]
+
+    def get_possible_duplicates_using_broader_context(self, work_id, works_index):
+        # ids of other indexed works matching this one (by all titles and creators gathered in step one)
+        return works_index.find_matches(self.get_title_keys_for_matching(), self.main_creator, self.other_creator,
+                                        exclude_id=work_id)
 
     def get_pub_country(self, bib_object):
         pub_008 = get_values_by_field(bib_object, '008')[0][15:18]
@@ -881,14 +641,46 @@ class Work(object):
         only_values_from_list_710 = only_values(resolved_list_710)
         self.filter_publisher_uniform.update(only_values_from_list_710)
 
+    def get_descriptors(self, bib_object, descr_index, resolved_descriptors):
+        # one pass through descriptor fields of manifestation, every distinct value is normalized and looked up
+        # in descriptors index once per work (resolved_descriptors: value -> descriptor, None if there is none)
+        # returns True if any new descriptor was added to work
+        new_descriptors = False
+        descriptor_fields = DBN_DESCRIPTOR_FIELDS + DESCRIPTOR_FIELDS if is_dbn(bib_object) else DESCRIPTOR_FIELDS
+
+        for tag, subfields, attribute in descriptor_fields:
+            values = get_values_by_field_and_subfield(bib_object, (tag, subfields))
+            if not values:
+                continue
+
+            work_descriptors = getattr(self, attribute)
+
+            for value in values:
+                if value in resolved_descriptors:
+                    descriptor = resolved_descriptors[value]
+                else:
+                    descriptor = resolved_descriptors[value] = resolve_descriptor(value, descr_index)
+
+                if descriptor is not None and descriptor not in work_descriptors:
+                    work_descriptors.add(descriptor)
+                    new_descriptors = True
+
+        return new_descriptors
+
+    @instrumented('convert_to_work')
     def convert_to_work(self, manifestations_bn_by_id, buffer, descr_index, code_val_index):
         self.create_mock_es_data_index_id()
 
-        # get values from all reference manifestations
-        for m_id in self.manifestations_bn_ids:
+        # descriptors resolved for values of descriptor fields - the same values repeat in manifestations of work
+        resolved_descriptors = {}
+
+        # get values from all reference manifestations - in order of bn ids, as expression ids are taken from
+        # the first manifestation of expression
+        for m_id in sorted(self.manifestations_bn_ids):
 
-            # get manifestation by bn id from the index and read it (they're stored as iso binary)
-            bib_object = read_marc_from_binary(manifestations_bn_by_id.get(m_id))
+            # get manifestation by bn id from the index and read it (it's read from source iso file by offset)
+            # record view is passed down to expression, manifestation and items - fields are indexed once
+            bib_object = MarcRecordView(manifestations_bn_by_id.get_record(m_id))
 
             # get simple attributes, without relations to descriptors
             self.work_udc.update(get_values_by_field_and_subfield(bib_object, ('080', ['a'])))
@@ -896,31 +688,8 @@ class Work(object):
             self.get_languages(bib_object)
             self.get_pub_country(bib_object)
 
-            # check if manifestation is catalogued using DBN - if so, get subject and genre data
-            if is_dbn(bib_object):
-
-                self.work_subject_person.update(resolve_field_value(
-                    get_values_by_field_and_subfield(bib_object, ('600', ['a', 'b', 'c', 'd'])), descr_index))
-                self.work_subject_corporate_body.update(resolve_field_value(
-                    get_values_by_field_and_subfield(bib_object, ('610', ['a', 'b', 'c', 'd', 'n', 'p'])), descr_index))
-                self.work_subject_event.update(resolve_field_value(
-                    get_values_by_field_and_subfield(bib_object, ('611', ['a', 'b', 'c', 'd', 'n', 'p'])), descr_index))
-                self.work_subject.update(resolve_field_value(
-                    get_values_by_field_and_subfield(bib_object, ('650', ['a', 'b', 'c', 'd'])), descr_index))
-                self.work_subject_place.update(resolve_field_value(
-                    get_values_by_field_and_subfield(bib_object, ('651', ['a', 'b', 'c', 'd'])), descr_index))
-                self.work_subject_time = []
-                self.work_subject_work = []
-                self.work_genre.update(resolve_field_value(
-                    get_values_by_field_and_subfield(bib_object, ('655', ['a', 'b', 'c', 'd'])), descr_index))
-
-            # get other data related to descriptors
-            self.work_subject_domain.update(resolve_field_value(
-                get_values_by_field_and_subfield(bib_object, ('658', ['a'])), descr_index))
-            self.work_form.update(resolve_field_value(
-                get_values_by_field_and_subfield(bib_object, ('380', ['a'])), descr_index))
-            self.work_cultural_group.update(resolve_field_value(
-                get_values_by_field_and_subfield(bib_object, ('386', ['a'])), descr_index))
+            # get subject, genre and other data related to descriptors
+            new_descriptors = self.get_descriptors(bib_object, descr_index, resolved_descriptors)
 
             # get creators and creators for presentation
             self.work_main_creator = serialize_to_jsonl_descr_creator(list(self.main_creator_real))
@@ -956,13 +725,16 @@ class Work(object):
 
             self.search_note.update(get_values_by_field(bib_object, '500'))
 
-            self.search_subject.update(*[only_values(res_val_list) for res_val_list in
-                                         [self.work_subject, self.work_subject_place, self.work_subject_domain,
-                                          self.work_subject_corporate_body, self.work_subject_person,
-                                          self.work_subject_time, self.work_subject_event]])
+            # search indexes are updated only if manifestation has added any descriptor (they'd stay the same
+            # otherwise) - but still after every such manifestation, as order of values in them depends on it
+            if new_descriptors:
+                self.search_subject.update(*[only_values(res_val_list) for res_val_list in
+                                             [self.work_subject, self.work_subject_place, self.work_subject_domain,
+                                              self.work_subject_corporate_body, self.work_subject_person,
+                                              self.work_subject_time, self.work_subject_event]])
 
-            self.search_formal.update(*[only_values(res_val_list) for res_val_list in
-                                        [self.work_cultural_group, self.work_genre]])
+                self.search_formal.update(*[only_values(res_val_list) for res_val_list in
+                                            [self.work_cultural_group, self.work_genre]])
 
             self.filter_pub_date.add(get_values_by_field(bib_object, '008')[0][7:11].replace('u', '0').replace(' ', '0').replace('X', '0'))
             self.filter_publisher.update(self.get_publishers_all(bib_object))
@@ -1064,13 +836,13 @@ class Work(object):
                                          Expression()).add(bib_object, self, buffer, descr_index, code_val_index)
 
     def write_to_dump_file(self, buffer):
-        write_to_json(self.serialize_work_for_es_work_dump(), buffer, 'work_buffer')
-        write_to_json(self.serialize_work_popularity_object_for_es_work_dump(), buffer, 'work_buffer')
+        write_to_json(self.prepare_work_for_es_work_dump(), buffer, 'work_buffer')
+        write_to_json(self.prepare_work_popularity_object_for_es_work_dump(), buffer, 'work_buffer')
 
-        for jsonl in self.serialize_work_for_es_work_data_dump():
-            write_to_json(jsonl, buffer, 'work_data_buffer')
+        for dict_work_data in self.prepare_work_for_es_work_data_dump():
+            write_to_json(dict_work_data, buffer, 'work_data_buffer')
 
-    def serialize_work_for_es_work_dump(self):
+    def prepare_work_for_es_work_dump(self):
         dict_work = {"_index": "work", "_type": "work", "_id": str(self.mock_es_id),
                      "_score": 1, "_source":
                          {'eForm': list(self.filter_form),
@@ -1140,11 +912,12 @@ class Work(object):
                           'work_udc': list(self.work_udc)
                           }}
 
-        json_work = json.dumps(dict_work, ensure_ascii=False)
+        return dict_work
 
-        return json_work
+    def serialize_work_for_es_work_dump(self):
+        return dumps(self.prepare_work_for_es_work_dump())
 
-    def serialize_work_popularity_object_for_es_work_dump(self):
+    def prepare_work_popularity_object_for_es_work_dump(self):
         dict_work = {"_index": "work", "_type": "work", "_id": f'p{str(self.mock_es_id)}',
                      "_score": 1, "_routing": str(self.mock_es_id), "_source": {
                          "modificationTime": self.modificationTime,
@@ -1152,11 +925,12 @@ class Work(object):
                          "popularity-join": {"parent": str(self.mock_es_id), "name": "popularity"}
                      }}
 
-        json_work = json.dumps(dict_work, ensure_ascii=False)
+        return dict_work
 
-        return json_work
+    def serialize_work_popularity_object_for_es_work_dump(self):
+        return dumps(self.prepare_work_popularity_object_for_es_work_dump())
 
-    def serialize_work_for_es_work_data_dump(self):
+    def prepare_work_for_es_work_data_dump(self):
         dict_work_data_list = []
 
         for num1, expr in enumerate(self.expressions_dict.values(), start=1):
@@ -1186,7 +960,10 @@ class Work(object):
                                            'type': 'work',
                                            'value': str(self.mock_es_id)}}}
 
-                json_work_data = json.dumps(dict_work_data, ensure_ascii=False)
-                dict_work_data_list.append(json_work_data)
+                dict_work_data_list.append(dict_work_data)
 
         return dict_work_data_list
+
+    def serialize_work_for_es_work_data_dump(self):
+        return [dumps(dict_work_data)
+                for dict_work_data in self.prepare_work_for_es_work_data_dump()]
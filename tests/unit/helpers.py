@@ -0,0 +1,97 @@
+import os
+import re
+import tempfile
+
+from pymarc import Record, Field
+
+from objects.helper_objects import FrequencyTable
+from objects.work import Work
+
+
+# helpers shared by unit tests
+
+
+def create_marc_file(number_of_records):
+    # records have titles of different lengths, so they have different lengths too
+    fd, path = tempfile.mkstemp(suffix='.mrc')
+
+    with os.fdopen(fd, 'wb') as fp:
+        for num in range(number_of_records):
+            rcd = Record(force_utf8=True)
+            rcd.add_field(Field('001', data=f'b{num:010d}'))
+            rcd.add_field(Field('245', ['1', '0'], ['a', f'Tytuł {"x" * (num % 7)} {num}']))
+            fp.write(rcd.as_marc())
+
+    return path
+
+
+def create_book_record(nlp_id, title, creator, status='n'):
+    # BN book record which passes all the record filters (creator has to be in descriptor index),
+    # status 'd' (leader/05) - record deleted in delta file
+    rcd = Record(force_utf8=True)
+    rcd.leader = f'00000{status}am a2200000 i 4500'
+    rcd.add_field(Field('001', data=nlp_id))
+    rcd.add_field(Field('008', data='200101s2001    pl            000 1 pol c'))
+    rcd.add_field(Field('100', ['1', ' '], ['a', creator]))
+    rcd.add_field(Field('245', ['1', '0'], ['a', f'{title} /', 'c', 'Jan X.']))
+    rcd.add_field(Field('260', [' ', ' '], ['a', 'Warszawa :', 'b', 'Wydawnictwo X,', 'c', '2001']))
+    rcd.add_field(Field('300', [' ', ' '], ['a', '300 s. ;', 'c', '21 cm.']))
+    rcd.add_field(Field('380', [' ', ' '], ['a', 'Książki']))
+    rcd.add_field(Field('655', [' ', '7'], ['a', 'Powieść']))
+    rcd.add_field(Field('852', [' ', ' '], ['c', f'II {nlp_id}', 'h', 'Sygn.', '8', f'22{nlp_id[1:]}']))
+    return rcd
+
+
+def write_marc_file(path, records):
+    with open(path, 'wb') as fp:
+        for rcd in records:
+            fp.write(rcd.as_marc())
+
+
+def get_work(titles, main_creator=(), other_creator=(), bn_id='b0000000001'):
+    # work stub as built in the first loop - first title is 245 title, the others are 246 titles
+    work = Work()
+    work.titles245 = {'pol': FrequencyTable({titles[0]: 1})}
+    work.titles246_title_other = FrequencyTable({title: 1 for title in titles[1:]})
+    work.title_with_nonf_chars = {title: {title} for title in titles}
+    work.main_creator = set(main_creator)
+    work.other_creator = set(other_creator)
+    work.manifestations_bn_ids = {bn_id}
+    return work
+
+
+# previous, char by char implementations of normalization - new ones have to give exactly the same results
+# (benchmarks compare speed with them too)
+def reference_prepare_name_for_indexing(descriptor_name):
+    if descriptor_name:
+        descriptor_name = ''.join(char.replace(char, ' ') if not char.isalnum() else char for char in descriptor_name)
+        match = re.finditer(r'\s{2,}', descriptor_name)
+        for m_object in match:
+            descriptor_name = descriptor_name.replace(m_object.group(0), ' ')
+        descriptor_name = descriptor_name.strip()
+        descriptor_name = descriptor_name.upper()
+    return descriptor_name
+
+
+def reference_normalize_title(title):
+    if title:
+        title = title.strip()
+        match = re.search(r'\s*[/:;,=.]$', title)
+        if match:
+            title = title[:match.span(0)[0]]
+        return title
+
+
+def reference_normalize_title_for_frbr_indexing(title):
+    match = re.finditer(r'\W', title)
+    for m_object in match:
+        title = title.replace(m_object.group(0), ' ')
+    title = title.replace('   ', ' ').replace('  ', ' ')
+    title = title.upper()
+    match = re.search(r'^\W+', title)
+    if match:
+        title = title[match.span(0)[1]:]
+    match = re.search(r'\W+$', title)
+    if match:
+        title = title[:match.span(0)[0]]
+    return title
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+from commons.checkpoint import get_phases_to_run, save_checkpoint, load_checkpoint, restore_output_files
+from commons.checkpoint import get_latest_checkpoint_phase
+from commons.json_writer import JsonBufferOut
+from exceptions.exceptions import CheckpointNotAvailable
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_dir = os.path.join(self.tmp_dir.name, 'checkpoints')
+        self.source_file = os.path.join(self.tmp_dir.name, 'bn.mrc')
+
+        with open(self.source_file, 'wb') as fp:
+            fp.write(b'records')
+
+        self.files_out = [os.path.join(self.tmp_dir.name, f'{name}.json') for name in
+                          ['item', 'materialization', 'expression', 'work', 'expression_data', 'work_data']]
+        self.buffer = JsonBufferOut(*self.files_out)
+
+    def tearDown(self):
+        self.buffer.close()
+        self.tmp_dir.cleanup()
+
+    def test_get_phases_to_run(self):
+        enabled_phases = ['first_loop', 'conversion', 'manif_matching', 'dump']
+
+        self.assertEqual((enabled_phases, None), get_phases_to_run(enabled_phases))
+        self.assertEqual((enabled_phases, None), get_phases_to_run(enabled_phases, 'first_loop'))
+        self.assertEqual((['conversion', 'manif_matching', 'dump'], 'first_loop'),
+                         get_phases_to_run(enabled_phases, 'step_two'))
+        self.assertEqual((['dump'], 'manif_matching'), get_phases_to_run(enabled_phases, 'dump'))
+
+        with self.assertRaises(ValueError):
+            get_phases_to_run(enabled_phases, 'second_loop')
+
+    def test_save_and_load(self):
+        self.buffer.item_buffer.write({'id': 1})
+        save_checkpoint(self.checkpoint_dir, 'conversion', {'works': [1, 2]}, [self.source_file], self.buffer)
+
+        state, output_sizes = load_checkpoint(self.checkpoint_dir, 'conversion', [self.source_file])
+
+        self.assertEqual({'works': [1, 2]}, state)
+        self.assertEqual([len('{"id": 1}\n'), 0, 0, 0, 0, 0], output_sizes)
+
+        with self.assertRaises(CheckpointNotAvailable):
+            load_checkpoint(self.checkpoint_dir, 'first_loop', [self.source_file])
+
+    def test_get_latest_checkpoint_phase(self):
+        self.assertIsNone(get_latest_checkpoint_phase(self.checkpoint_dir, ['step_two', 'delta']))
+
+        save_checkpoint(self.checkpoint_dir, 'step_two', {}, [self.source_file], self.buffer)
+        save_checkpoint(self.checkpoint_dir, 'delta', {}, [self.source_file], self.buffer)
+        os.utime(os.path.join(self.checkpoint_dir, 'delta.checkpoint'), (1, 1))
+
+        self.assertEqual('step_two', get_latest_checkpoint_phase(self.checkpoint_dir, ['step_two', 'delta']))
+
+    def test_changed_source_invalidates_checkpoint(self):
+        save_checkpoint(self.checkpoint_dir, 'first_loop', {}, [self.source_file], self.buffer)
+        with open(self.source_file, 'ab') as fp:
+            fp.write(b' changed')
+
+        with self.assertRaises(CheckpointNotAvailable):
+            load_checkpoint(self.checkpoint_dir, 'first_loop', [self.source_file])
+
+    def test_restore_output_files(self):
+        self.buffer.work_buffer.write({'id': 1})
+        save_checkpoint(self.checkpoint_dir, 'conversion', {}, [self.source_file], self.buffer)
+        self.buffer.work_buffer.write({'id': 2})
+        self.buffer.flush()
+
+        state, output_sizes = load_checkpoint(self.checkpoint_dir, 'conversion', [self.source_file])
+        restore_output_files(self.buffer, output_sizes)
+        self.buffer.work_buffer.write({'id': 3})
+        self.buffer.flush()
+
+        with open(self.files_out[3], encoding='utf-8') as fp:
+            self.assertEqual('{"id": 1}\n{"id": 3}\n', fp.read())
+
+    def test_restore_truncated_output_files(self):
+        self.buffer.work_buffer.write({'id': 1})
+        save_checkpoint(self.checkpoint_dir, 'conversion', {}, [self.source_file], self.buffer)
+        os.truncate(self.files_out[3], 0)
+
+        state, output_sizes = load_checkpoint(self.checkpoint_dir, 'conversion', [self.source_file])
+
+        with self.assertRaises(CheckpointNotAvailable):
+            restore_output_files(self.buffer, output_sizes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import json
+import unittest
+
+from commons.json_serializer import SERIALIZERS, DEFAULT_SERIALIZERS_ORDER, get_serializer, dumps, dumps_stdlib
+
+
+PAYLOADS = [{'_id': 'w1', 'work_title_pref': 'Quo vadis : powieść z czasów Nerona', 'work_udc': ['821.162.1-3'],
+             'work_main_creator': [{'id': 12, 'type': 'person', 'value': 'Sienkiewicz, Henryk (1846-1916)'}],
+             'popularity': 0, 'modification_time': '2020-03-25T17:34:33.262', 'url': 'https://polona.pl/item/1'},
+            {'nested': {'a': [None, True, False, 1.25, -0.0, 10 ** 20]}, 'escapes': '"\\\b\f\n\r\t\x01\x1f\x7f'},
+            {'floats': [1e-05, 1.5e-07, -2.5e-09, 1e-10, 0.0001, 1e+16, 1.7976931348623157e+308, 5e-324],
+             'form': ['E-booki', 'e-book']},
+            {'unicode': 'ąćęłńóśźż ĄĆĘŁŃÓŚŹŻ    \U0001F600 日本語', 'empty': [{}, [], '']},
+            {1: 'int key', None: 'none key', True: 'bool key'},
+            [('tuple', 1), 'list'],
+            'plain string']
+
+
+class TestJsonSerializer(unittest.TestCase):
+    def test_default_serializers_are_identical_with_stdlib(self):
+        for name in DEFAULT_SERIALIZERS_ORDER:
+            if name not in SERIALIZERS:
+                continue
+            for payload in PAYLOADS:
+                with self.subTest(serializer=name, payload=payload):
+                    self.assertEqual(json.dumps(payload, ensure_ascii=False), SERIALIZERS[name](payload))
+
+    def test_default_serializer(self):
+        for payload in PAYLOADS:
+            self.assertEqual(dumps_stdlib(payload), dumps(payload))
+
+    def test_not_serializable_object_raises_type_error(self):
+        for name in DEFAULT_SERIALIZERS_ORDER:
+            if name in SERIALIZERS:
+                with self.assertRaises(TypeError):
+                    SERIALIZERS[name]({'value': {1, 2}})
+
+    def test_all_serializers_produce_valid_json(self):
+        for name, serializer in SERIALIZERS.items():
+            with self.subTest(serializer=name):
+                self.assertEqual(json.loads(dumps_stdlib(PAYLOADS[0])), json.loads(serializer(PAYLOADS[0])))
+
+    def test_get_unknown_serializer(self):
+        with self.assertRaises(ValueError):
+            get_serializer('marshal')
+
+
+if __name__ == '__main__':
+    unittest.main()
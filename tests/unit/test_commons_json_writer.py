@@ -0,0 +1,114 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from commons.json_writer import JsonStreamWriter, JsonBufferOut, write_to_json, write_delete_actions
+
+
+class TestJsonStreamWriter(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_lines_are_written_in_order(self):
+        writer = JsonStreamWriter(self.path, batch_size=7, max_queued_batches=2)
+        for num in range(100):
+            writer.write({'_id': num, 'value': 'zażółć'} if num % 2 else json.dumps({'_id': num}))
+        writer.close()
+
+        with open(self.path, 'r', encoding='utf-8') as fp:
+            lines = fp.read().splitlines()
+
+        self.assertEqual(list(range(100)), [json.loads(line)['_id'] for line in lines])
+        self.assertEqual('{"_id": 1, "value": "zażółć"}', lines[1])
+
+    def test_flush_writes_pending_lines(self):
+        writer = JsonStreamWriter(self.path, batch_size=1000)
+        writer.write({'_id': 1})
+        writer.flush()
+
+        with open(self.path, 'r', encoding='utf-8') as fp:
+            self.assertEqual('{"_id": 1}\n', fp.read())
+
+        writer.close()
+
+    def test_serialization_error_is_raised(self):
+        writer = JsonStreamWriter(self.path, batch_size=1)
+        writer.write({'_id': {1, 2}})
+
+        with self.assertRaises(TypeError):
+            writer.close()
+
+    def test_unexpected_error_doesnt_block_producer(self):
+        writer = JsonStreamWriter(self.path, batch_size=1, max_queued_batches=1, serializer='stdlib')
+        nested = []
+        for num in range(100000):
+            nested = [nested]
+        errors = []
+
+        def write_lines():
+            try:
+                writer.write(nested)
+                for num in range(100):
+                    writer.write({'_id': num})
+            except RecursionError as error:
+                errors.append(error)
+
+        producer = threading.Thread(target=write_lines, daemon=True)
+        producer.start()
+        producer.join(timeout=10)
+
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(1, len(errors))
+        with self.assertRaises(RecursionError):
+            writer.close()
+
+
+class TestJsonBufferOut(unittest.TestCase):
+    def test_write_to_json(self):
+        with tempfile.TemporaryDirectory() as path_dir:
+            paths = [os.path.join(path_dir, f'{num}.json') for num in range(6)]
+
+            with JsonBufferOut(*paths) as buffer:
+                write_to_json({'_id': 'item'}, buffer, 'item_buffer')
+                write_to_json({'_id': 'work'}, buffer, 'work_buffer')
+
+            with open(paths[0], 'r', encoding='utf-8') as fp:
+                self.assertEqual('{"_id": "item"}\n', fp.read())
+            with open(paths[3], 'r', encoding='utf-8') as fp:
+                self.assertEqual('{"_id": "work"}\n', fp.read())
+
+    def test_record_written_docs(self):
+        with tempfile.TemporaryDirectory() as path_dir:
+            written_docs = []
+
+            with JsonBufferOut(*(os.path.join(path_dir, f'{num}.json') for num in range(6))) as buffer:
+                write_to_json({'_id': '1'}, buffer, 'work_buffer')
+                buffer.record_written_docs(written_docs)
+                write_to_json({'_index': 'work', '_type': 'work', '_id': '2'}, buffer, 'work_buffer')
+                write_to_json({'_index': 'work', '_type': 'work', '_id': 'p2', '_routing': '2'}, buffer, 'work_buffer')
+                buffer.record_written_docs(None)
+                write_to_json({'_id': '3'}, buffer, 'work_buffer')
+
+            self.assertEqual([('work', 'work', '2', None), ('work', 'work', 'p2', '2')], written_docs)
+
+
+class TestWriteDeleteActions(unittest.TestCase):
+    def test_write_delete_actions(self):
+        with tempfile.TemporaryDirectory() as path_dir:
+            file_out = os.path.join(path_dir, 'deleted.json')
+            write_delete_actions(file_out, [('work', 'work', '2', None), ('work', 'work', 'p2', '2')])
+
+            with open(file_out, 'r', encoding='utf-8') as fp:
+                self.assertEqual('{"delete": {"_index": "work", "_type": "work", "_id": "2"}}\n'
+                                 '{"delete": {"_index": "work", "_type": "work", "_id": "p2", "_routing": "2"}}\n',
+                                 fp.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from commons.lru_cache import LruCache
+
+
+class TestLruCache(unittest.TestCase):
+    def test_get_and_put(self):
+        cache = LruCache(2)
+        cache.put('a', 1)
+
+        self.assertEqual(1, cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(False, cache.get('b', False))
+        self.assertEqual((1, 2), (cache.hits, cache.misses))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = LruCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+
+        self.assertEqual(2, len(cache))
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+
+    def test_put_existing_key(self):
+        cache = LruCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.put('a', 3)
+        cache.put('c', 4)
+
+        self.assertEqual(3, cache.get('a'))
+        self.assertNotIn('b', cache)
+
+    def test_disabled_cache(self):
+        cache = LruCache(0)
+        cache.put('a', 1)
+
+        self.assertEqual(0, len(cache))
+        self.assertIsNone(cache.get('a'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import random
+import unittest
+
+from pymarc import Record, Field
+
+import commons.marc_iso_commons as mic
+
+from tests.unit.helpers import create_marc_file, reference_normalize_title_for_frbr_indexing
+
+
+class TestNormalizeTitleForFrbrIndexing(unittest.TestCase):
+    def test_same_as_previous_implementation(self):
+        rnd = random.Random(3)
+        chars = 'abcąęłßŉﬁ019²_ \t\n\xa0\u3000/:;,=.-()[]?!"$%\u0301\u02bc'
+        corpus = ['', ' Quo vadis : powieść z czasów Nerona / ', 'a     b']
+        corpus.extend(''.join(rnd.choice(chars) for char_num in range(rnd.randint(1, 30))) for num in range(20000))
+
+        for title in corpus:
+            self.assertEqual(reference_normalize_title_for_frbr_indexing(title),
+                             mic.normalize_title_for_frbr_indexing(title), repr(title))
+
+
+class TestMarcRecordView(unittest.TestCase):
+    def setUp(self):
+        self.record = Record(force_utf8=True, leader='00000nam a2200000 i 4500')
+        self.record.add_field(Field('001', data='b0000000001'))
+        self.record.add_field(Field('008', data='200101s2020    pl ||||| |||||||||||pol||'))
+        self.record.add_field(Field('245', ['1', '0'], ['a', 'Quo vadis :', 'b', 'powieść z czasów Nerona /',
+                                                         'c', 'Henryk Sienkiewicz.']))
+        self.record.add_field(Field('650', [' ', '7'], ['a', 'Rzym', 'x', 'historia']))
+        self.record.add_field(Field('650', [' ', '7'], ['x', 'historia']))
+        self.record.add_field(Field('650', [' ', '7'], ['a', 'Neron']))
+        self.view = mic.MarcRecordView(self.record)
+
+    def test_same_values_as_record(self):
+        for field in ['001', '008', '245', '650', '700']:
+            self.assertEqual(mic.get_values_by_field(self.record, field), mic.get_values_by_field(self.view, field))
+
+        for field_and_subfields in [('245', ['a', 'b']), ('245', ['c']), ('650', ['a']), ('650', ['x', 'y', 'z']),
+                                    ('700', ['a'])]:
+            self.assertEqual(mic.get_values_by_field_and_subfield(self.record, field_and_subfields),
+                             mic.get_values_by_field_and_subfield(self.view, field_and_subfields))
+
+    def test_returned_values_can_be_changed(self):
+        mic.get_values_by_field_and_subfield(self.view, ('650', ['a'])).append('Zmiana')
+
+        self.assertEqual(['Rzym', 'Neron'], mic.get_values_by_field_and_subfield(self.view, ('650', ['a'])))
+
+    def test_record_interface(self):
+        self.assertEqual(self.record.get_fields('650'), self.view.get_fields('650'))
+        self.assertEqual(self.record.get_fields('245', '001'), self.view.get_fields('245', '001'))
+        self.assertEqual(self.record['245'], self.view['245'])
+        self.assertIsNone(self.view['100'])
+        self.assertIn('008', self.view)
+        self.assertNotIn('100', self.view)
+        self.assertEqual(self.record.leader, self.view.leader)
+        self.assertTrue(mic.is_dbn(self.view) is mic.is_dbn(self.record))
+
+
+class TestMarcFileChunks(unittest.TestCase):
+    def setUp(self):
+        self.path = create_marc_file(50)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_chunks_are_record_aligned_and_cover_file(self):
+        chunks = mic.get_marc_file_chunks(self.path, 200)
+
+        self.assertEqual(0, chunks[0][0])
+        self.assertEqual(os.path.getsize(self.path), chunks[-1][1])
+        for previous_chunk, next_chunk in zip(chunks, chunks[1:]):
+            self.assertEqual(previous_chunk[1], next_chunk[0])
+
+    def test_reading_chunks_gives_same_records_as_reading_file(self):
+        serial = [rcd.as_marc() for rcd in mic.read_marc_from_file(self.path)]
+
+        chunked = []
+        for chunk_start, chunk_end in mic.get_marc_file_chunks(self.path, 200):
+            chunked.extend(rcd.as_marc() for offset, rcd in mic.read_marc_from_file_with_offsets(self.path, chunk_start,
+                                                                                                  chunk_end))
+
+        self.assertEqual(serial, chunked)
+
+    def test_chunks_have_given_size(self):
+        chunks = mic.get_marc_file_chunks(self.path, 200)
+        record_lengths = [len(rcd.as_marc()) for rcd in mic.read_marc_from_file(self.path)]
+
+        self.assertGreater(len(chunks), 5)
+        for chunk_start, chunk_end in chunks[:-1]:
+            self.assertGreaterEqual(chunk_end - chunk_start, 200)
+            self.assertLess(chunk_end - chunk_start, 200 + max(record_lengths))
+
+    def test_chunks_smaller_than_records(self):
+        chunks = mic.get_marc_file_chunks(self.path, 1)
+
+        self.assertEqual(50, len(chunks))
+
+    def test_chunk_bigger_than_file(self):
+        self.assertEqual([(0, os.path.getsize(self.path))], mic.get_marc_file_chunks(self.path, 10 ** 9))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from pymarc import Record, Field
+
+from commons.marc_iso_commons import read_marc_from_file_with_offsets, get_values_by_field
+from commons.marc_offset_index import MarcOffsetIndex
+
+from tests.unit.helpers import create_marc_file
+
+
+class TestMarcOffsetIndex(unittest.TestCase):
+    def setUp(self):
+        self.path = create_marc_file(20)
+        self.index = MarcOffsetIndex(self.path)
+
+        for offset, rcd in read_marc_from_file_with_offsets(self.path):
+            self.index.add(get_values_by_field(rcd, '001')[0], offset)
+
+    def tearDown(self):
+        self.index.close()
+        os.remove(self.path)
+
+    def test_get_record(self):
+        rcd = self.index.get_record('b0000000013')
+
+        self.assertEqual(['b0000000013'], get_values_by_field(rcd, '001'))
+        self.assertIsNone(self.index.get_record('b9999999999'))
+
+    def test_get_view_is_whole_raw_record(self):
+        view = self.index.get_view('b0000000007')
+
+        self.assertEqual(int(bytes(view[:5])), len(view))
+        self.assertEqual(b'\x1d', bytes(view[-1:]))
+
+    def test_save_and_load(self):
+        fd, index_file = tempfile.mkstemp()
+        os.close(fd)
+
+        self.index.save(index_file)
+        loaded_index = MarcOffsetIndex.load(index_file)
+
+        self.assertEqual(self.index.offsets, loaded_index.offsets)
+        self.assertEqual(bytes(self.index.get_view('b0000000003')), bytes(loaded_index.get_view('b0000000003')))
+
+        loaded_index.close()
+        os.remove(index_file)
+
+    def test_pickle(self):
+        unpickled_index = pickle.loads(pickle.dumps(self.index))
+
+        self.assertEqual(self.index.offsets, unpickled_index.offsets)
+        self.assertEqual(['b0000000011'], get_values_by_field(unpickled_index.get_record('b0000000011'), '001'))
+
+        unpickled_index.close()
+
+    def test_replace_and_remove(self):
+        raw_record = bytes(self.index.get_view('b0000000005'))
+        self.index.replace('b0000000100', raw_record)
+        self.index.remove('b0000000005')
+
+        self.assertEqual(['b0000000005'], get_values_by_field(self.index.get_record('b0000000100'), '001'))
+        self.assertIsNone(self.index.get_record('b0000000005'))
+        self.assertEqual(20, len(self.index))
+
+    def test_load_stale_index(self):
+        fd, index_file = tempfile.mkstemp()
+        os.close(fd)
+
+        self.index.save(index_file)
+        with open(self.path, 'ab') as fp:
+            fp.write(b'changed')
+
+        self.assertIsNone(MarcOffsetIndex.load(index_file))
+
+        os.remove(index_file)
+
+
+class TestMarcOffsetIndexOfEmptyFile(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.mrc')
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_empty_index(self):
+        index = MarcOffsetIndex(self.path)
+
+        self.assertEqual(0, len(index))
+        self.assertIsNone(index.get_record('b0000000001'))
+
+        index.close()
+
+    def test_pickle_and_replace(self):
+        rcd = Record(force_utf8=True)
+        rcd.add_field(Field('001', data='b0000000001'))
+
+        index = MarcOffsetIndex(self.path)
+        unpickled_index = pickle.loads(pickle.dumps(index))
+        unpickled_index.replace('b0000000001', rcd.as_marc())
+
+        self.assertEqual(['b0000000001'], get_values_by_field(unpickled_index.get_record('b0000000001'), '001'))
+
+        unpickled_index.close()
+        index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
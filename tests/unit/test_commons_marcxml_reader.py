@@ -0,0 +1,55 @@
+import io
+import unittest
+
+from pymarc import parse_xml_to_array
+
+from commons.marcxml_reader import read_marc_from_xml_file
+
+MARCXML = '''<?xml version="1.0" encoding="UTF-8"?>
+<collection xmlns="http://www.loc.gov/MARC21/slim">
+  <record>
+    <leader>00000nam a2200000 i 4500</leader>
+    <controlfield tag="001">m0000000001</controlfield>
+    <controlfield tag="008">200101s2001    pl            000 1 pol c</controlfield>
+    <datafield tag="245" ind1="1" ind2="0">
+      <subfield code="a">Quo vadis :</subfield>
+      <subfield code="b">powieść z czasów Nerona /</subfield>
+      <subfield code="c">Henryk Sienkiewicz.</subfield>
+    </datafield>
+    <datafield tag="AVA" ind1=" " ind2=" ">
+      <subfield code="b">lib1</subfield>
+      <subfield code="f">2</subfield>
+      <subfield code="u"></subfield>
+    </datafield>
+  </record>
+  <record>
+    <leader>00000nam a2200000 i 4500</leader>
+    <controlfield tag="001">m0000000002</controlfield>
+    <datafield tag="245" ind1="0">
+      <subfield code="a">Pan Tadeusz</subfield>
+    </datafield>
+  </record>
+</collection>
+'''
+
+
+class TestReadMarcFromXmlFile(unittest.TestCase):
+    def test_same_records_as_pymarc_parser(self):
+        expected = parse_xml_to_array(io.BytesIO(MARCXML.encode('utf-8')))
+        result = list(read_marc_from_xml_file(io.BytesIO(MARCXML.encode('utf-8'))))
+
+        self.assertEqual(len(expected), len(result))
+        for expected_record, record in zip(expected, result):
+            self.assertEqual(expected_record.leader, record.leader)
+            self.assertEqual([str(f) for f in expected_record.get_fields()], [str(f) for f in record.get_fields()])
+
+    def test_processed_records_are_dropped(self):
+        records = read_marc_from_xml_file(io.BytesIO(MARCXML.encode('utf-8')))
+        first_record = next(records)
+
+        self.assertEqual('m0000000001', first_record['001'].value())
+        self.assertEqual('m0000000002', next(records)['001'].value())
+
+
+if __name__ == '__main__':
+    unittest.main()
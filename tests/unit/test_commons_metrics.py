@@ -0,0 +1,125 @@
+import json
+import os
+import tempfile
+import unittest
+
+from commons.metrics import Metrics, metrics, instrumented, format_prometheus_report
+
+
+@instrumented('add_numbers')
+def add_numbers(a, b):
+    return a + b
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def tearDown(self):
+        self.metrics.disable()
+
+    def test_nothing_is_collected_while_disabled(self):
+        self.metrics.count('records')
+        self.metrics.add_time('function', 1.0)
+        with self.metrics.timer('block'):
+            pass
+        self.metrics.start_timer('phase')
+        self.metrics.stop_timer('phase')
+
+        self.assertEqual(({}, {}), self.metrics.get_snapshot())
+
+    def test_counters_and_timers(self):
+        self.metrics.enable()
+
+        self.metrics.count('records')
+        self.metrics.count('records', 2)
+        self.metrics.add_time('function', 0.5)
+        self.metrics.add_time('function', 0.25, calls=3)
+        with self.metrics.timer('block'):
+            pass
+        self.metrics.start_timer('phase')
+        self.metrics.stop_timer('phase')
+        # timer which wasn't started is ignored
+        self.metrics.stop_timer('other_phase')
+
+        counters, timers = self.metrics.get_snapshot()
+
+        self.assertEqual({'records': 3}, counters)
+        self.assertEqual((4, 0.75), timers['function'])
+        self.assertEqual(1, timers['block'][0])
+        self.assertEqual(1, timers['phase'][0])
+        self.assertNotIn('other_phase', timers)
+
+    def test_merge(self):
+        self.metrics.enable()
+        self.metrics.count('records', 2)
+        self.metrics.add_time('function', 1.0)
+
+        worker_metrics = Metrics()
+        worker_metrics.enable()
+        worker_metrics.count('records', 3)
+        worker_metrics.count('rejected.has_items')
+        worker_metrics.add_time('function', 0.5, calls=2)
+
+        self.metrics.merge(worker_metrics.get_snapshot())
+
+        self.assertEqual(({'records': 5, 'rejected.has_items': 1}, {'function': (3, 1.5)}),
+                         self.metrics.get_snapshot())
+
+    def test_instrumented(self):
+        metrics.reset()
+        self.assertEqual(3, add_numbers(1, 2))
+        self.assertEqual({}, metrics.get_snapshot()[1])
+
+        metrics.enable()
+        try:
+            self.assertEqual(3, add_numbers(1, 2))
+            self.assertEqual(5, add_numbers(2, 3))
+        finally:
+            metrics.disable()
+
+        self.assertEqual(2, metrics.get_snapshot()[1]['add_numbers'][0])
+        self.assertEqual('add_numbers', add_numbers.__name__)
+        metrics.reset()
+
+    def test_report(self):
+        self.metrics.enable(trace_memory=True)
+        self.metrics.count('rejected.is_single_work', 2)
+        self.metrics.count('bn_records_read', 10)
+        self.metrics.add_time('phase.first_loop', 1.5)
+
+        report = self.metrics.get_report()
+
+        self.assertEqual({'bn_records_read': 10, 'rejected.is_single_work': 2}, report['counters'])
+        self.assertEqual({'is_single_work': 2}, report['rejected_records'])
+        self.assertEqual({'phase.first_loop': {'calls': 1, 'seconds': 1.5}}, report['timers'])
+        self.assertGreater(report['peak_rss_bytes'], 0)
+        self.assertIn('peak_bytes', report['traced_memory'])
+
+    def test_write_report(self):
+        self.metrics.enable()
+        self.metrics.count('bn_records_read', 10)
+        self.metrics.add_time('phase.first_loop', 1.5)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            json_file = os.path.join(tmp_dir, 'metrics.json')
+            prometheus_file = os.path.join(tmp_dir, 'metrics.prom')
+            self.metrics.write_report(json_file)
+            self.metrics.write_report(prometheus_file)
+
+            with open(json_file, encoding='utf-8') as fp:
+                self.assertEqual({'bn_records_read': 10}, json.load(fp)['counters'])
+            with open(prometheus_file, encoding='utf-8') as fp:
+                prometheus_lines = fp.read().splitlines()
+
+        self.assertIn('frbrizer_events_total{name="bn_records_read"} 10', prometheus_lines)
+        self.assertIn('frbrizer_timer_seconds_total{name="phase.first_loop"} 1.5', prometheus_lines)
+        self.assertIn('frbrizer_timer_calls_total{name="phase.first_loop"} 1', prometheus_lines)
+
+    def test_prometheus_label_values_are_escaped(self):
+        report = {'counters': {'a "b"\\c': 1}, 'timers': {}, 'peak_rss_bytes': 1}
+        self.assertIn('frbrizer_events_total{name="a \\"b\\"\\\\c"} 1', format_prometheus_report(report).splitlines())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,23 @@
+import random
 import unittest
 
 import commons.normalization as cn
 
+from tests.unit.helpers import reference_prepare_name_for_indexing, reference_normalize_title
+
+
+CORPUS_CHARS = ('abcxyzABCXYZąćęłńóśźżĄĆĘŁŃÓŚŹŻßŉﬁ0123456789²½٣_ \t\n\r\x0b\x0c\x1c\xa0\u2003\u3000'
+                '/:;,=.-()[]?!\'"$%&*+<>@^`{|}~©§¶\u0301\u02bc日本')
+
+
+def generate_corpus(seed, size):
+    rnd = random.Random(seed)
+    corpus = ['', ' ', '  ', 'Sienkiewicz, Henryk (1846-1916)', 'Quo vadis : powieść z czasów Nerona /',
+              'a  b   c     d', 'a     b  c', 'x' + ' ' * 7 + 'y  z']
+    for num in range(size):
+        corpus.append(''.join(rnd.choice(CORPUS_CHARS) for char_num in range(rnd.randint(1, 40))))
+    return corpus
+
 
 class TestPrepareNameForIndexing(unittest.TestCase):
     def test_4_1(self):
@@ -37,5 +53,35 @@ class TestNormalizeTitle(unittest.TestCase):
         self.assertEqual(['usuń', 'usuń', 'usuń', 'usuń', 'usuń', 'usuń'], result)
 
 
+class TestNormalizeIsbn(unittest.TestCase):
+    def test_isbn_10_and_13_are_the_same(self):
+        self.assertEqual('9780306406157', cn.normalize_isbn('0-306-40615-2'))
+        self.assertEqual('9780306406157', cn.normalize_isbn('978-0-306-40615-7'))
+
+    def test_check_digit_x(self):
+        self.assertEqual('9780804429573', cn.normalize_isbn('0-8044-2957-x'))
+
+    def test_qualifier(self):
+        self.assertEqual('9788301000004', cn.normalize_isbn('83-01-00000-1 (oprawa)'))
+
+    def test_no_isbn(self):
+        self.assertEqual('brak', cn.normalize_isbn('brak'))
+
+
+class TestNormalizationCorpus(unittest.TestCase):
+    def test_prepare_name_for_indexing(self):
+        for name in generate_corpus(seed=1, size=20000):
+            self.assertEqual(reference_prepare_name_for_indexing(name), cn.prepare_name_for_indexing(name), repr(name))
+
+    def test_normalize_title(self):
+        for title in generate_corpus(seed=2, size=20000):
+            self.assertEqual(reference_normalize_title(title), cn.normalize_title(title), repr(title))
+
+    def test_cached_result_is_the_same(self):
+        name = 'Prus, Bolesław   (1847-1912).'
+        self.assertEqual(cn.prepare_name_for_indexing(name), cn.prepare_name_for_indexing(name))
+        self.assertEqual('PRUS BOLESŁAW 1847 1912', cn.prepare_name_for_indexing(name))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,71 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from commons.spill_store import SpillStore
+
+
+class TestSpillStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.spill_file = os.path.join(self.tmp_dir.name, 'spill', 'expressions.spill')
+        self.spill_store = SpillStore(self.spill_file)
+
+    def tearDown(self):
+        self.spill_store.close()
+        self.tmp_dir.cleanup()
+
+    def test_put_and_get(self):
+        self.spill_store.put(3, {'expression': ['manifestation 1', 'manifestation 2']})
+        self.spill_store.put(1, {})
+
+        self.assertEqual({'expression': ['manifestation 1', 'manifestation 2']}, self.spill_store.get(3))
+        self.assertEqual({}, self.spill_store.get(1))
+        self.assertIsNone(self.spill_store.get(2))
+        self.assertEqual('default', self.spill_store.get(2, 'default'))
+        self.assertEqual([1, 3], list(self.spill_store))
+        self.assertEqual(2, len(self.spill_store))
+        self.assertIn(3, self.spill_store)
+
+    def test_objects_are_copies(self):
+        obj = {'expression': []}
+        self.spill_store.put(0, obj)
+        obj['expression'].append('manifestation')
+
+        self.assertEqual({'expression': []}, self.spill_store.get(0))
+        self.assertIsNot(self.spill_store.get(0), self.spill_store.get(0))
+
+    def test_put_replaces_object(self):
+        self.spill_store.put(0, 'first')
+        self.assertEqual('first', self.spill_store.get(0))
+
+        self.spill_store.put(0, 'second')
+        self.assertEqual('second', self.spill_store.get(0))
+        self.assertEqual(1, len(self.spill_store))
+
+    def test_new_store_truncates_file(self):
+        self.spill_store.put(0, 'object')
+        self.spill_store.close()
+
+        self.spill_store = SpillStore(self.spill_file)
+        self.assertEqual(0, os.path.getsize(self.spill_file))
+        self.assertIsNone(self.spill_store.get(0))
+
+    def test_pickle(self):
+        self.spill_store.put(0, 'first')
+        self.spill_store.put(1, ['second'])
+
+        restored_store = pickle.loads(pickle.dumps(self.spill_store))
+
+        self.assertEqual('first', restored_store.get(0))
+        self.assertEqual(['second'], restored_store.get(1))
+
+        restored_store.put(2, 'third')
+        self.assertEqual('third', restored_store.get(2))
+        self.assertEqual('first', restored_store.get(0))
+        restored_store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
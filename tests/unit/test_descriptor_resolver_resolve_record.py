@@ -0,0 +1,51 @@
+import unittest
+
+from pymarc import Record, Field
+
+from commons.marc_iso_commons import serialize_to_jsonl_descr, serialize_to_jsonl_descr_creator
+from commons.marc_iso_commons import serialize_to_list_of_values
+from descriptor_resolver.resolve_record import resolve_record, resolve_field_value, only_values
+from exceptions.exceptions import DescriptorNotResolved
+from indexers.descriptor_index import DescriptorIndex
+from objects.helper_objects import ResolvedDescriptor
+
+
+class TestResolveRecord(unittest.TestCase):
+    def setUp(self):
+        self.descr_index = DescriptorIndex.from_descriptors(
+            [('SIENKIEWICZ HENRYK 1846 1916', '1001', 'person', 'Sienkiewicz, Henryk (1846-1916)'),
+             ('PRUS BOLESŁAW 1847 1912', '1002', 'person', 'Prus, Bolesław (1847-1912)')])
+        self.sienkiewicz = ResolvedDescriptor(1001, 'person', 'Sienkiewicz, Henryk (1846-1916)')
+        self.prus = ResolvedDescriptor(1002, 'person', 'Prus, Bolesław (1847-1912)')
+
+        self.record = Record()
+        self.record.add_field(Field('100', ['1', ' '], ['a', 'Sienkiewicz, Henryk', 'd', '(1846-1916).']))
+        self.record.add_field(Field('700', ['1', ' '], ['a', 'Prus, Bolesław', 'd', '(1847-1912)', 'e', 'Red.']))
+
+    def test_resolve_record(self):
+        resolved_descriptors = resolve_record(self.record, self.descr_index)
+
+        self.assertEqual({'100': [self.sienkiewicz], '700': [self.prus]}, resolved_descriptors)
+        self.assertEqual([], self.record['100'].get_subfields('0'))
+
+    def test_not_resolved_record(self):
+        self.record.add_field(Field('700', ['1', ' '], ['a', 'Lem, Stanisław']))
+
+        with self.assertRaises(DescriptorNotResolved):
+            resolve_record(self.record, self.descr_index)
+
+    def test_resolve_field_value_and_serialize(self):
+        resolved = resolve_field_value(['Prus, Bolesław (1847-1912)', 'Lem, Stanisław'], self.descr_index)
+
+        self.assertEqual([self.prus], resolved)
+        self.assertEqual(['Prus, Bolesław (1847-1912)'], only_values(resolved))
+        self.assertEqual(['Prus, Bolesław (1847-1912)'], serialize_to_list_of_values(resolved))
+        self.assertEqual([{'id': 1002, 'type': 'person', 'value': 'Prus, Bolesław (1847-1912)'}],
+                         serialize_to_jsonl_descr(resolved))
+        self.assertEqual([{'key': 'Autor', 'value': [{'id': 1002, 'type': 'person',
+                                                      'value': 'Prus, Bolesław (1847-1912)'}]}],
+                         serialize_to_jsonl_descr_creator(resolved))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,317 @@
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import unittest
+
+from pymarc.marcxml import record_to_xml
+
+import frbrizer
+from commons.checkpoint import load_checkpoint
+from commons.json_writer import JsonBufferOut
+from commons.marc_iso_commons import get_marc_file_chunks, read_marc_from_file_with_offsets
+from indexers.descriptors_indexer import index_descriptors
+from manifestation_matcher.manif_match_data_index import BnManifMatchDataIndex
+
+from benchmarks.synthetic_corpus import copy_record_for_mak, generate_corpus
+from benchmarks.synthetic_corpus import write_code_values, write_descriptors, write_institutions
+from tests.unit.helpers import create_book_record, write_marc_file
+
+PRUS = 'Prus, Bolesław (1847-1912)'
+SIENKIEWICZ = 'Sienkiewicz, Henryk (1846-1916)'
+UUID_PATTERN = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+
+def get_stub_data(work, nlp_id, offset, titles_for_manif_match, manif_match_data):
+    return work.as_stub(), nlp_id, offset, titles_for_manif_match, manif_match_data
+
+
+class TestFirstLoop(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus_dir = tempfile.TemporaryDirectory()
+        cls.paths = generate_corpus(cls.corpus_dir.name, bn_records=300, mak_files=0, seed=1)
+        cls.descr_index = index_descriptors(cls.paths['descr_files_in'])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.corpus_dir.cleanup()
+
+    def test_parallel_first_loop_is_the_same_as_serial(self):
+        bn_file = self.paths['bn_file_in']
+
+        serial = [get_stub_data(*work_stub) for work_stub
+                  in frbrizer.get_work_stubs(read_marc_from_file_with_offsets(bn_file), self.descr_index)]
+        # small chunks - more of them than are handed out to workers at once
+        parallel = [get_stub_data(*work_stub) for work_stub
+                    in frbrizer.get_work_stubs_in_parallel(bn_file, self.descr_index, workers=2,
+                                                           chunk_size=16 * 1024)]
+
+        self.assertGreater(len(get_marc_file_chunks(bn_file, 16 * 1024)), 4)
+        self.assertGreater(len(serial), 200)
+        self.assertEqual([nlp_id for stub, nlp_id, offset, titles, match_data in serial],
+                         [nlp_id for stub, nlp_id, offset, titles, match_data in parallel])
+        self.assertEqual(serial, parallel)
+
+    def test_closed_parallel_first_loop_releases_shared_descriptor_index(self):
+        work_stubs = frbrizer.get_work_stubs_in_parallel(self.paths['bn_file_in'], self.descr_index, workers=2)
+        next(work_stubs)
+
+        self.assertIsNotNone(self.descr_index.shm)
+        work_stubs.close()
+        self.assertIsNone(self.descr_index.shm)
+
+
+def get_bn_indexes_for_mak_matching(bn_file, descr_index):
+    # title indexes and match data index - the same way as they are built in the first loop
+    index_245, index_490, index_match_data = {}, {}, BnManifMatchDataIndex()
+
+    for work, nlp_id, offset, titles_for_manif_match, manif_match_data \
+            in frbrizer.get_work_stubs(read_marc_from_file_with_offsets(bn_file), descr_index):
+        for title in titles_for_manif_match.get('titles_245'):
+            index_245.setdefault(title, set()).add(nlp_id)
+        for title in titles_for_manif_match.get('titles_490'):
+            index_490.setdefault(title, set()).add(nlp_id)
+        index_match_data.add(nlp_id, manif_match_data)
+
+    return index_245, index_490, index_match_data
+
+
+def get_match_data(mak_matches):
+    return [([str(field) for field in list_ava], match) for list_ava, match in mak_matches]
+
+
+class TestMakMatching(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus_dir = tempfile.TemporaryDirectory()
+        cls.paths = generate_corpus(cls.corpus_dir.name, bn_records=300, mak_files=4, mak_records_per_file=50,
+                                    seed=2)
+        cls.indexes = get_bn_indexes_for_mak_matching(cls.paths['bn_file_in'],
+                                                      index_descriptors(cls.paths['descr_files_in']))
+        cls.paths_files = [os.path.join(cls.paths['mak_files_in'], filename)
+                           for filename in sorted(os.listdir(cls.paths['mak_files_in']))]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.corpus_dir.cleanup()
+
+    def test_parallel_mak_matching_is_the_same_as_serial(self):
+        serial = get_match_data(frbrizer.get_mak_matches_from_files(self.paths_files, *self.indexes,
+                                                                    match_cache_size=1000))
+        parallel = get_match_data(frbrizer.get_mak_matches_in_parallel(self.paths_files, *self.indexes,
+                                                                       match_cache_size=1000, workers=2))
+
+        self.assertGreater(len(serial), 50)
+        self.assertEqual(serial, parallel)
+
+
+DUMP_INDEXES = ['item', 'materialization', 'expression', 'work', 'expression_data', 'work_data']
+
+
+def get_dump_docs(output_dir, index):
+    # popularity docs (routed to their parent docs) are skipped
+    with open(os.path.join(output_dir, f'{index}.json'), encoding='utf-8') as fp:
+        return {doc['_id']: doc for doc in map(json.loads, fp) if '_routing' not in doc}
+
+
+def get_masked_dump_docs(output_dir, index):
+    # all the docs, with uuids masked (they differ between runs)
+    with open(os.path.join(output_dir, f'{index}.json'), encoding='utf-8') as fp:
+        return {doc['_id']: doc for doc in (json.loads(UUID_PATTERN.sub('uuid', line)) for line in fp)}
+
+
+class DeltaTestCase(unittest.TestCase):
+    # runs of frbrizer over small input files written to temporary directory
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.dir = self.tmpdir.name
+
+        os.makedirs(self.get_path('descriptors'))
+        os.makedirs(self.get_path('mak'))
+        write_descriptors(self.get_path('descriptors', 'descriptors.jsonl'), [PRUS, SIENKIEWICZ])
+        write_code_values(self.get_path('code_values.sql'))
+        write_institutions(self.get_path('institutions.json'))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def get_path(self, *names):
+        return os.path.join(self.dir, *names)
+
+    def run_frbrizer(self, loop, output_dir, **kwargs):
+        os.makedirs(self.get_path(output_dir))
+        buffer = JsonBufferOut(*(self.get_path(output_dir, f'{index}.json') for index in DUMP_INDEXES))
+        configuration = {'bn_file_in': self.get_path('bn.mrc'),
+                         'mak_files_in': self.get_path('mak'),
+                         'inst_file_in': self.get_path('institutions.json'),
+                         'code_val_file_in': self.get_path('code_values.sql'),
+                         'descr_files_in': self.get_path('descriptors'),
+                         'buffer': buffer,
+                         'run_manif_matcher': False,
+                         'frbr_step_two': True,
+                         'limit': sys.maxsize,
+                         'limit_mak': sys.maxsize,
+                         'first_loop_workers': 1,
+                         'mak_workers': 1,
+                         'mak_match_cache_size': 0,
+                         'bn_offset_index_file': None,
+                         'index_cache_dir': None,
+                         'checkpoint_dir': self.get_path('checkpoints'),
+                         'resume_from': None,
+                         'bn_delta_file_in': self.get_path('bn_delta.mrc'),
+                         'deleted_file_out': self.get_path(output_dir, 'deleted.json'),
+                         'spill_dir': None,
+                         'metrics_file': None,
+                         'profile_file': None,
+                         'trace_memory': False}
+        configuration.update(kwargs)
+
+        with buffer:
+            loop(configuration)
+
+    def get_written_ids(self, output_dir):
+        ids = set()
+        for index in DUMP_INDEXES:
+            with open(self.get_path(output_dir, f'{index}.json'), encoding='utf-8') as fp:
+                ids.update(json.loads(line)['_id'] for line in fp)
+        return ids
+
+
+class TestDelta(DeltaTestCase):
+    # full run over bn file, then delta run - works: Lalka (b1, b2), Quo vadis (b3), Potop (b4),
+    # Emancypantki (b5, b6)
+    # delta: b2 and b3 deleted, b4 changed to Krzyżacy, b7 new Emancypantki
+    def setUp(self):
+        super().setUp()
+
+        write_marc_file(self.get_path('bn.mrc'), [create_book_record('b0000000001', 'Lalka', PRUS),
+                                                  create_book_record('b0000000002', 'Lalka', PRUS),
+                                                  create_book_record('b0000000003', 'Quo vadis', SIENKIEWICZ),
+                                                  create_book_record('b0000000004', 'Potop', SIENKIEWICZ),
+                                                  create_book_record('b0000000005', 'Emancypantki', PRUS),
+                                                  create_book_record('b0000000006', 'Emancypantki', PRUS)])
+        write_marc_file(self.get_path('bn_delta.mrc'),
+                        [create_book_record('b0000000002', 'Lalka', PRUS, status='d'),
+                         create_book_record('b0000000003', 'Quo vadis', SIENKIEWICZ, status='d'),
+                         create_book_record('b0000000004', 'Krzyżacy', SIENKIEWICZ),
+                         create_book_record('b0000000007', 'Emancypantki', PRUS)])
+
+        self.run_frbrizer(frbrizer.main_loop, 'full')
+
+    def load_state(self):
+        return load_checkpoint(self.get_path('checkpoints'), 'step_two', [self.get_path('bn.mrc')])[0]
+
+    def test_apply_bn_delta(self):
+        frbr_state = self.load_state()
+        indexed_works = frbr_state['indexed_works']
+        works_by_bn_id = frbrizer.get_works_by_bn_id(indexed_works)
+        lalka_uuid = indexed_works.get(works_by_bn_id['b0000000001']).uuid
+
+        affected_work_ids, removed_work_ids = frbrizer.apply_bn_delta(self.get_path('bn_delta.mrc'), frbr_state,
+                                                                      index_descriptors(self.get_path('descriptors')))
+        new_works_by_bn_id = frbrizer.get_works_by_bn_id(indexed_works)
+
+        self.assertEqual({works_by_bn_id['b0000000003'], works_by_bn_id['b0000000004']}, removed_work_ids)
+        self.assertEqual({works_by_bn_id['b0000000001'], works_by_bn_id['b0000000005'],
+                          new_works_by_bn_id['b0000000004']}, affected_work_ids)
+        self.assertNotIn(new_works_by_bn_id['b0000000004'], works_by_bn_id.values())
+
+        # rebuilt work keeps its ids
+        lalka = indexed_works.get(works_by_bn_id['b0000000001'])
+        self.assertEqual({'b0000000001'}, lalka.manifestations_bn_ids)
+        self.assertEqual(lalka_uuid, lalka.uuid)
+        self.assertEqual({'b0000000005', 'b0000000006', 'b0000000007'},
+                         indexed_works.get(works_by_bn_id['b0000000005']).manifestations_bn_ids)
+
+        indexed_manifestations_bn_by_nlp_id = frbr_state['indexed_manifestations_bn_by_nlp_id']
+        self.assertNotIn('b0000000002', indexed_manifestations_bn_by_nlp_id)
+        self.assertNotIn('b0000000003', indexed_manifestations_bn_by_nlp_id)
+        self.assertEqual('Krzyżacy /', indexed_manifestations_bn_by_nlp_id.get_record('b0000000004')['245']['a'])
+        self.assertIn('b0000000007', indexed_manifestations_bn_by_nlp_id)
+        self.assertEqual({'b0000000001'}, frbr_state['indexed_manifestations_bn_by_titles_245']['Lalka /'])
+
+    def test_delta_loop(self):
+        self.run_frbrizer(frbrizer.delta_loop, 'delta')
+
+        full_works = get_dump_docs(self.get_path('full'), 'work')
+        delta_works = get_dump_docs(self.get_path('delta'), 'work')
+
+        # only affected works are written - rebuilt ones keep their ids
+        self.assertEqual({'111110000000001', '111110000000003', '111110000000004', '111110000000005'},
+                         set(full_works))
+        self.assertEqual({'111110000000001', '111110000000004', '111110000000005'}, set(delta_works))
+        self.assertEqual(1, delta_works['111110000000001']['_source']['stat_materialization_count'])
+        self.assertEqual('Krzyżacy', delta_works['111110000000004']['_source']['work_title_pref'])
+        self.assertEqual(3, delta_works['111110000000005']['_source']['stat_materialization_count'])
+
+        delta_manifestations = get_dump_docs(self.get_path('delta'), 'materialization')
+        self.assertEqual({'113330000000001', '113330000000004', '113330000000005', '113330000000006',
+                          '113330000000007'}, set(delta_manifestations))
+
+    def test_delta_loop_deletes_docs_which_are_not_written_again(self):
+        self.run_frbrizer(frbrizer.delta_loop, 'delta')
+
+        with open(self.get_path('delta', 'deleted.json'), encoding='utf-8') as fp:
+            deleted_docs = [json.loads(line)['delete'] for line in fp]
+
+        # all the works are affected or removed - every doc which isn't written again is deleted: docs of removed
+        # work (Quo vadis - b3), of deleted record of rebuilt work (Lalka - b2) and its data docs
+        self.assertEqual(sorted(self.get_written_ids('full') - self.get_written_ids('delta')),
+                         sorted(doc['_id'] for doc in deleted_docs))
+        self.assertIn('113330000000002', [doc['_id'] for doc in deleted_docs])
+        self.assertIn({'_index': 'work', '_type': 'work', '_id': '111110000000003'}, deleted_docs)
+        self.assertIn({'_index': 'work', '_type': 'work', '_id': 'p111110000000003', '_routing': '111110000000003'},
+                      deleted_docs)
+
+        # the next delta deletes what was written by previous one
+        write_marc_file(self.get_path('bn_delta.mrc'), [create_book_record('b0000000007', 'Lalka', PRUS, status='d')])
+        self.run_frbrizer(frbrizer.delta_loop, 'delta_2')
+
+        with open(self.get_path('delta_2', 'deleted.json'), encoding='utf-8') as fp:
+            deleted_ids = [json.loads(line)['delete']['_id'] for line in fp]
+        self.assertIn('113330000000007', deleted_ids)
+        self.assertNotIn('111110000000005', deleted_ids)
+
+    def test_delta_loop_without_checkpoint(self):
+        with self.assertRaises(frbrizer.CheckpointNotAvailable):
+            self.run_frbrizer(frbrizer.delta_loop, 'delta', checkpoint_dir=self.get_path('no_checkpoints'))
+
+
+class TestDeltaWithMakItems(DeltaTestCase):
+    # Lalka by Prus (b1) and Lalka by Sienkiewicz (b9) - different works, but the same manifestation data,
+    # so mak+ copy of b1 is matched with b1 (the lowest nlp id) - delta: b9 changed (without any difference)
+    def setUp(self):
+        super().setUp()
+
+        lalka = create_book_record('b0000000001', 'Lalka', PRUS)
+        write_marc_file(self.get_path('bn.mrc'), [lalka, create_book_record('b0000000009', 'Lalka', SIENKIEWICZ)])
+        write_marc_file(self.get_path('bn_delta.mrc'),
+                        [create_book_record('b0000000009', 'Lalka', SIENKIEWICZ, status='c')])
+
+        with open(self.get_path('mak', 'mak_0.xml'), 'wb') as fp:
+            fp.write(b'<?xml version="1.0" encoding="UTF-8"?><collection xmlns="http://www.loc.gov/MARC21/slim">')
+            fp.write(record_to_xml(copy_record_for_mak(random.Random(0), lalka, 'm0000000001'), namespace=False))
+            fp.write(b'</collection>')
+
+        self.run_frbrizer(frbrizer.main_loop, 'full', run_manif_matcher=True)
+
+    def test_delta_loop_writes_the_same_docs_as_full_run(self):
+        self.run_frbrizer(frbrizer.delta_loop, 'delta', run_manif_matcher=True)
+        self.run_frbrizer(frbrizer.main_loop, 'full_after_delta', run_manif_matcher=True,
+                          checkpoint_dir=self.get_path('checkpoints_after_delta'))
+
+        self.assertIn('1113330000000001', get_dump_docs(self.get_path('full'), 'item'))
+
+        for index in DUMP_INDEXES:
+            full_docs = get_masked_dump_docs(self.get_path('full_after_delta'), index)
+            delta_docs = get_masked_dump_docs(self.get_path('delta'), index)
+
+            self.assertTrue(delta_docs)
+            self.assertEqual({doc_id: full_docs.get(doc_id) for doc_id in delta_docs}, delta_docs)
+
+
+if __name__ == '__main__':
+    unittest.main()
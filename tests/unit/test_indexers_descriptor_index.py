@@ -0,0 +1,60 @@
+import pickle
+import unittest
+
+from indexers.descriptor_index import DescriptorIndex
+from objects.helper_objects import ResolvedDescriptor
+
+
+DESCRIPTORS = [('SIENKIEWICZ HENRYK 1846 1916', '1001', 'person', 'Sienkiewicz, Henryk (1846-1916)'),
+               ('POLSKA', '2001', 'geographical', 'Polska'),
+               ('POWIEŚĆ POLSKA', 'a-12', 'form', 'Powieść polska'),
+               ('SIENKIEWICZ HENRYK 1846 1916', '1002', 'person', 'Sienkiewicz, Henryk, 1846-1916'),
+               ('ZERO', '0012', 'subject', 'Zero')]
+
+
+class TestDescriptorIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = DescriptorIndex.from_descriptors(DESCRIPTORS)
+        # first descriptor with given indexing name wins, es_ids are integers if they're canonical
+        self.expected = {'SIENKIEWICZ HENRYK 1846 1916': ResolvedDescriptor(1001, 'person',
+                                                                           'Sienkiewicz, Henryk (1846-1916)'),
+                         'POLSKA': ResolvedDescriptor(2001, 'geographical', 'Polska'),
+                         'POWIEŚĆ POLSKA': ResolvedDescriptor('a-12', 'form', 'Powieść polska'),
+                         'ZERO': ResolvedDescriptor('0012', 'subject', 'Zero')}
+
+    def assert_same_as_dict(self, index):
+        self.assertEqual(len(self.expected), len(index))
+        for indexing_name, descriptor in self.expected.items():
+            self.assertIn(indexing_name, index)
+            self.assertEqual(descriptor, index.get(indexing_name))
+
+        self.assertNotIn('LEM STANISŁAW', index)
+        self.assertNotIn(None, index)
+        self.assertIsNone(index.get('LEM STANISŁAW'))
+
+    def test_lookup(self):
+        self.assert_same_as_dict(self.index)
+
+    def test_pickle(self):
+        self.assert_same_as_dict(pickle.loads(pickle.dumps(self.index)))
+
+    def test_shared_memory(self):
+        handle = self.index.share()
+        try:
+            attached_index = DescriptorIndex.attach(handle)
+            try:
+                self.assert_same_as_dict(attached_index)
+            finally:
+                attached_index.close()
+        finally:
+            self.index.unlink()
+
+    def test_empty_index(self):
+        index = DescriptorIndex.from_descriptors([])
+
+        self.assertEqual(0, len(index))
+        self.assertNotIn('POLSKA', index)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+from indexers.index_cache import get_index
+
+
+class TestIndexCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp_dir.name, 'cache')
+        self.source_file = os.path.join(self.tmp_dir.name, 'source.txt')
+        self.builds = 0
+
+        with open(self.source_file, 'w', encoding='utf-8') as fp:
+            fp.write('a b\nc d\n')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def create_index(self, source_path):
+        self.builds += 1
+        with open(source_path, 'r', encoding='utf-8') as fp:
+            return dict(line.split() for line in fp)
+
+    def test_index_is_built_once(self):
+        first = get_index(self.create_index, self.source_file, self.cache_dir, 'test')
+        second = get_index(self.create_index, self.source_file, self.cache_dir, 'test')
+
+        self.assertEqual({'a': 'b', 'c': 'd'}, first)
+        self.assertEqual(first, second)
+        self.assertEqual(1, self.builds)
+
+    def test_changed_source_invalidates_cache(self):
+        get_index(self.create_index, self.source_file, self.cache_dir, 'test')
+        with open(self.source_file, 'a', encoding='utf-8') as fp:
+            fp.write('e f\n')
+
+        index = get_index(self.create_index, self.source_file, self.cache_dir, 'test')
+
+        self.assertEqual({'a': 'b', 'c': 'd', 'e': 'f'}, index)
+        self.assertEqual(2, self.builds)
+
+    def test_touched_source_with_same_content_uses_cache(self):
+        get_index(self.create_index, self.source_file, self.cache_dir, 'test')
+        file_stat = os.stat(self.source_file)
+        os.utime(self.source_file, ns=(file_stat.st_atime_ns, file_stat.st_mtime_ns + 10 ** 9))
+
+        get_index(self.create_index, self.source_file, self.cache_dir, 'test')
+
+        self.assertEqual(1, self.builds)
+
+    def test_no_cache_dir(self):
+        get_index(self.create_index, self.source_file)
+        get_index(self.create_index, self.source_file)
+
+        self.assertEqual(2, self.builds)
+        self.assertFalse(os.path.exists(self.cache_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+
+from indexers.work_clusters import DisjointSet, get_work_clusters, merge_work_clusters
+from indexers.work_match_index import WorkMatchIndex
+from objects.helper_objects import ResolvedDescriptor
+
+from tests.unit.helpers import get_work
+
+SIENKIEWICZ = ResolvedDescriptor(1001, 'person', 'Sienkiewicz, Henryk (1846-1916)')
+PRUS = ResolvedDescriptor(1002, 'person', 'Prus, Bolesław (1847-1912)')
+
+
+class TestDisjointSet(unittest.TestCase):
+    def test_union_and_find(self):
+        disjoint_set = DisjointSet(6)
+        disjoint_set.union(4, 5)
+        disjoint_set.union(5, 2)
+        disjoint_set.union(1, 3)
+
+        self.assertEqual([0, 1, 2, 1, 2, 2], [disjoint_set.find(item) for item in range(6)])
+
+        disjoint_set.union(3, 4)
+
+        self.assertEqual([0, 1, 1, 1, 1, 1], [disjoint_set.find(item) for item in range(6)])
+
+
+class TestWorkClusters(unittest.TestCase):
+    def setUp(self):
+        self.index = WorkMatchIndex()
+
+        # step one - third work matches both first and second one, so it's merged into first one
+        # and first one is indexed by title of the second one
+        for work in [get_work(['Krzyżacy'], [SIENKIEWICZ], bn_id='b0000000001'),
+                     get_work(['Rycerze krzyżowi'], [SIENKIEWICZ], bn_id='b0000000002'),
+                     get_work(['Krzyżacy', 'Rycerze krzyżowi'], [SIENKIEWICZ], bn_id='b0000000003'),
+                     get_work(['Lalka'], [PRUS], bn_id='b0000000004'),
+                     get_work(['Krzyżacy'], [PRUS], bn_id='b0000000005')]:
+            work.match_with_existing_work_and_index(self.index)
+
+    def test_get_work_clusters(self):
+        self.assertEqual([[0, 1]], get_work_clusters(self.index))
+
+    def test_merge_work_clusters(self):
+        merged_works_count = merge_work_clusters(self.index, get_work_clusters(self.index))
+
+        self.assertEqual(1, merged_works_count)
+        self.assertEqual([0, 2, 3], [work_id for work_id, work in self.index])
+        self.assertEqual({'b0000000001', 'b0000000002', 'b0000000003'}, self.index.get(0).manifestations_bn_ids)
+        self.assertEqual({'Krzyżacy', 'Rycerze krzyżowi'}, set(self.index.get(0).titles245['pol']))
+        self.assertEqual([], get_work_clusters(self.index))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+
+from indexers.work_match_index import WorkMatchIndex
+from objects.helper_objects import ResolvedDescriptor
+
+from tests.unit.helpers import get_work
+
+SIENKIEWICZ = ResolvedDescriptor(1001, 'person', 'Sienkiewicz, Henryk (1846-1916)')
+PRUS = ResolvedDescriptor(1002, 'person', 'Prus, Bolesław (1847-1912)')
+KONOPNICKA = ResolvedDescriptor(1003, 'person', 'Konopnicka, Maria (1842-1910)')
+
+
+class TestWorkMatchIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = WorkMatchIndex()
+        self.quo_vadis_id = self.index.add(get_work(['Quo vadis'], [SIENKIEWICZ]), {'QUO VADIS'})
+        self.lalka_id = self.index.add(get_work(['Lalka'], [PRUS]), {'LALKA'})
+        self.anthology_id = self.index.add(get_work(['Nowele'], [], [PRUS, KONOPNICKA]), {'NOWELE'})
+        self.anonymous_id = self.index.add(get_work(['Nowele']), {'NOWELE'})
+
+    def test_ids_are_dense(self):
+        self.assertEqual([0, 1, 2, 3], [self.quo_vadis_id, self.lalka_id, self.anthology_id, self.anonymous_id])
+        self.assertEqual(4, len(self.index))
+
+    def test_match_by_common_main_creator(self):
+        self.assertEqual([self.quo_vadis_id, self.lalka_id],
+                         self.index.find_matches({'QUO VADIS', 'LALKA'}, {SIENKIEWICZ, PRUS}, set()))
+        self.assertEqual([], self.index.find_matches({'QUO VADIS'}, {PRUS}, set()))
+
+    def test_match_by_the_same_other_creators(self):
+        self.assertEqual([self.anthology_id], self.index.find_matches({'NOWELE'}, set(), {KONOPNICKA, PRUS}))
+        self.assertEqual([], self.index.find_matches({'NOWELE'}, set(), {PRUS}))
+
+    def test_match_without_creators(self):
+        self.assertEqual([self.anonymous_id], self.index.find_matches({'NOWELE'}, set(), set()))
+
+    def test_excluded_and_removed_works_are_not_matched(self):
+        self.assertEqual([], self.index.find_matches({'LALKA'}, {PRUS}, set(), exclude_id=self.lalka_id))
+
+        self.index.remove(self.lalka_id)
+
+        self.assertEqual([], self.index.find_matches({'LALKA'}, {PRUS}, set()))
+        self.assertIsNone(self.index.get(self.lalka_id))
+        self.assertNotIn(self.lalka_id, [work_id for work_id, work in self.index])
+
+    def test_add_titles(self):
+        self.index.add_titles(self.quo_vadis_id, {'LALKA', 'QUO VADIS'})
+        self.index.add_titles(self.quo_vadis_id, {'LALKA'})
+
+        self.assertEqual([self.quo_vadis_id, self.lalka_id], list(self.index.ids_by_title['LALKA']))
+        self.assertEqual([self.quo_vadis_id], list(self.index.ids_by_title['QUO VADIS']))
+        self.assertEqual([self.quo_vadis_id, self.lalka_id],
+                         self.index.find_matches({'LALKA'}, {SIENKIEWICZ, PRUS}, set()))
+
+
+    def test_remove_titles(self):
+        self.index.remove_titles(self.anthology_id, {'NOWELE', 'LALKA'})
+        self.index.remove_titles(self.lalka_id, {'LALKA'})
+
+        self.assertEqual([self.anonymous_id], list(self.index.ids_by_title['NOWELE']))
+        self.assertNotIn('LALKA', self.index.ids_by_title)
+
+    def test_replace(self):
+        self.index.replace(self.lalka_id, get_work(['Emancypantki'], [PRUS, KONOPNICKA]), {'EMANCYPANTKI'})
+
+        self.assertEqual([], self.index.find_matches({'LALKA'}, {PRUS}, set()))
+        self.assertEqual([self.lalka_id], self.index.find_matches({'EMANCYPANTKI'}, {KONOPNICKA}, set()))
+
+
+class TestWorkMatching(unittest.TestCase):
+    def setUp(self):
+        self.index = WorkMatchIndex()
+
+    def test_match_with_existing_work_and_index(self):
+        get_work(['Quo vadis'], [SIENKIEWICZ], bn_id='b0000000001').match_with_existing_work_and_index(self.index)
+        get_work(['Quo vadis.'], [SIENKIEWICZ], bn_id='b0000000002').match_with_existing_work_and_index(self.index)
+        work_id = get_work(['Lalka'], [PRUS], bn_id='b0000000003').match_with_existing_work_and_index(self.index)
+
+        self.assertEqual(1, work_id)
+
+        self.assertEqual(2, len(self.index))
+        self.assertEqual({'b0000000001', 'b0000000002'}, self.index.get(0).manifestations_bn_ids)
+        self.assertEqual([0], list(self.index.ids_by_title['QUO VADIS']))
+
+    def test_get_possible_duplicates_using_broader_context(self):
+        get_work(['Quo vadis'], [SIENKIEWICZ], bn_id='b0000000001').match_with_existing_work_and_index(self.index)
+        get_work(['Quo vadis'], [PRUS], bn_id='b0000000002').match_with_existing_work_and_index(self.index)
+
+        duplicate = get_work(['Quo vadis'], [SIENKIEWICZ, PRUS], bn_id='b0000000003')
+        duplicate_id = self.index.add(duplicate, duplicate.get_title_keys_for_matching())
+
+        self.assertEqual([0, 1], duplicate.get_possible_duplicates_using_broader_context(duplicate_id, self.index))
+
+        self.index.remove(1)
+
+        self.assertEqual([0], duplicate.get_possible_duplicates_using_broader_context(duplicate_id, self.index))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+from exceptions.exceptions import ManifMatchDataNotAvailable
+from manifestation_matcher.manif_match_data_index import BnManifMatchDataIndex
+from objects.helper_objects import ManifMatchData
+
+
+class TestBnManifMatchDataIndex(unittest.TestCase):
+    def setUp(self):
+        self.data = ManifMatchData(ldr_67='am', val_008_0614='s2001    ', isbn_020_az=['9788300000011'],
+                                   title_245='Quo vadis : powieść z czasów Nerona /',
+                                   title_245_no_offset='Quo vadis : powieść z cza',
+                                   title_245_with_offset='Quo vadis : powieść z cza', titles_490=[],
+                                   numbers_from_title_245='', place_pub_260_a_first_word='Warszawa',
+                                   num_of_pages_300_a=301, b_format=21, edition=[])
+        self.index = BnManifMatchDataIndex()
+        self.index.add('b0000000001', self.data)
+        self.index.add('b0000000002', None)
+
+    def test_get_returns_data_used_on_bn_side(self):
+        result = self.index.get('b0000000001')
+
+        self.assertEqual(self.data.ldr_67, result.ldr_67)
+        self.assertEqual(self.data.val_008_0614, result.val_008_0614)
+        self.assertEqual(self.data.isbn_020_az, result.isbn_020_az)
+        self.assertEqual(self.data.title_245[-5:], result.title_245[-5:])
+        self.assertEqual(self.data.numbers_from_title_245, result.numbers_from_title_245)
+        self.assertEqual(self.data.place_pub_260_a_first_word, result.place_pub_260_a_first_word)
+        self.assertEqual(self.data.num_of_pages_300_a, result.num_of_pages_300_a)
+        self.assertEqual(self.data.b_format, result.b_format)
+        self.assertEqual(self.data.edition, result.edition)
+
+    def test_get_invalid_record(self):
+        with self.assertRaises(ManifMatchDataNotAvailable):
+            self.index.get('b0000000002')
+
+    def test_remove(self):
+        self.index.remove('b0000000001')
+        self.index.remove('b0000000003')
+
+        self.assertIsNone(self.index.get('b0000000001'))
+        self.assertNotIn('b0000000001', self.index)
+
+    def test_get_missing_record(self):
+        self.assertIsNone(self.index.get('b0000000003'))
+
+    def test_get_rows(self):
+        self.index.add('b0000000003', self.data)
+
+        self.assertEqual([1, 0], self.index.get_rows(['b0000000003', 'b0000000001']))
+        # the same values are stored once
+        self.assertEqual(self.index.ldr_67_008[0], self.index.ldr_67_008[1])
+
+        with self.assertRaises(ManifMatchDataNotAvailable):
+            self.index.get_rows(['b0000000001', 'b0000000002'])
+        with self.assertRaises(ManifMatchDataNotAvailable):
+            self.index.get_rows(['b0000000004'])
+
+    def test_blocks(self):
+        mak_data = self.data._replace(isbn_020_az=['978-83-00-00001-1'])
+        self.assertEqual([{'b0000000001'}, {'b0000000001'}], self.index.get_blocks(mak_data))
+
+        mak_data = self.data._replace(isbn_020_az=[], place_pub_260_a_first_word='Kraków')
+        self.assertEqual([], self.index.get_blocks(mak_data))
+
+    def test_remove_from_blocks(self):
+        self.index.add('b0000000003', self.data)
+        self.index.remove('b0000000001')
+        self.assertEqual([{'b0000000003'}, {'b0000000003'}], self.index.get_blocks(self.data))
+
+        self.index.remove('b0000000003')
+        self.index.remove('b0000000002')
+        self.assertEqual(({}, {}, set()), (self.index.by_isbn, self.index.by_publication,
+                                           self.index.without_match_data))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import unittest
+
+from exceptions.exceptions import ManifMatchDataNotAvailable
+from manifestation_matcher.manif_match_data_index import BnManifMatchDataIndex
+from manifestation_matcher.manif_matcher import get_blocked_candidates, get_isbn_cases, get_match_data_fingerprint
+from manifestation_matcher.manif_matcher import match_candidates, match_manifestation
+from objects.helper_objects import ManifMatchData
+
+
+def get_manif_match_data(**kwargs):
+    data = dict(ldr_67='am', val_008_0614='s2001    ', isbn_020_az=['9788300000011'],
+                title_245='Quo vadis : powieść z czasów Nerona /', title_245_no_offset='Quo vadis : powieść z cza',
+                title_245_with_offset='Quo vadis : powieść z cza', titles_490=[], numbers_from_title_245='',
+                place_pub_260_a_first_word='Warszawa', num_of_pages_300_a=301, b_format=21, edition=[])
+    data.update(kwargs)
+    return ManifMatchData(**data)
+
+
+class TestGetIsbnCases(unittest.TestCase):
+    def test_no_isbns(self):
+        self.assertEqual((True, False), get_isbn_cases((), ['9788300000011']))
+        self.assertEqual((True, False), get_isbn_cases(('9788300000011',), []))
+
+    def test_the_same_isbns(self):
+        self.assertEqual((False, True), get_isbn_cases(('9788300000011',), ['9788300000011']))
+
+    def test_the_same_isbns_in_different_order(self):
+        self.assertEqual((True, False), get_isbn_cases(('8300000012', '9788300000011'),
+                                                       ['9788300000011', '8300000012']))
+
+    def test_different_isbns(self):
+        self.assertEqual((False, False), get_isbn_cases(('9788300000011',), ['8300000012']))
+
+
+class TestMatchCandidates(unittest.TestCase):
+    def setUp(self):
+        self.mak_manif_data = get_manif_match_data()
+        self.index = BnManifMatchDataIndex()
+
+    def match(self, match_by_245=True, **kwargs):
+        self.index.add('b0000000001', get_manif_match_data(**kwargs))
+        return match_candidates(['b0000000001'], self.mak_manif_data, self.index, match_by_245)
+
+    def test_the_same_data(self):
+        self.assertEqual(({'b0000000001'}, set()), self.match())
+
+    def test_different_edition(self):
+        self.assertEqual((set(), {'b0000000001'}), self.match(edition=['WYD 2']))
+
+    def test_pages_and_format_tolerance(self):
+        self.assertEqual(({'b0000000001'}, set()), self.match(num_of_pages_300_a=302, b_format=23))
+
+    def test_too_many_pages(self):
+        self.assertEqual((set(), set()), self.match(num_of_pages_300_a=303))
+
+    def test_different_ldr_with_the_same_isbns(self):
+        self.assertEqual((set(), set()), self.match(ldr_67='aa'))
+        self.assertEqual(({'b0000000001'}, set()), match_candidates(['b0000000001'], self.mak_manif_data, self.index,
+                                                                    match_by_245=False))
+
+    def test_two_of_title_rules_are_enough_with_the_same_isbns(self):
+        self.assertEqual(({'b0000000001'}, set()), self.match(place_pub_260_a_first_word='Kraków'))
+
+    def test_all_title_rules_are_needed_without_isbns(self):
+        self.assertEqual((set(), set()), self.match(isbn_020_az=[], place_pub_260_a_first_word='Kraków'))
+
+    def test_different_isbns(self):
+        self.assertEqual((set(), set()), self.match(isbn_020_az=['8300000012']))
+        self.assertEqual((set(), set()), self.match(match_by_245=False, isbn_020_az=['8300000012']))
+
+    def test_value_missing_in_index(self):
+        self.mak_manif_data = get_manif_match_data(place_pub_260_a_first_word='Poznań')
+        self.assertEqual((set(), set()), self.match(isbn_020_az=[]))
+
+    def test_candidate_without_match_data(self):
+        self.index.add('b0000000002', None)
+        with self.assertRaises(ManifMatchDataNotAvailable):
+            match_candidates(['b0000000002'], self.mak_manif_data, self.index, match_by_245=True)
+
+
+class TestGetBlockedCandidates(unittest.TestCase):
+    def setUp(self):
+        self.index = BnManifMatchDataIndex()
+        self.index.add('b0000000003', None)
+
+    def test_candidates_in_blocks(self):
+        self.assertEqual({'b0000000001', 'b0000000002'},
+                         get_blocked_candidates({'b0000000001', 'b0000000002', 'b0000000004'},
+                                                [{'b0000000001'}, {'b0000000002', 'b0000000005'}], self.index))
+        self.assertEqual(set(), get_blocked_candidates({'b0000000001'}, [], self.index))
+
+    def test_candidate_without_match_data(self):
+        with self.assertRaises(ManifMatchDataNotAvailable):
+            get_blocked_candidates({'b0000000001', 'b0000000003'}, [{'b0000000001'}], self.index)
+
+
+class TestMatchManifestation(unittest.TestCase):
+    def setUp(self):
+        self.mak_manif_data = get_manif_match_data()
+        self.index = BnManifMatchDataIndex()
+        self.index.add('b0000000001', get_manif_match_data())
+
+    def test_title_in_index_245(self):
+        self.assertEqual('b0000000001', match_manifestation(self.mak_manif_data,
+                                                            index_245={'Quo vadis : powieść z cza': {'b0000000001'}},
+                                                            index_490={}, index_match_data=self.index))
+
+    def test_title_only_in_index_490(self):
+        self.assertEqual('b0000000001', match_manifestation(self.mak_manif_data, index_245={},
+                                                            index_490={'Quo vadis : powieść z cza': {'b0000000001'}},
+                                                            index_match_data=self.index))
+
+    def test_title_not_in_indexes(self):
+        self.assertFalse(match_manifestation(self.mak_manif_data, index_245={}, index_490={},
+                                             index_match_data=self.index))
+
+
+class TestGetMatchDataFingerprint(unittest.TestCase):
+    def test_the_same_data(self):
+        fingerprint = get_match_data_fingerprint(get_manif_match_data(edition=['WYD 2']))
+
+        self.assertEqual(fingerprint, get_match_data_fingerprint(get_manif_match_data(edition=['WYD 2'])))
+        self.assertEqual(hash(fingerprint), hash(get_match_data_fingerprint(get_manif_match_data(edition=['WYD 2']))))
+
+    def test_different_data(self):
+        self.assertNotEqual(get_match_data_fingerprint(get_manif_match_data()),
+                            get_match_data_fingerprint(get_manif_match_data(isbn_020_az=['8300000012'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import pickle
+import unittest
+
+from objects.helper_objects import FrequencyTable
+
+
+class TestFrequencyTable(unittest.TestCase):
+    def setUp(self):
+        self.table = FrequencyTable()
+        for title in ['Lalka', 'Quo vadis', 'Lalka', 'Potop', 'Quo vadis']:
+            self.table.add(title)
+
+    def test_add(self):
+        self.table.add('Potop', 3)
+        self.assertEqual({'Lalka': 2, 'Quo vadis': 2, 'Potop': 4}, self.table)
+        self.assertEqual(['Lalka', 'Quo vadis', 'Potop'], list(self.table))
+
+    def test_merge(self):
+        other_table = FrequencyTable()
+        other_table.add('Potop', 2)
+        other_table.add('Krzyżacy')
+
+        self.table.merge(other_table)
+
+        self.assertEqual({'Lalka': 2, 'Quo vadis': 2, 'Potop': 3, 'Krzyżacy': 1}, self.table)
+
+    def test_get_least_frequent_is_the_first_one_sorted_by_frequency(self):
+        self.assertEqual('Potop', self.table.get_least_frequent())
+
+        self.table.add('Potop')
+        self.assertEqual(sorted(self.table.items(), key=lambda x: x[1])[0][0], self.table.get_least_frequent())
+        self.assertEqual('Lalka', self.table.get_least_frequent())
+
+    def test_pickle(self):
+        table = pickle.loads(pickle.dumps(self.table))
+
+        self.assertIsInstance(table, FrequencyTable)
+        self.assertEqual(self.table, table)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from types import SimpleNamespace
+
+from pymarc import Field
+
+from objects.manifestation import Manifestation
+
+
+def get_ava_field(bib_id, count, url='http://mak.example/item'):
+    return Field(tag='AVA', indicators=[' ', ' '], subfields=['b', f'KAT{bib_id}', 'f', str(count), 'u', url])
+
+
+class TestManifestationMakItems(unittest.TestCase):
+    def setUp(self):
+        # only attributes used for attaching mak items are set
+        self.manifestation = Manifestation.__new__(Manifestation)
+        self.manifestation.mock_es_id = '1133300000001'
+        self.manifestation.mak_items = {}
+
+        self.work = SimpleNamespace(mock_es_id='1111100000001')
+        self.expression = SimpleNamespace(mock_es_id='1122200000001')
+        self.library_index = {'10': SimpleNamespace(source={'name': 'Biblioteka 10'}, es_id='510'),
+                              '20': SimpleNamespace(source={'name': 'Biblioteka 20'}, es_id='520')}
+
+    def add_mak_items(self, ava_fields):
+        return self.manifestation.add_mak_items(ava_fields, self.library_index, self.work, self.expression, None)
+
+    def test_add_mak_items(self):
+        self.assertEqual((2, 0), self.add_mak_items([get_ava_field(10, 2), get_ava_field(20, 1)]))
+
+        self.assertEqual(['10', '20'], list(self.manifestation.mak_items))
+
+        item = self.manifestation.mak_items['10']
+        self.assertEqual(2, item.item_count)
+        self.assertEqual({'digital': False, 'name': 'Biblioteka 10', 'id': 510}, item.library)
+        self.assertEqual(['1122200000001'], item.expression_ids)
+        self.assertEqual(1133300000001, item.item_mat_id)
+        self.assertEqual(1111100000001, item.item_work_id)
+
+    def test_items_of_the_same_library_are_counted_together(self):
+        self.assertEqual((1, 1), self.add_mak_items([get_ava_field(10, 2), get_ava_field(10, 3)]))
+        self.assertEqual((0, 1), self.add_mak_items([get_ava_field(10, 1)]))
+
+        self.assertEqual(1, len(self.manifestation.mak_items))
+        self.assertEqual(6, self.manifestation.mak_items['10'].item_count)
+
+    def test_items_of_unknown_libraries_are_skipped(self):
+        self.assertEqual((1, 0), self.add_mak_items([get_ava_field(30, 2), get_ava_field(20, 1)]))
+        self.assertEqual(['20'], list(self.manifestation.mak_items))
+
+
+if __name__ == '__main__':
+    unittest.main()
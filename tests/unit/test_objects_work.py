@@ -0,0 +1,82 @@
+import unittest
+
+from pymarc import Record, Field
+
+from commons.marc_iso_commons import MarcRecordView
+from indexers.descriptor_index import DescriptorIndex
+from objects.helper_objects import ResolvedDescriptor
+from objects.work import Work
+
+
+class CountingDescriptorIndex(object):
+    # descriptor index which counts lookups
+    def __init__(self, descr_index):
+        self.descr_index = descr_index
+        self.lookups = 0
+
+    def get(self, indexing_name, default=None):
+        self.lookups += 1
+        return self.descr_index.get(indexing_name, default)
+
+
+def get_record(fields):
+    record = Record()
+    for tag, subfields in fields:
+        record.add_field(Field(tag, [' ', '4'], subfields))
+    return MarcRecordView(record)
+
+
+class TestWorkDescriptors(unittest.TestCase):
+    def setUp(self):
+        self.descr_index = CountingDescriptorIndex(DescriptorIndex.from_descriptors(
+            [('SIENKIEWICZ HENRYK 1846 1916', '1001', 'person', 'Sienkiewicz, Henryk (1846-1916)'),
+             ('POWIEŚĆ HISTORYCZNA', '2001', 'genre', 'Powieść historyczna'),
+             ('KSIĄŻKI', '3001', 'form', 'Książki')]))
+        self.sienkiewicz = ResolvedDescriptor(1001, 'person', 'Sienkiewicz, Henryk (1846-1916)')
+        self.novel = ResolvedDescriptor(2001, 'genre', 'Powieść historyczna')
+        self.books = ResolvedDescriptor(3001, 'form', 'Książki')
+        self.work = Work()
+
+    def test_descriptors_of_dbn_record(self):
+        record = get_record([('600', ['a', 'Sienkiewicz, Henryk', 'd', '(1846-1916)']),
+                             ('655', ['a', 'Powieść historyczna']),
+                             ('650', ['a', 'Nieznany temat']),
+                             ('380', ['a', 'Książki'])])
+
+        self.assertTrue(self.work.get_descriptors(record, self.descr_index, {}))
+
+        self.assertEqual({self.sienkiewicz}, self.work.work_subject_person)
+        self.assertEqual({self.novel}, self.work.work_genre)
+        self.assertEqual(set(), self.work.work_subject)
+        self.assertEqual({self.books}, self.work.work_form)
+
+    def test_subjects_of_not_dbn_record_are_skipped(self):
+        record = get_record([('655', ['a', 'Powieść historyczna', 'x', 'Tematy']), ('380', ['a', 'Książki'])])
+
+        self.work.get_descriptors(record, self.descr_index, {})
+
+        self.assertEqual(set(), self.work.work_genre)
+        self.assertEqual({self.books}, self.work.work_form)
+
+    def test_values_are_resolved_once_per_work(self):
+        resolved_descriptors = {}
+        record = get_record([('655', ['a', 'Powieść historyczna']), ('650', ['a', 'Nieznany temat'])])
+
+        self.assertTrue(self.work.get_descriptors(record, self.descr_index, resolved_descriptors))
+        self.assertFalse(self.work.get_descriptors(record, self.descr_index, resolved_descriptors))
+
+        self.assertEqual(2, self.descr_index.lookups)
+        self.assertEqual({'Powieść historyczna': self.novel, 'Nieznany temat': None}, resolved_descriptors)
+
+
+class TestWorkMockEsId(unittest.TestCase):
+    def test_id_is_taken_from_the_lowest_bn_id(self):
+        work = Work()
+        work.manifestations_bn_ids = {'b0000000012', 'b0000000003', 'b0000000007'}
+        work.create_mock_es_data_index_id()
+
+        self.assertEqual('111110000000003', work.mock_es_id)
+
+
+if __name__ == '__main__':
+    unittest.main()